@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('frontend', 'frontend'), ('backend', 'backend')],
-    hiddenimports=['flask', 'flask_cors', 'flask_jwt_extended', 'pymongo', 'bcrypt', 'dotenv', 'werkzeug', 'bson'],
+    hiddenimports=['flask', 'flask_cors', 'flask_jwt_extended', 'pymongo', 'bcrypt', 'dotenv', 'werkzeug', 'bson', 'sqlite3', 'numpy'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
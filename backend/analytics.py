@@ -0,0 +1,217 @@
+"""
+Analytics Rollups
+Folds new progress_logs events into per-user daily/weekly aggregates (`analytics_rollups`)
+that the "System Window" trend charts read with one indexed range query.
+Run: python analytics.py   (one-off rollup of everything pending)
+"""
+
+import datetime
+import uuid
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from config import Config
+from jobs import PeriodicJob
+from leaderboard import bucket_for
+from progress_log import COLLECTION as PROGRESS_LOGS
+
+ROLLUPS = 'analytics_rollups'
+STATE = 'analytics_state'
+STATE_ID = 'progress_rollup'
+LEASE_TIMEOUT = 600  # seconds before a rollup that died mid-way is taken over
+
+PERIODS = ('day', 'week')
+DEFAULT_COUNT = {'day': 30, 'week': 12}
+MAX_COUNT = {'day': 366, 'week': 104}
+DUNGEON_OUTCOMES = {
+    'dungeon_completed': 'completed',
+    'dungeon_failed': 'failed',
+    'dungeon_expired': 'expired'
+}
+ROLLUP_FIELDS = {'_id': 0, 'bucket': 1, 'exp': 1, 'quests': 1, 'stats': 1, 'dungeons': 1}
+
+
+def contribution(event):
+    """Counters one progress event adds to its rollups ({} for actions that are not charted)"""
+    action = event.get('action_type')
+    details = event.get('details') or {}
+    if action == 'exp_gained':
+        # Every EXP grant (quests, dungeons, skills, items) logs one of these
+        return {'exp': details.get('amount', 0)}
+    if action == 'quest_completed':
+        counters = {f"quests.{details.get('category') or 'system'}": 1}
+        for stat, amount in (details.get('stat_rewards') or {}).items():
+            counters[f'stats.{stat}'] = amount
+        return counters
+    if action in DUNGEON_OUTCOMES:
+        return {f'dungeons.{DUNGEON_OUTCOMES[action]}': 1}
+    return {}
+
+
+def fold(events):
+    """{(user_id, period, bucket): {counter: amount}} for a batch of events"""
+    rollups = {}
+    for event in events:
+        counters = contribution(event)
+        if not counters:
+            continue
+        for period in PERIODS:
+            acc = rollups.setdefault((event['user_id'], period, bucket_for(period, event['timestamp'])), {})
+            for field, amount in counters.items():
+                acc[field] = acc.get(field, 0) + amount
+    return rollups
+
+
+def _acquire(db, owner, now):
+    """Takes the rollup lease (one runner at a time); returns the state doc or None if held"""
+    try:
+        return db[STATE].find_one_and_update(
+            {'_id': STATE_ID, '$or': [{'lease_until': {'$lt': now}}, {'lease_until': {'$exists': False}}]},
+            {'$set': {'lease_until': now + datetime.timedelta(seconds=LEASE_TIMEOUT), 'owner': owner}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        return None
+
+
+def _apply(db, rollups, through, now):
+    """
+    One unordered bulk of $inc upserts. Each rollup records the last event
+    _id folded into it (`through`) and the filter skips rollups that already
+    have this batch, so re-running a batch after a crash never double counts.
+    The skipped upserts fail on the unique key and are ignored.
+    """
+    ops = [
+        UpdateOne(
+            {'user_id': user_id, 'period': period, 'bucket': bucket, 'through': {'$not': {'$gte': through}}},
+            {'$inc': counters, '$set': {'through': through, 'updated_at': now}},
+            upsert=True
+        )
+        for (user_id, period, bucket), counters in rollups.items()
+    ]
+    if not ops:
+        return
+    try:
+        db[ROLLUPS].bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        if any(err.get('code') != 11000 for err in e.details.get('writeErrors', [])):
+            raise
+
+
+def run_rollup(db, now=None, batch_size=None, lag=None):
+    """
+    Folds every progress event past the watermark into the rollups, in
+    batches of `batch_size` ordered by _id. Events newer than `lag` seconds
+    are left for the next run so in-flight flushes from other workers (older
+    _ids inserted late) are not skipped; a retried flush gets new _ids
+    (see ProgressLog), so retries never fall behind. Each batch's end is
+    saved before it is applied (pending_end) and becomes the watermark
+    once it is.
+
+    Returns the number of events read, or None if another worker holds the lease.
+    """
+    now = now or datetime.datetime.utcnow()
+    batch_size = batch_size or Config.ANALYTICS_ROLLUP_BATCH
+    lag = lag if lag is not None else Config.ANALYTICS_ROLLUP_LAG
+    owner = uuid.uuid4().hex
+    state = _acquire(db, owner, now)
+    if state is None:
+        return None
+
+    cutoff = ObjectId.from_datetime(now - datetime.timedelta(seconds=lag))
+    read = 0
+    try:
+        while True:
+            watermark, pending_end = state.get('watermark'), state.get('pending_end')
+            id_range = {'$lte': pending_end} if pending_end else {'$lt': cutoff}
+            if watermark:
+                id_range['$gt'] = watermark
+            cursor = db[PROGRESS_LOGS].find({'_id': id_range}).sort('_id', ASCENDING)
+            events = list(cursor if pending_end else cursor.limit(batch_size))
+            if not events:
+                break
+
+            end = pending_end or events[-1]['_id']
+            if not pending_end:
+                db[STATE].update_one({'_id': STATE_ID, 'owner': owner}, {'$set': {'pending_end': end}})
+            _apply(db, fold(events), end, now)
+            state = db[STATE].find_one_and_update(
+                {'_id': STATE_ID, 'owner': owner},
+                {'$set': {'watermark': end, 'updated_at': now}, '$unset': {'pending_end': ''}},
+                return_document=ReturnDocument.AFTER
+            )
+            read += len(events)
+            if state is None or (not pending_end and len(events) < batch_size):
+                break
+    finally:
+        db[STATE].update_one({'_id': STATE_ID, 'owner': owner}, {'$unset': {'lease_until': '', 'owner': ''}})
+    return read
+
+
+def bucket_range(period, count, end=None):
+    """The `count` consecutive bucket keys ending at the one containing `end`, oldest first"""
+    end = end or datetime.datetime.utcnow()
+    step = datetime.timedelta(days=1 if period == 'day' else 7)
+    return [bucket_for(period, end - step * i) for i in reversed(range(count))]
+
+
+def trends(db, user_id, period, count=None):
+    """
+    Per-bucket series for one player, read only from the rollups: one range
+    query on (user_id, period, bucket). Buckets without activity are zero.
+    """
+    count = max(1, min(count or DEFAULT_COUNT[period], MAX_COUNT[period]))
+    buckets = bucket_range(period, count)
+    found = {
+        doc['bucket']: doc
+        for doc in db[ROLLUPS].find(
+            {'user_id': user_id, 'period': period, 'bucket': {'$gte': buckets[0], '$lte': buckets[-1]}},
+            ROLLUP_FIELDS
+        )
+    }
+    series = [
+        {
+            'bucket': bucket,
+            'exp': found.get(bucket, {}).get('exp', 0),
+            'quests': found.get(bucket, {}).get('quests', {}),
+            'stats': found.get(bucket, {}).get('stats', {}),
+            'dungeons': found.get(bucket, {}).get('dungeons', {})
+        }
+        for bucket in buckets
+    ]
+    return {'period': period, 'from': buckets[0], 'to': buckets[-1], 'series': series}
+
+
+class RollupJob(PeriodicJob):
+    """Runs run_rollup every `interval` seconds; the lease lets every worker run one"""
+
+    name = 'analytics-rollup'
+
+    def __init__(self, db, interval=None):
+        super().__init__(interval if interval is not None else Config.ANALYTICS_ROLLUP_INTERVAL)
+        self.db = db
+
+    def run(self):
+        return run_rollup(self.db)
+
+
+def main():
+    """One-off rollup for deployments without long-lived workers (cron, Vercel)"""
+    from migrations import _connect
+
+    client = _connect()
+    try:
+        read = run_rollup(client['the_system'])
+        if read is None:
+            print("⚠️  Another rollup is running")
+        else:
+            print(f"✅ Rolled up {read} progress event(s)")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
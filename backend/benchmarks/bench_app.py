@@ -0,0 +1,560 @@
+"""
+End-to-end Load Benchmark
+Seeds synthetic players and drives a weighted mix of API calls (login, dashboard loads,
+quest completions, skill use, dungeon runs, shop purchases, leaderboard reads) through the
+Flask app from concurrent clients. Reports per-endpoint throughput, p50/p95/p99 latency and
+MongoDB commands per request; saves JSON baselines and compares against them, and checks
+every route's @query_budget.
+Run: python benchmarks/bench_app.py [--players 50] [--clients 16] [--duration 30]
+                                    [--stand-in] [--save FILE] [--compare FILE]
+                                    [--check-budgets] [--budgets-only]
+"""
+
+import argparse
+import datetime
+import io
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+PASSWORD = 'bench-password'
+PREFIX = 'bench_load_'
+
+# action -> weight; one action may issue several requests (a dungeon run is start/damage/complete)
+MIX = {
+    'login': 4,
+    'bootstrap': 20,
+    'profile': 8,
+    'quests': 8,
+    'complete_quest': 15,
+    'use_skill': 8,
+    'dungeon_run': 5,
+    'shop_buy': 5,
+    'use_item': 4,
+    'leaderboard': 12,
+    'leaderboard_week': 4,
+    'my_rank': 4,
+    'trends': 3
+}
+QUEST_IDS = ('physical_pushups', 'physical_situps', 'physical_squats', 'physical_run')
+SHOP_ITEM = 'potion_stamina_small'
+ACTIVE_SKILL = 'active_heal'
+
+# Per-user collections removed after a run against a real database
+USER_COLLECTIONS = ('stats', 'user_titles', 'user_skills', 'quests', 'custom_quests', 'active_dungeons',
+                    'dungeon_history', 'user_inventory', 'progress_logs', 'exp_buckets',
+                    'analytics_rollups', 'cohort_insights', 'events')
+
+
+def install_stand_in(path):
+    """
+    Points the app at the embedded SQLite datastore (local_store.py) in a
+    scratch file before simple_app is imported. It runs the same queries and
+    update pipelines as MongoDB and charges each command to the active
+    request, as instrumentation.CommandMetrics does for a real server.
+    """
+    os.environ['DATASTORE'] = 'sqlite'
+    os.environ['LOCAL_DB_PATH'] = path
+    os.environ['LOCAL_SYNC_URI'] = ''  # set but empty: no change log, and .env cannot turn it on
+
+
+class Recorder:
+    """Latency samples and status codes per endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, endpoint, elapsed, status, failed):
+        with self._lock:
+            self.samples[endpoint].append(elapsed)
+            if failed:
+                self.errors[endpoint] += 1
+
+
+class Player:
+    def __init__(self, username, user_id, token):
+        self.username = username
+        self.user_id = user_id
+        self.token = token
+
+    @property
+    def headers(self):
+        return {'Authorization': f'Bearer {self.token}'}
+
+
+def call(client, recorder, endpoint, method, path, player=None, expect=None, **kwargs):
+    """
+    One timed request; returns the parsed JSON body (or None). A 4xx/5xx
+    other than `expect` (a rejection the action measures on purpose) counts
+    as an error.
+    """
+    if player is not None:
+        kwargs['headers'] = player.headers
+    start = time.perf_counter()
+    response = getattr(client, method)(path, **kwargs)
+    elapsed = time.perf_counter() - start
+    if recorder is not None:
+        status = response.status_code
+        recorder.add(endpoint, elapsed, status, status >= 400 and status != expect)
+    return response.get_json(silent=True)
+
+
+# --- Actions ---
+
+def login(client, rec, p):
+    body = call(client, rec, 'POST /api/auth/login', 'post', '/api/auth/login',
+                json={'username': p.username, 'password': PASSWORD})
+    if body and body.get('access_token'):
+        p.token = body['access_token']
+
+
+def bootstrap(client, rec, p):
+    call(client, rec, 'GET /api/dashboard/bootstrap', 'get', '/api/dashboard/bootstrap', p)
+
+
+def profile(client, rec, p):
+    call(client, rec, 'GET /api/user/profile', 'get', '/api/user/profile', p)
+
+
+def quests(client, rec, p):
+    call(client, rec, 'GET /api/quests/available', 'get', '/api/quests/available', p)
+
+
+def complete_quest(client, rec, p):
+    call(client, rec, 'POST /api/quests/complete', 'post', '/api/quests/complete', p,
+         json={'quest_id': random.choice(QUEST_IDS)})
+
+
+def use_skill(client, rec, p):
+    call(client, rec, 'POST /api/skills/use', 'post', '/api/skills/use', p, json={'skill_id': ACTIVE_SKILL})
+
+
+def dungeon_run(client, rec, p):
+    body = call(client, rec, 'POST /api/dungeons/start', 'post', '/api/dungeons/start', p, json={'rank': 'E'})
+    if not body or 'dungeon_id' not in body:
+        return
+    dungeon_id, hp = body['dungeon_id'], body['boss_hp']
+    # The dashboard flushes hits in batches (see dungeon_damage.py)
+    hits = [{'seq': i + 1, 'damage': 10} for i in range(-(-hp // 10))]
+    for start in range(0, len(hits), 5):
+        call(client, rec, 'POST /api/dungeons/damage', 'post', '/api/dungeons/damage', p,
+             json={'dungeon_id': dungeon_id, 'events': hits[start:start + 5]})
+    body = call(client, rec, 'POST /api/dungeons/complete', 'post', '/api/dungeons/complete', p,
+                json={'dungeon_id': dungeon_id})
+    if not body or 'error' in body:
+        # Boss survived: flee so the player's next run can start
+        call(client, rec, 'POST /api/dungeons/fail', 'post', '/api/dungeons/fail', p, json={'dungeon_id': dungeon_id})
+
+
+def shop_buy(client, rec, p):
+    call(client, rec, 'POST /api/shop/buy', 'post', '/api/shop/buy', p, json={'item_id': SHOP_ITEM})
+
+
+def use_item(client, rec, p):
+    call(client, rec, 'POST /api/inventory/use', 'post', '/api/inventory/use', p, json={'item_id': SHOP_ITEM})
+
+
+def leaderboard(client, rec, p):
+    call(client, rec, 'GET /api/leaderboard', 'get', '/api/leaderboard')
+
+
+def leaderboard_week(client, rec, p):
+    call(client, rec, 'GET /api/leaderboard?period=week', 'get', '/api/leaderboard?period=week')
+
+
+def my_rank(client, rec, p):
+    call(client, rec, 'GET /api/leaderboard/me', 'get', '/api/leaderboard/me', p)
+
+
+def trends(client, rec, p):
+    call(client, rec, 'GET /api/analytics/trends', 'get', '/api/analytics/trends?period=week', p)
+
+
+# Calibration only (query counts / budgets): rarer routes kept out of the load mix
+
+def catalog_reads(client, rec, p):
+    call(client, rec, 'GET /api/skills/', 'get', '/api/skills/', p)
+    call(client, rec, 'GET /api/shop', 'get', '/api/shop', p)
+    call(client, rec, 'GET /api/inventory', 'get', '/api/inventory', p)
+    call(client, rec, 'GET /api/user/titles', 'get', '/api/user/titles', p)
+
+
+def custom_quest(client, rec, p):
+    body = call(client, rec, 'POST /api/quests/add', 'post', '/api/quests/add', p,
+                json={'title': 'Bench quest', 'description': 'Synthetic', 'exp_reward': 10, 'stamina_cost': 1})
+    if not body or 'quest' not in body:
+        return
+    quest_id = body['quest']['quest_id']
+    call(client, rec, 'PUT /api/quests/edit', 'put', '/api/quests/edit', p,
+         json={'quest_id': quest_id, 'title': 'Bench quest (edited)', 'description': 'Synthetic',
+               'difficulty': 'easy', 'exp_reward': 10, 'stamina_cost': 1})
+    call(client, rec, 'DELETE /api/quests/<id>', 'delete', f'/api/quests/{quest_id}', p)
+
+
+def account(client, rec, p):
+    call(client, rec, 'POST /api/user/restore-stamina', 'post', '/api/user/restore-stamina', p, json={'amount': 5})
+    call(client, rec, 'POST /api/user/check-titles', 'post', '/api/user/check-titles', p, json={})
+    # Seeding unlocked it: measures the 'already unlocked' path
+    call(client, rec, 'POST /api/skills/unlock', 'post', '/api/skills/unlock', p, expect=400,
+         json={'skill_id': ACTIVE_SKILL})
+    call(client, rec, 'POST /api/user/upload-image', 'post', '/api/user/upload-image', p,
+         data={'file': (io.BytesIO(b'\x89PNG\r\n'), 'avatar.png')}, content_type='multipart/form-data')
+    call(client, rec, 'POST /api/feedback', 'post', '/api/feedback', p,
+         json={'category': 'other', 'rating': 5, 'message': 'Synthetic'})
+
+
+def dungeon_flee(client, rec, p):
+    body = call(client, rec, 'POST /api/dungeons/start', 'post', '/api/dungeons/start', p, json={'rank': 'E'})
+    if body and 'dungeon_id' in body:
+        call(client, rec, 'POST /api/dungeons/fail', 'post', '/api/dungeons/fail', p,
+             json={'dungeon_id': body['dungeon_id']})
+
+
+def live_events(client, rec, p):
+    from config import Config
+
+    # Both routes answer 404 while LIVE_EVENTS is off
+    expect = None if Config.LIVE_EVENTS else 404
+    body = call(client, rec, 'POST /api/events/ticket', 'post', '/api/events/ticket', p, expect=expect)
+    if not body or 'ticket' not in body:
+        return
+    start = time.perf_counter()
+    response = client.get(f"/api/events?ticket={body['ticket']}", buffered=False)
+    rec.add('GET /api/events', time.perf_counter() - start, response.status_code, response.status_code >= 400)
+    # Read the opening frame so closing the stream unsubscribes it
+    next(response.response, None)
+    response.close()
+
+
+def signup(client, rec, p):
+    username = f'{PREFIX}signup_{uuid.uuid4().hex[:12]}'
+    body = call(client, rec, 'POST /api/auth/register', 'post', '/api/auth/register',
+                json={'username': username, 'email': f'{username}@bench.local', 'password': PASSWORD})
+    if body and 'user' in body:
+        SIGNUPS.append(Player(username, body['user']['id'], body['access_token']))
+
+
+ACTIONS = {name: globals()[name] for name in MIX}
+CALIBRATION_ACTIONS = {**ACTIONS, **{fn.__name__: fn for fn in (catalog_reads, custom_quest, account, dungeon_flee,
+                                                                 live_events, signup)}}
+SIGNUPS = []  # players registered by the signup action, removed with the seeded ones
+
+
+# --- Setup / teardown ---
+
+def seed_players(client, db, count, run_id):
+    """Registers `count` players through the API, then tops up gold/stamina/skill points directly"""
+    from bson.objectid import ObjectId
+
+    players = []
+    for i in range(count):
+        username = f'{PREFIX}{run_id}_{i}'
+        body = call(client, None, None, 'post', '/api/auth/register',
+                    json={'username': username, 'email': f'{username}@bench.local', 'password': PASSWORD})
+        if not body or 'access_token' not in body:
+            sys.exit(f"Seeding failed for {username}: {body}")
+        user_id = body['user']['id']
+        db.users.update_one({'_id': ObjectId(user_id)}, {'$set': {'gold': 10 ** 9, 'skill_points': 10}})
+        # Large pools so the mix measures the happy paths instead of 'not enough stamina'
+        db.stats.update_one({'user_id': user_id}, {'$set': {'stamina': 10 ** 6, 'max_stamina': 10 ** 6,
+                                                           'health': 10 ** 6, 'max_health': 10 ** 6}})
+        players.append(Player(username, user_id, body['access_token']))
+
+    for p in players:
+        call(client, None, None, 'post', '/api/skills/unlock', p, json={'skill_id': ACTIVE_SKILL})
+    return players
+
+
+def cleanup(db, players):
+    from bson.objectid import ObjectId
+
+    user_ids = [p.user_id for p in players + SIGNUPS]
+    db.users.delete_many({'_id': {'$in': [ObjectId(u) for u in user_ids]}})
+    db.feedback.delete_many({'user_id': {'$in': [ObjectId(u) for u in user_ids]}})
+    for name in USER_COLLECTIONS:
+        db[name].delete_many({'user_id': {'$in': user_ids}})
+
+
+# --- Measurement ---
+
+def calibrate(client, players, rounds):
+    """
+    Serial pass over every action: MongoDB commands per request as the app
+    itself counts them (instrumentation.py), keyed by Flask endpoint.
+    Returns ({flask endpoint: [commands per request]}, {bench label: flask endpoint},
+    {bench label: [unexpected error statuses]}); a failed request stops early
+    and would understate its route's count, so callers reject the run.
+    """
+    from instrumentation import metrics
+
+    per_request = defaultdict(list)
+    routes = {}
+    failures = defaultdict(list)
+
+    class Counting:
+        def __init__(self):
+            self.before = metrics.commands_by_endpoint()
+
+        def add(self, label, elapsed, status, failed):
+            if failed:
+                failures[label].append(status)
+            after = metrics.commands_by_endpoint()
+            for endpoint, (requests, commands) in after.items():
+                old_requests, old_commands = self.before.get(endpoint, (0, 0))
+                if requests > old_requests:
+                    per_request[endpoint].append(commands - old_commands)
+                    routes[label] = endpoint
+            self.before = after
+
+    rec = Counting()
+    for _ in range(rounds):
+        # One player per round so actions that depend on each other (buy, then use) line up
+        player = random.choice(players)
+        for action in CALIBRATION_ACTIONS.values():
+            action(client, rec, player)
+    return per_request, routes, failures
+
+
+def check_budgets(app, per_request):
+    """Prints each route's worst calibrated count against its @query_budget; returns the routes over budget"""
+    from instrumentation import budget_for
+
+    over = []
+    print(f"\n{'route':<28} {'budget':>7} {'worst':>6} {'mean':>6}")
+    print("-" * 50)
+    for endpoint in sorted(set(app.view_functions) | set(per_request)):
+        budget = budget_for(app, endpoint)
+        counts = per_request.get(endpoint)
+        if budget is None and not counts:
+            continue
+        worst = max(counts) if counts else None
+        flag = ''
+        if budget is None:
+            flag = '  (no budget)'
+        elif worst is None:
+            flag = '  (not exercised)'
+        elif worst > budget:
+            flag = '  ❌'
+            over.append(endpoint)
+        print(f"{endpoint:<28} {budget if budget is not None else '-':>7} "
+              f"{worst if worst is not None else '-':>6} "
+              f"{statistics.mean(counts) if counts else 0:>6.1f}{flag}")
+    return over
+
+
+def load(client, players, clients, duration):
+    """Concurrent phase: each client owns a slice of the players and runs weighted actions until time is up"""
+    recorder = Recorder()
+    names, weights = list(MIX), list(MIX.values())
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        own = players[index::clients] or players
+        rng = random.Random(index)
+        while time.perf_counter() < deadline:
+            action = ACTIONS[rng.choices(names, weights)[0]]
+            action(client, recorder, rng.choice(own))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(worker, range(clients)))
+    return recorder, time.perf_counter() - start
+
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an ascending list"""
+    return ordered[max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+def summarize(recorder, elapsed, queries):
+    endpoints = {}
+    for endpoint, samples in sorted(recorder.samples.items()):
+        ordered = sorted(samples)
+        endpoints[endpoint] = {
+            'requests': len(ordered),
+            'errors': recorder.errors[endpoint],
+            'rps': len(ordered) / elapsed,
+            'p50_ms': percentile(ordered, 50) * 1000,
+            'p95_ms': percentile(ordered, 95) * 1000,
+            'p99_ms': percentile(ordered, 99) * 1000,
+            'queries': queries.get(endpoint)
+        }
+    every = sorted(s for samples in recorder.samples.values() for s in samples)
+    total = {
+        'requests': len(every),
+        'errors': sum(recorder.errors.values()),
+        'rps': len(every) / elapsed,
+        'p50_ms': percentile(every, 50) * 1000 if every else 0,
+        'p95_ms': percentile(every, 95) * 1000 if every else 0,
+        'p99_ms': percentile(every, 99) * 1000 if every else 0
+    }
+    return endpoints, total
+
+
+def print_report(endpoints, total, title):
+    print(f"\n{title}")
+    print(f"{'endpoint':<34} {'reqs':>6} {'err':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8}")
+    print("-" * 92)
+    for endpoint, r in endpoints.items():
+        queries = f"{r['queries']:.1f}" if r['queries'] is not None else '-'
+        print(f"{endpoint:<34} {r['requests']:>6} {r['errors']:>5} {r['rps']:>8.1f} "
+              f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {queries:>8}")
+    print("-" * 92)
+    print(f"{'total':<34} {total['requests']:>6} {total['errors']:>5} {total['rps']:>8.1f} "
+          f"{total['p50_ms']:>8.2f} {total['p95_ms']:>8.2f} {total['p99_ms']:>8.2f}")
+
+
+def compare(endpoints, baseline_path, tolerance):
+    """Prints changes against a saved baseline; returns the endpoints that regressed beyond `tolerance`"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['endpoints']
+
+    regressed = []
+    print(f"\nAgainst {baseline_path} (tolerance {tolerance:.0%})")
+    print(f"{'endpoint':<34} {'p95 ms':>18} {'req/s':>18} {'queries':>12}")
+    print("-" * 86)
+    for endpoint, r in endpoints.items():
+        old = baseline.get(endpoint)
+        if not old:
+            print(f"{endpoint:<34} (new)")
+            continue
+        # Sub-millisecond moves are noise at these sample sizes
+        slower = r['p95_ms'] > old['p95_ms'] * (1 + tolerance) and r['p95_ms'] - old['p95_ms'] > 1
+        more_queries = (r['queries'] or 0) > (old.get('queries') or 0) + 0.5
+        flag = '  ❌' if slower or more_queries else ''
+        if flag:
+            regressed.append(endpoint)
+        print(f"{endpoint:<34} {old['p95_ms']:>8.2f} -> {r['p95_ms']:<7.2f} {old['rps']:>8.1f} -> {r['rps']:<7.1f} "
+              f"{old.get('queries') or 0:>4.1f} -> {r['queries'] or 0:<4.1f}{flag}")
+    return regressed
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mongo-uri', default=os.getenv('MONGO_URI', 'mongodb://localhost:27017/the_system'))
+    parser.add_argument('--stand-in', action='store_true',
+                        help='embedded SQLite datastore in a scratch file instead of a mongod')
+    parser.add_argument('--players', type=int, default=50)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load')
+    parser.add_argument('--calibration-rounds', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', help='write the results as a JSON baseline')
+    parser.add_argument('--compare', help='baseline JSON to compare against (exit 1 on regression)')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95 slowdown vs the baseline')
+    parser.add_argument('--keep', action='store_true', help='leave the synthetic players in the database')
+    parser.add_argument('--check-budgets', action='store_true', help='exit 1 if a route exceeds its @query_budget')
+    parser.add_argument('--budgets-only', action='store_true', help='calibrate and check budgets, skip the load phase')
+    args = parser.parse_args()
+
+    # Before the app is imported: no background jobs, the chosen database, and production's event
+    # broker (its inserts count against the budgets; EVENT_BROKER=local measures a single worker)
+    os.environ['MONGO_URI'] = args.mongo_uri
+    os.environ.setdefault('EVENT_BROKER', 'mongo')
+    os.environ.setdefault('LIVE_EVENTS', 'True')
+    os.environ.setdefault('QUERY_BUDGET_MODE', 'off')  # measured and reported here instead
+    for setting in ('DUNGEON_SWEEP_INTERVAL', 'STAMINA_NOTIFY_INTERVAL', 'ANALYTICS_ROLLUP_INTERVAL',
+                    'COHORT_ANALYSIS_INTERVAL', 'PROGRESS_LOG_FLUSH_INTERVAL'):
+        os.environ[setting] = '0'
+    random.seed(args.seed)
+
+    scratch = tempfile.mkdtemp(prefix='bench-') if args.stand_in else None
+    if scratch:
+        install_stand_in(os.path.join(scratch, 'bench.db'))
+    import simple_app
+    from migrations import run_migrations
+
+    if simple_app.db is None:
+        sys.exit("No database connection")
+    db = simple_app.db
+    run_migrations(db)
+    uploads = tempfile.mkdtemp(prefix='bench-uploads-')
+    simple_app.app.config['UPLOAD_FOLDER'] = uploads
+    client = simple_app.app.test_client()
+
+    run_id = datetime.datetime.utcnow().strftime('%Y%m%d%H%M%S')
+    print(f"Seeding {args.players} players...")
+    players = seed_players(client, db, args.players, run_id)
+    try:
+        per_request, routes, failures = calibrate(client, players, args.calibration_rounds)
+        if failures:
+            for label, statuses in sorted(failures.items()):
+                print(f"❌ {label}: {len(statuses)} failed request(s) ({', '.join(map(str, sorted(set(statuses))))})")
+            sys.exit("Calibration requests failed; their query counts and the load mix would be wrong")
+        if not args.budgets_only:
+            print(f"Running {args.clients} clients for {args.duration:.0f}s...")
+            recorder, elapsed = load(client, players, args.clients, args.duration)
+    finally:
+        simple_app.progress_log.flush()
+        if not args.keep and not args.stand_in:
+            cleanup(db, players)
+        simple_app.shutdown()
+        shutil.rmtree(uploads, ignore_errors=True)
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.check_budgets or args.budgets_only:
+        over = check_budgets(simple_app.app, per_request)
+        if over:
+            print(f"\n❌ {len(over)} route(s) over their query budget: {', '.join(over)}")
+            sys.exit(1)
+        print("\n✅ All routes within their query budgets")
+        if args.budgets_only:
+            return
+
+    queries = {label: statistics.mean(per_request[endpoint]) for label, endpoint in routes.items()}
+    endpoints, total = summarize(recorder, elapsed, queries)
+    backend = 'stand-in (embedded SQLite)' if args.stand_in else 'mongod'
+    print_report(endpoints, total,
+                 f"{args.clients} clients, {args.players} players, {elapsed:.1f}s against {backend} (latency in ms)")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'meta': {
+                    'revision': git_revision(),
+                    'recorded_at': datetime.datetime.utcnow().isoformat(),
+                    'backend': backend,
+                    'players': args.players,
+                    'clients': args.clients,
+                    'duration': elapsed,
+                    'mix': MIX
+                },
+                'endpoints': endpoints,
+                'total': total
+            }, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.save}")
+
+    if args.compare:
+        regressed = compare(endpoints, args.compare, args.tolerance)
+        if regressed:
+            print(f"\n❌ {len(regressed)} endpoint(s) regressed")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Login Throughput Benchmark
+Concurrent bcrypt verification: inline on request threads vs the bounded PasswordHasher pool.
+Reports logins/s, p50/p99 latency and how many requests were shed with 429.
+Run: python benchmarks/bench_login.py [--clients 32] [--requests 200] [--rounds 10]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcrypt
+from password_hasher import HasherBusy, PasswordHasher
+
+PASSWORD = 'correct horse battery staple'
+
+
+def run(label, verify, stored, clients, requests):
+    latencies, shed = [], 0
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            assert verify(PASSWORD, stored)
+        except HasherBusy:
+            return None
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for result in pool.map(one, range(requests)):
+            if result is None:
+                shed += 1
+            else:
+                latencies.append(result)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0
+    p50 = statistics.median(latencies) if latencies else 0
+    print(f"{label:<28} {len(latencies) / elapsed:>9.1f} {p50 * 1000:>9.1f} {p99 * 1000:>9.1f} {shed:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=32, help='concurrent login requests')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=10, help='bcrypt cost')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    args = parser.parse_args()
+
+    stored = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(args.rounds))
+    inline = lambda pw, h: bcrypt.checkpw(pw.encode('utf-8'), h)
+
+    print(f"\ncost={args.rounds} clients={args.clients} requests={args.requests} workers={args.workers}")
+    print(f"{'mode':<28} {'logins/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'429s':>6}")
+    print("-" * 66)
+    run('inline (request thread)', inline, stored, args.clients, args.requests)
+    for queue in (args.requests, args.workers * 2):
+        hasher = PasswordHasher(rounds=args.rounds, workers=args.workers, queue_size=queue, timeout=60)
+        run(f'pool queue={queue}', hasher.verify, stored, args.clients, args.requests)
+        hasher.shutdown()
+
+
+if __name__ == '__main__':
+    main()
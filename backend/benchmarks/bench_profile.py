@@ -0,0 +1,124 @@
+"""
+Profile Read Benchmark
+Compares the legacy six-query profile read with the single-aggregation pipeline
+(title/skill definitions served from the catalog cache).
+Run: python benchmarks/bench_profile.py [--iterations 500]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from profile_pipeline import fetch_profile
+from catalog_cache import CatalogCache
+
+
+def legacy_profile(db, user_id):
+    """The original get_profile read path (six sequential queries)"""
+    from bson.objectid import ObjectId
+    user = db.users.find_one({'_id': ObjectId(user_id)})
+    stats = db.stats.find_one({'user_id': user_id})
+
+    user_titles = list(db.user_titles.find({'user_id': user_id}))
+    title_ids = [t['title_id'] for t in user_titles]
+    if title_ids:
+        for t in db.defined_titles.find({'title_id': {'$in': title_ids}}):
+            for stat, val in t.get('stat_bonus', {}).items():
+                if stat in stats:
+                    stats[stat] += int(val)
+
+    user_skills = list(db.user_skills.find({'user_id': user_id}))
+    skill_ids = [s['skill_id'] for s in user_skills]
+    if skill_ids:
+        for s in db.skills.find({'skill_id': {'$in': skill_ids}, 'type': 'passive'}):
+            user_skill = next((us for us in user_skills if us['skill_id'] == s['skill_id']), None)
+            level = user_skill.get('level', 1) if user_skill else 1
+            scaling = s.get('scaling', {})
+            for stat, val in s.get('stat_bonus', {}).items():
+                if stat in stats:
+                    stats[stat] += int(val + (level * scaling.get(stat, 0)))
+    return user, stats, user_titles
+
+
+def seed_player(db, n_titles, n_skills):
+    """Insert a throwaway player with titles and passive skills"""
+    user_id = str(db.users.insert_one({
+        'username': f'bench_{int(time.time() * 1000)}',
+        'email': 'bench@example.com',
+        'level': 10, 'exp': 0, 'exp_required': 10000, 'skill_points': 0
+    }).inserted_id)
+    db.stats.insert_one({
+        'user_id': user_id, 'strength': 10, 'agility': 10, 'intelligence': 10,
+        'stamina': 50, 'health': 100, 'max_health': 100
+    })
+    for i in range(n_titles):
+        db.user_titles.insert_one({'user_id': user_id, 'title_id': f'bench_title_{i}', 'title_name': f'Bench {i}'})
+        db.defined_titles.insert_one({'title_id': f'bench_title_{i}', 'stat_bonus': {'strength': 1}})
+    for i in range(n_skills):
+        db.user_skills.insert_one({'user_id': user_id, 'skill_id': f'bench_skill_{i}', 'level': 3})
+        db.skills.insert_one({'skill_id': f'bench_skill_{i}', 'type': 'passive',
+                              'stat_bonus': {'agility': 2}, 'scaling': {'agility': 1}})
+    return user_id
+
+
+def cleanup(db, user_id):
+    from bson.objectid import ObjectId
+    db.users.delete_one({'_id': ObjectId(user_id)})
+    db.stats.delete_many({'user_id': user_id})
+    db.user_titles.delete_many({'user_id': user_id})
+    db.user_skills.delete_many({'user_id': user_id})
+    db.defined_titles.delete_many({'title_id': {'$regex': '^bench_title_'}})
+    db.skills.delete_many({'skill_id': {'$regex': '^bench_skill_'}})
+
+
+def measure(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'p50': statistics.median(samples),
+        'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--mongo-uri', default=os.getenv('MONGO_URI', 'mongodb://localhost:27017/the_system'))
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--titles', type=int, default=5)
+    parser.add_argument('--skills', type=int, default=5)
+    args = parser.parse_args()
+
+    db = MongoClient(args.mongo_uri, serverSelectionTimeoutMS=5000)['the_system']
+    user_id = seed_player(db, args.titles, args.skills)
+    catalog = CatalogCache(db)
+    try:
+        # Sanity check: both paths must agree before timing them
+        _, legacy_stats, _ = legacy_profile(db, user_id)
+        _, new_stats, _ = fetch_profile(db, user_id, catalog)
+        for stat in ('strength', 'agility', 'intelligence', 'stamina', 'health'):
+            assert legacy_stats[stat] == new_stats[stat], f'{stat} mismatch'
+
+        results = {
+            'legacy (6 queries)': measure(lambda: legacy_profile(db, user_id), args.iterations),
+            'pipeline + catalog cache': measure(lambda: fetch_profile(db, user_id, catalog), args.iterations)
+        }
+    finally:
+        cleanup(db, user_id)
+
+    print(f"\nProfile read latency over {args.iterations} iterations (ms)")
+    print("-" * 50)
+    for name, r in results.items():
+        print(f"{name:<26} p50={r['p50']:7.2f}  p99={r['p99']:7.2f}")
+
+
+if __name__ == '__main__':
+    main()
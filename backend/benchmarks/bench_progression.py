@@ -0,0 +1,45 @@
+"""
+Progression Microbenchmark
+Closed-form level-up vs the old per-level loop for large EXP grants (pure Python, no DB).
+Run: python benchmarks/bench_progression.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from progression import compute_progression, exp_required_for
+
+
+def legacy_loop(level, exp, exp_required, gain):
+    """The old User.add_exp algorithm; each iteration was level_up + get_user_by_id"""
+    exp += gain
+    round_trips = 2  # initial read + final exp write
+    while exp >= exp_required:
+        exp -= exp_required
+        level += 1
+        exp_required = exp_required_for(level)
+        round_trips += 2
+    return level, exp, exp_required, round_trips
+
+
+def main():
+    print(f"\n{'grant':>14} {'levels':>7} {'loop µs':>10} {'closed µs':>10} {'old DB trips':>13} {'new DB trips':>13}")
+    print("-" * 72)
+    for gain in (500, 10_000, 1_000_000, 100_000_000, 10_000_000_000):
+        level, exp, req, trips = legacy_loop(1, 0, 100, gain)
+        result = compute_progression(1, 0, 100, gain)
+        assert (result['level'], result['exp'], result['exp_required']) == (level, exp, req)
+
+        n = 2000
+        loop_us = timeit.timeit(lambda: legacy_loop(1, 0, 100, gain), number=n) / n * 1e6
+        closed_us = timeit.timeit(lambda: compute_progression(1, 0, 100, gain), number=n) / n * 1e6
+        new_trips = 1 if not result['levels_gained'] else 3
+
+        print(f"{gain:>14,} {result['levels_gained']:>7} {loop_us:>10.2f} {closed_us:>10.2f} {trips:>13} {new_trips:>13}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Catalog Cache
+Process-local copy of the static definition collections (skills, titles, system quests, shop items)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from config import Config
+from instrumentation import attributed_to
+
+# name -> (collection, key field, filter, projection)
+CATALOGS = {
+    'skills': ('skills', 'skill_id', {}, {'_id': 0}),
+    'titles': ('defined_titles', 'title_id', {}, {'_id': 0}),
+    'quests': ('quests', 'quest_id', {'user_id': {'$exists': False}}, None),
+    'shop_items': ('shop_items', 'item_id', {}, {'_id': 0}),
+}
+
+
+class CatalogCache:
+    """
+    Serves catalog documents from memory with O(1) lookups by their id field.
+
+    Entries are reloaded when older than `ttl` seconds. A background thread
+    marks a catalog stale as soon as a change stream reports a write to it;
+    when change streams are unavailable (standalone mongod, local stand-ins)
+    the same thread falls back to reloading every catalog on a poll interval.
+    """
+
+    def __init__(self, db, ttl=None, poll_interval=None):
+        self.db = db
+        self.ttl = ttl if ttl is not None else Config.CATALOG_CACHE_TTL
+        self.poll_interval = poll_interval if poll_interval is not None else Config.CATALOG_POLL_INTERVAL
+        self._lock = threading.Lock()
+        self._entries = {}       # name -> {key: doc}
+        self._loaded_at = {}     # name -> monotonic timestamp
+        self._versions = {}      # name -> content hash (identical across workers)
+        self._watcher_pid = None
+        self._stop = threading.Event()
+
+    # --- Reads ---
+
+    def get(self, name, key):
+        """Return a copy of one definition, or None"""
+        doc = self._catalog(name).get(key)
+        return dict(doc) if doc is not None else None
+
+    def all(self, name):
+        """Return copies of every definition in a catalog"""
+        return [dict(doc) for doc in self._catalog(name).values()]
+
+    def version(self, name):
+        """Content hash of a catalog; changes whenever its definitions do"""
+        self._catalog(name)
+        return self._versions[name]
+
+    def _catalog(self, name):
+        self._ensure_watcher()
+        loaded_at = self._loaded_at.get(name)
+        if loaded_at is None or time.monotonic() - loaded_at > self.ttl:
+            # Refills are charged to the cache, not to the request that found it stale
+            with attributed_to(f'cache:{name}'):
+                self.reload(name)
+        return self._entries[name]
+
+    # --- Invalidation ---
+
+    def reload(self, name):
+        """Re-read a catalog from MongoDB and swap it in"""
+        collection, key, query, projection = CATALOGS[name]
+        docs = {}
+        for doc in self.db[collection].find(query, projection):
+            if key in doc:
+                docs[doc[key]] = doc
+        digest = hashlib.md5(
+            json.dumps([docs[k] for k in sorted(docs)], sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()[:12]
+        with self._lock:
+            self._entries[name] = docs
+            self._versions[name] = digest
+            self._loaded_at[name] = time.monotonic()
+
+    def invalidate(self, name=None):
+        """Mark one catalog (or all of them) stale so the next read reloads it"""
+        with self._lock:
+            for n in ([name] if name else list(CATALOGS)):
+                self._loaded_at.pop(n, None)
+
+    def _ensure_watcher(self):
+        # Started lazily (and restarted after fork) so every worker process gets its own thread
+        if self._watcher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch, name='catalog-cache-watcher', daemon=True).start()
+
+    def _watch(self):
+        by_collection = {spec[0]: name for name, spec in CATALOGS.items()}
+        pipeline = [{'$match': {'ns.coll': {'$in': list(by_collection)}}}]
+        try:
+            with self.db.watch(pipeline) as stream:
+                while not self._stop.is_set():
+                    change = stream.try_next()
+                    if change:
+                        self.invalidate(by_collection.get(change['ns']['coll']))
+        except Exception as e:
+            if self._stop.is_set():
+                return
+            print(f"⚠️  Catalog change stream unavailable ({e}), polling every {self.poll_interval}s")
+            self._poll()
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_interval):
+            for name in CATALOGS:
+                try:
+                    self.reload(name)
+                except Exception as e:
+                    print(f"Catalog poll error ({name}): {e}")
+
+    def close(self):
+        """Stop the watcher thread (worker shutdown)"""
+        self._stop.set()
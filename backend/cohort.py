@@ -0,0 +1,226 @@
+"""
+Cohort Analysis
+Batch version of system_logic's weakness/burnout checks over every player at once (NumPy),
+stored per user in `cohort_insights` so profile reads only look results up.
+Run: python cohort.py   (one-off analysis; needs numpy)
+"""
+
+import datetime
+import uuid
+
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError
+
+from config import Config
+from jobs import PeriodicJob
+from stamina import DEFAULT_MAX_STAMINA, regen_tick
+from system_logic import BURNOUT_STAMINA_RATIO, CORE_STATS, LAGGING_PERCENTILE, WEAKNESS_RATIO
+from versioning import bump_state_versions
+
+try:
+    import numpy as np
+except ImportError:  # Optional: only the batch job needs it
+    np = None
+
+COLLECTION = 'cohort_insights'
+STATE = 'analytics_state'
+STATE_ID = 'cohort_analysis'
+# What the profile shows from an insight: the percentiles, and the notice built from `lagging`
+VISIBLE_FIELDS = ('percentiles', 'lagging')
+STATS_FIELDS = {'_id': 0, 'user_id': 1, 'stamina': 1, 'max_stamina': 1, 'stamina_updated_at': 1,
+                **{stat: 1 for stat in CORE_STATS}}
+
+
+def load_arrays(db, now=None, chunk_size=None):
+    """
+    Streams every stats document in chunks into column arrays:
+    {'user_id': object array, 'stats': (n, len(CORE_STATS)) float array,
+     'stamina': current stamina (regen applied), 'max_stamina'}.
+    """
+    now = now or datetime.datetime.utcnow()
+    chunk_size = chunk_size or Config.COHORT_CHUNK_SIZE
+    now_tick = regen_tick(now)
+    columns = {'user_id': [], 'stats': [], 'stamina': [], 'max_stamina': [], 'tick': []}
+
+    def flush(rows):
+        columns['user_id'].append(np.array([r['user_id'] for r in rows], dtype=object))
+        columns['stats'].append(np.array([[r.get(s, 10) for s in CORE_STATS] for r in rows], dtype=float))
+        columns['stamina'].append(np.array([r.get('stamina', 0) for r in rows], dtype=float))
+        columns['max_stamina'].append(np.array([r.get('max_stamina', DEFAULT_MAX_STAMINA) for r in rows], dtype=float))
+        columns['tick'].append(np.array(
+            [regen_tick(r['stamina_updated_at']) if r.get('stamina_updated_at') else now_tick for r in rows],
+            dtype=float
+        ))
+
+    rows = []
+    for doc in db.stats.find({}, STATS_FIELDS).batch_size(chunk_size):
+        rows.append(doc)
+        if len(rows) >= chunk_size:
+            flush(rows)
+            rows = []
+    if rows:
+        flush(rows)
+    if not columns['user_id']:
+        return None
+
+    arrays = {key: np.concatenate(parts) for key, parts in columns.items()}
+    # stamina.current_stamina, vectorized: elapsed ticks, capped at max (never lowers a higher value)
+    regenerated = arrays['stamina'] + np.maximum(now_tick - arrays.pop('tick'), 0) * Config.STAMINA_REGEN_AMOUNT
+    arrays['stamina'] = np.maximum(arrays['stamina'], np.minimum(arrays['max_stamina'], regenerated))
+    return arrays
+
+
+def percentile_ranks(values):
+    """Per column: % of players at or below each value (0-100)"""
+    ordered = np.sort(values, axis=0)
+    ranks = np.column_stack([
+        np.searchsorted(ordered[:, j], values[:, j], side='right') for j in range(values.shape[1])
+    ])
+    return ranks * 100.0 / len(values)
+
+
+def analyze(arrays):
+    """
+    Whole-population results as arrays (one row per player):
+    weak (own-average weakness, as analyze_weakness), lagging (bottom
+    LAGGING_PERCENTILE of all players), percentiles, burnout_risk (0-1,
+    share of stamina missing) and burnout (predict_burnout's threshold).
+    """
+    stats = arrays['stats']
+    ratio = arrays['stamina'] / np.maximum(arrays['max_stamina'], 1)
+    percentiles = percentile_ranks(stats)
+    return {
+        'weak': stats < stats.mean(axis=1, keepdims=True) * WEAKNESS_RATIO,
+        'lagging': percentiles <= LAGGING_PERCENTILE,
+        'percentiles': percentiles,
+        'burnout_risk': np.clip(1 - ratio, 0, 1),
+        'burnout': ratio < BURNOUT_STAMINA_RATIO
+    }
+
+
+def summarize(arrays, results):
+    """Population figures logged after each run"""
+    return {
+        'players': len(arrays['user_id']),
+        'median': {stat: float(v) for stat, v in zip(CORE_STATS, np.median(arrays['stats'], axis=0))},
+        'weak_share': {stat: float(v) for stat, v in zip(CORE_STATS, results['weak'].mean(axis=0))},
+        'burnout_share': float(results['burnout'].mean())
+    }
+
+
+def visible(insight):
+    return tuple(insight.get(field) for field in VISIBLE_FIELDS) if insight else None
+
+
+def store(db, arrays, results, now, chunk_size=None):
+    """
+    Replaces every player's cohort_insights doc in unordered bulks; drops
+    players no longer present. Bumps state_version only for players whose
+    profile would change (VISIBLE_FIELDS), read back one $in per chunk:
+    most players' rounded percentiles and notice survive a run unchanged,
+    and their cached profiles stay valid.
+    """
+    chunk_size = chunk_size or Config.COHORT_CHUNK_SIZE
+    run_id = uuid.uuid4().hex
+    user_ids = arrays['user_id']
+    ops, docs = [], []
+    for i, user_id in enumerate(user_ids):
+        doc = {
+            'user_id': user_id,
+            'percentiles': {stat: round(float(p), 1) for stat, p in zip(CORE_STATS, results['percentiles'][i])},
+            'weak': [stat for stat, flag in zip(CORE_STATS, results['weak'][i]) if flag],
+            'lagging': [stat for stat, flag in zip(CORE_STATS, results['lagging'][i]) if flag],
+            'burnout_risk': round(float(results['burnout_risk'][i]), 3),
+            'burnout': bool(results['burnout'][i]),
+            'run_id': run_id,
+            'computed_at': now
+        }
+        docs.append(doc)
+        ops.append(ReplaceOne({'user_id': user_id}, doc, upsert=True))
+        if len(ops) >= chunk_size or i == len(user_ids) - 1:
+            chunk = [d['user_id'] for d in docs]
+            previous = {old['user_id']: old for old in db[COLLECTION].find(
+                {'user_id': {'$in': chunk}}, {'_id': 0, 'user_id': 1, **{field: 1 for field in VISIBLE_FIELDS}})}
+            db[COLLECTION].bulk_write(ops, ordered=False)
+            changed = [d['user_id'] for d in docs if visible(previous.get(d['user_id'])) != visible(d)]
+            if changed:
+                bump_state_versions(db, changed)
+            ops, docs = [], []
+    db[COLLECTION].delete_many({'run_id': {'$ne': run_id}})
+
+
+def run_analysis(db, now=None, chunk_size=None):
+    """Load, analyze and store; returns the population summary (None if there are no players)"""
+    if np is None:
+        raise RuntimeError('Cohort analysis requires numpy (pip install numpy)')
+    now = now or datetime.datetime.utcnow()
+    arrays = load_arrays(db, now, chunk_size)
+    if arrays is None:
+        return None
+    results = analyze(arrays)
+    store(db, arrays, results, now, chunk_size)
+    return summarize(arrays, results)
+
+
+def claim_run(db, interval, now=None):
+    """True for the one worker that gets this interval's run (the others skip it)"""
+    now = now or datetime.datetime.utcnow()
+    try:
+        # Not due: the filter misses and the upsert collides with the existing _id
+        db[STATE].update_one(
+            {'_id': STATE_ID, '$or': [{'next_run': {'$lte': now}}, {'next_run': {'$exists': False}}]},
+            {'$set': {'next_run': now + datetime.timedelta(seconds=interval), 'claimed_at': now}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+class CohortJob(PeriodicJob):
+    """
+    Re-runs the analysis every `interval` seconds on one worker at a time.
+    Disabled (with a notice) when numpy is not installed.
+    """
+
+    name = 'cohort-analysis'
+
+    def __init__(self, db, interval=None):
+        interval = interval if interval is not None else Config.COHORT_ANALYSIS_INTERVAL
+        if np is None and interval > 0:
+            print("⚠️  numpy not installed: cohort analysis disabled")
+            interval = 0
+        super().__init__(interval)
+        self.db = db
+
+    def run(self):
+        if not claim_run(self.db, self.interval):
+            return None
+        summary = run_analysis(self.db)
+        if summary:
+            print(f"📊 Cohort analysis: {summary['players']} player(s), "
+                  f"{summary['burnout_share']:.0%} at burnout risk")
+        return summary
+
+
+def main():
+    """One-off analysis (cron, or deployments without long-lived workers)"""
+    from migrations import _connect
+
+    client = _connect()
+    try:
+        summary = run_analysis(client['the_system'])
+        if summary is None:
+            print("⚠️  No players to analyze")
+            return
+        print(f"✅ Analyzed {summary['players']} player(s)")
+        for stat in CORE_STATS:
+            print(f"   {stat:<13} median {summary['median'][stat]:>6.1f}   "
+                  f"weak {summary['weak_share'][stat]:.0%}")
+        print(f"   burnout risk  {summary['burnout_share']:.0%}")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
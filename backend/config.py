@@ -1,12 +1,59 @@
 import os
+import sys
 from datetime import timedelta
 
+from dotenv import load_dotenv
+
+
+def find_env_file():
+    """
+    The .env every entry point reads: next to the executable (desktop
+    build), in the app folder, its parent, or the working directory
+    """
+    base = sys._MEIPASS if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__))
+    candidates = [
+        os.path.join(os.path.dirname(sys.executable), '.env') if getattr(sys, 'frozen', False) else None,
+        os.path.join(base, '.env'),
+        os.path.join(base, '..', '.env'),
+        '.env'
+    ]
+    return next((path for path in candidates if path and os.path.exists(path)), None)
+
+
+# Loaded on first import, before Config reads the environment (set variables win)
+ENV_FILE = find_env_file()
+if ENV_FILE:
+    load_dotenv(ENV_FILE)
+
+
 class Config:
     """Application configuration class"""
     
     # MongoDB Configuration
     MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/the_system')
     
+    # Storage: 'mongo', or 'sqlite' for the single-user desktop build (embedded file, see local_store.py)
+    DATASTORE = os.getenv('DATASTORE', 'mongo')
+    LOCAL_DB_PATH = os.getenv('LOCAL_DB_PATH', 'the_system.db')  # relative paths sit next to the executable
+    LOCAL_SYNC_URI = os.getenv('LOCAL_SYNC_URI')  # MongoDB that local changes are pushed to; unset stays offline
+    LOCAL_SYNC_INTERVAL = int(os.getenv('LOCAL_SYNC_INTERVAL', 300))  # seconds
+    LOCAL_SYNC_BATCH = int(os.getenv('LOCAL_SYNC_BATCH', 500))  # documents per bulk write
+    
+    # MongoDB client pool (per worker process; keep MAX_POOL_SIZE >= gunicorn threads)
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 50))
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 5))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+    
+    # /metrics (Prometheus text format); when set, scrapers must send "Authorization: Bearer <token>"
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    # Per-route @query_budget checks: off | warn | strict (raises on overrun under app.testing, else warns)
+    QUERY_BUDGET_MODE = os.getenv('QUERY_BUDGET_MODE', 'warn')
+    # Live profiling (/api/admin/profile, X-Profile-Token); unset disables it
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')  # single-request cProfile dumps (.prof)
+    PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 50))  # newest dumps kept per directory
+    
     # JWT Configuration
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-this-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
@@ -18,6 +65,59 @@ class Config:
     # CORS Configuration
     CORS_HEADERS = 'Content-Type'
     
+    # Password hashing (bcrypt cost and the bounded pool that runs it)
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+    HASH_WORKERS = int(os.getenv('HASH_WORKERS', 4))
+    HASH_QUEUE_SIZE = int(os.getenv('HASH_QUEUE_SIZE', 16))  # waiting jobs before 429
+    HASH_TIMEOUT = int(os.getenv('HASH_TIMEOUT', 10))  # seconds
+    
+    # Live events (/api/events SSE). Opt-in: each open stream holds a gthread thread for up to
+    # EVENT_MAX_AGE, so streams per worker are capped (503 past the cap; 0 = no cap, for gevent)
+    LIVE_EVENTS = os.getenv('LIVE_EVENTS', 'False') == 'True'
+    EVENT_MAX_STREAMS = int(os.getenv('EVENT_MAX_STREAMS', int(os.getenv('GUNICORN_THREADS', 8)) // 2))
+    # 'mongo' (multi-worker) or 'local' (single process; the default with DATASTORE=sqlite)
+    EVENT_BROKER = os.getenv('EVENT_BROKER', 'local' if DATASTORE == 'sqlite' else 'mongo')
+    EVENT_QUEUE_SIZE = int(os.getenv('EVENT_QUEUE_SIZE', 100))  # per connection
+    EVENT_POLL_INTERVAL = float(os.getenv('EVENT_POLL_INTERVAL', 1))  # seconds, used without change streams
+    EVENT_HEARTBEAT = int(os.getenv('EVENT_HEARTBEAT', 15))  # seconds
+    EVENT_MAX_AGE = int(os.getenv('EVENT_MAX_AGE', 300))  # seconds before the client reconnects
+    EVENT_TICKET_TTL = int(os.getenv('EVENT_TICKET_TTL', 30))  # seconds a single-use stream ticket stays valid
+    EVENT_TTL = int(os.getenv('EVENT_TTL', 3600))  # seconds events are kept in MongoDB
+    
+    # Stamina regeneration (computed on read, see stamina.py)
+    STAMINA_REGEN_AMOUNT = int(os.getenv('STAMINA_REGEN_AMOUNT', 1))  # stamina per tick
+    STAMINA_REGEN_SECONDS = int(os.getenv('STAMINA_REGEN_SECONDS', 180))  # tick length
+    STAMINA_NOTIFY_INTERVAL = int(os.getenv('STAMINA_NOTIFY_INTERVAL', 60))  # seconds; 0 disables the notifier thread
+    
+    # Progress log (buffered history writes, see progress_log.py)
+    PROGRESS_LOG_BATCH = int(os.getenv('PROGRESS_LOG_BATCH', 200))  # events per insert_many
+    PROGRESS_LOG_FLUSH_INTERVAL = float(os.getenv('PROGRESS_LOG_FLUSH_INTERVAL', 1))  # seconds
+    PROGRESS_LOG_MAX_BUFFER = int(os.getenv('PROGRESS_LOG_MAX_BUFFER', 10000))  # events held before dropping
+    
+    # Analytics rollups (progress_logs -> analytics_rollups, see analytics.py)
+    ANALYTICS_ROLLUP_INTERVAL = int(os.getenv('ANALYTICS_ROLLUP_INTERVAL', 300))  # seconds; 0 disables the rollup thread
+    ANALYTICS_ROLLUP_BATCH = int(os.getenv('ANALYTICS_ROLLUP_BATCH', 1000))  # events per bulk write
+    ANALYTICS_ROLLUP_LAG = int(os.getenv('ANALYTICS_ROLLUP_LAG', 30))  # seconds; newer events wait for the next run
+    
+    # Cohort analysis (whole user base with numpy, see cohort.py)
+    COHORT_ANALYSIS_INTERVAL = int(os.getenv('COHORT_ANALYSIS_INTERVAL', 3600))  # seconds; 0 disables the job
+    COHORT_CHUNK_SIZE = int(os.getenv('COHORT_CHUNK_SIZE', 1000))  # stats docs per read/write batch
+    
+    # Dungeon boss damage (batched from the client, see dungeon_damage.py)
+    DUNGEON_MAX_BATCH = int(os.getenv('DUNGEON_MAX_BATCH', 100))  # events per request
+    DUNGEON_MAX_HIT = int(os.getenv('DUNGEON_MAX_HIT', 1000))  # damage per event
+    DUNGEON_EXPIRY_GRACE = int(os.getenv('DUNGEON_EXPIRY_GRACE', 300))  # seconds past end_time before a session fails
+    DUNGEON_SWEEP_INTERVAL = int(os.getenv('DUNGEON_SWEEP_INTERVAL', 60))  # seconds; 0 disables the sweeper thread
+    
+    # Leaderboard (in-memory top N)
+    LEADERBOARD_SIZE = int(os.getenv('LEADERBOARD_SIZE', 100))
+    LEADERBOARD_TTL = int(os.getenv('LEADERBOARD_TTL', 60))  # seconds between DB refreshes
+    LEADERBOARD_MAX_AGE = int(os.getenv('LEADERBOARD_MAX_AGE', 30))  # Cache-Control for clients
+    
+    # Catalog cache (skills, titles, system quests, shop items)
+    CATALOG_CACHE_TTL = int(os.getenv('CATALOG_CACHE_TTL', 300))  # seconds
+    CATALOG_POLL_INTERVAL = int(os.getenv('CATALOG_POLL_INTERVAL', 60))  # seconds, used without change streams
+    
     # Game Constants
     EXP_MULTIPLIER = 100  # Base EXP required = level² × 100
     
@@ -27,12 +127,16 @@ class Config:
         'agility': 2,
         'intelligence': 2,
         'stamina': 3,
-        'health': 10
+        'max_health': 10
     }
     
     # Skill points granted per level
     SKILL_POINTS_PER_LEVEL = 1
     
+    # Max stamina = base + level × per-level bonus
+    BASE_MAX_STAMINA = 50
+    MAX_STAMINA_PER_LEVEL = 5
+    
     # Quest difficulty thresholds
     STAMINA_LOW_THRESHOLD = 30
     BEGINNER_LEVEL_THRESHOLD = 5
@@ -0,0 +1,61 @@
+"""
+Dashboard Bootstrap
+Reads everything the dashboard needs on load: one profile aggregation plus concurrent quest reads
+"""
+
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from profile_pipeline import fetch_profile
+from progress_log import recent_history
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+
+
+def _executor():
+    # Created lazily (and recreated after fork) so each worker process owns its threads
+    global _pool, _pool_pid
+    if _pool_pid != os.getpid():
+        with _lock:
+            if _pool_pid != os.getpid():
+                _pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='dashboard-reads')
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def _submit(pool, fn, *args):
+    # Carry the request's context along so the reads are attributed to it (instrumentation.py)
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+
+def fetch_dashboard(db, catalog, user_id):
+    """
+    Runs the independent reads at once (the user/stats/titles/skills
+    aggregation, custom quests, per-user quests and recent history), so the request costs one
+    round trip of latency. Definitions come from the catalog cache.
+
+    Returns None if the user or their stats document is missing.
+    """
+    pool = _executor()
+    profile = _submit(pool, fetch_profile, db, user_id, catalog)
+    custom_quests = _submit(pool, lambda: list(db.custom_quests.find({'user_id': user_id})))
+    user_quests = _submit(pool, lambda: list(db.quests.find({'user_id': user_id})))
+    history = _submit(pool, recent_history, db, user_id)
+
+    user, stats, user_titles = profile.result()
+    if not user or not stats:
+        return None
+
+    return {
+        'user': user,
+        'stats': stats,
+        'user_titles': user_titles,
+        'user_skills': user.get('user_skills', []),
+        'custom_quests': custom_quests.result(),
+        'user_quests': user_quests.result(),
+        'history': history.result()
+    }
@@ -0,0 +1,109 @@
+"""
+Dungeon Damage
+Applies batched, sequence-numbered boss damage in one atomic update per batch
+"""
+
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+
+from config import Config
+
+
+class DamageError(Exception):
+    """Raised for a malformed damage batch; carries the HTTP status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def normalize_events(events):
+    """
+    Validates a client batch of {'seq': int, 'damage': int} events.
+    Damage is clamped to 0..DUNGEON_MAX_HIT per event.
+    """
+    if not isinstance(events, list) or not events:
+        raise DamageError('events must be a non-empty list')
+    if len(events) > Config.DUNGEON_MAX_BATCH:
+        raise DamageError(f'At most {Config.DUNGEON_MAX_BATCH} events per batch')
+
+    normalized = []
+    for event in events:
+        try:
+            seq = int(event['seq'])
+            damage = int(event.get('damage', 0))
+        except (KeyError, TypeError, ValueError):
+            raise DamageError('Each event needs an integer seq and damage')
+        if seq < 1:
+            raise DamageError('seq must be positive')
+        normalized.append({'seq': seq, 'damage': min(max(damage, 0), Config.DUNGEON_MAX_HIT)})
+    return normalized
+
+
+def damage_pipeline(events):
+    """
+    Update pipeline that sums only the events newer than the session's
+    last_seq, subtracts them from boss_current_hp with a floor of 0, and
+    advances last_seq. A retried batch (or any replayed seq) adds nothing,
+    so the client can resend freely.
+    """
+    last_seq = {'$ifNull': ['$last_seq', 0]}
+    fresh = {'$filter': {
+        'input': {'$literal': events},
+        'as': 'e',
+        'cond': {'$gt': ['$$e.seq', last_seq]}
+    }}
+    return [
+        {'$set': {
+            'boss_current_hp': {'$max': [0, {'$subtract': [
+                '$boss_current_hp',
+                {'$sum': {'$map': {'input': fresh, 'as': 'e', 'in': '$$e.damage'}}}
+            ]}]},
+            'last_seq': {'$max': [last_seq, max(e['seq'] for e in events)]}
+        }}
+    ]
+
+
+def hit_pipeline(damage):
+    """
+    Update pipeline for one unsequenced (legacy) hit: the server assigns it
+    the next seq, so concurrent hits each land instead of colliding on a
+    seq read beforehand.
+    """
+    return [
+        {'$set': {
+            'boss_current_hp': {'$max': [0, {'$subtract': ['$boss_current_hp', damage]}]},
+            'last_seq': {'$add': [{'$ifNull': ['$last_seq', 0]}, 1]}
+        }}
+    ]
+
+
+def _update_session(db, user_id, dungeon_id, pipeline):
+    try:
+        oid = ObjectId(dungeon_id)
+    except Exception:
+        raise DamageError('Invalid dungeon_id')
+
+    return db.active_dungeons.find_one_and_update(
+        {'_id': oid, 'user_id': user_id, 'status': 'active'},
+        pipeline,
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def apply_damage(db, user_id, dungeon_id, events):
+    """
+    Applies a batch to the user's active dungeon and returns the post-update
+    session (authoritative boss_current_hp and last_seq), or None if there is
+    no such active dungeon.
+    """
+    return _update_session(db, user_id, dungeon_id, damage_pipeline(normalize_events(events)))
+
+
+def apply_hit(db, user_id, dungeon_id, damage):
+    """apply_damage for a single hit without a client seq (it is not replay-safe)"""
+    try:
+        damage = min(max(int(damage), 0), Config.DUNGEON_MAX_HIT)
+    except (TypeError, ValueError):
+        raise DamageError('damage must be an integer')
+    return _update_session(db, user_id, dungeon_id, hit_pipeline(damage))
@@ -0,0 +1,178 @@
+"""
+Dungeon Sessions
+Closing, archiving and expiring dungeon sessions. Only running sessions live in
+`active_dungeons`; finished ones move to `dungeon_history`.
+Run: python dungeon_sessions.py   (one-off sweep of overdue sessions)
+"""
+
+import datetime
+import uuid
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from config import Config
+from jobs import PeriodicJob
+
+HISTORY = 'dungeon_history'
+CLAIM_TIMEOUT = 600  # seconds before a sweep that died mid-way is picked up again
+PENALTY_MEMORY = 10  # latest swept session ids kept on stats.penalized_sessions
+
+# Failing (fleeing, or letting the timer run out) costs 20% of max health
+PENALTY_RATIO = 0.2
+PENALTY_UPDATE = [
+    {'$set': {'health': {'$max': [0, {'$subtract': [
+        '$health',
+        {'$floor': {'$multiply': [{'$ifNull': ['$max_health', 100]}, PENALTY_RATIO]}}
+    ]}]}}}
+]
+
+
+def penalty_for(stats):
+    return int(stats.get('max_health', 100) * PENALTY_RATIO)
+
+
+def expiry_notice(session):
+    """'notice' event payload telling the dashboard an overdue session was closed"""
+    return {
+        'message': f"{session.get('rank', '?')}-Rank gate closed: time ran out",
+        'dungeon_expired': str(session['_id'])
+    }
+
+
+def claim_session(db, user_id, dungeon_id, extra_filter=None):
+    """
+    Atomically removes the user's running session from the hot collection and
+    returns it (None if it is gone), so rewards/penalties apply at most once.
+    """
+    return db.active_dungeons.find_one_and_delete({
+        '_id': dungeon_id,
+        'user_id': user_id,
+        'status': 'active',
+        **(extra_filter or {})
+    })
+
+
+def archive_sessions(db, sessions, status, when=None):
+    """
+    Writes closed sessions to dungeon_history (same _id) in one insert.
+    Sessions already there (a retried sweep) are left as they are.
+    """
+    if not sessions:
+        return
+    when = when or datetime.datetime.utcnow()
+    try:
+        db[HISTORY].insert_many(
+            [{**s, 'status': status, 'ended_at': when} for s in sessions],
+            ordered=False
+        )
+    except BulkWriteError as e:
+        if any(err.get('code') != 11000 for err in e.details['writeErrors']):
+            raise
+
+
+def apply_penalties(db, sessions):
+    """
+    Failure penalty for many sessions in one bulk write. Each update records
+    its session in stats.penalized_sessions and skips players who already
+    have it, so a sweep retried after a crash never charges a session twice.
+    """
+    if not sessions:
+        return
+    db.stats.bulk_write([
+        UpdateOne(
+            {'user_id': s['user_id'], 'penalized_sessions': {'$ne': s['_id']}},
+            PENALTY_UPDATE + [{'$set': {'penalized_sessions': {'$slice': [
+                {'$concatArrays': [{'$ifNull': ['$penalized_sessions', []]}, [s['_id']]]},
+                -PENALTY_MEMORY
+            ]}}}]
+        )
+        for s in sessions
+    ], ordered=False)
+
+
+def sweep_expired(db, now=None, user_id=None, grace=None):
+    """
+    Fails every running session whose end_time passed more than `grace`
+    seconds ago: claims them with one update_many (safe with several
+    sweepers running), applies the penalty in bulk, archives them and
+    deletes them from active_dungeons. Pass user_id to sweep one player.
+    Sessions left claimed by a sweep that crashed are retried after
+    CLAIM_TIMEOUT; apply_penalties skips the ones it already charged.
+
+    Returns the expired sessions.
+    """
+    now = now or datetime.datetime.utcnow()
+    grace = grace if grace is not None else Config.DUNGEON_EXPIRY_GRACE
+    query = {'$or': [
+        {'status': 'active', 'end_time': {'$lt': now - datetime.timedelta(seconds=grace)}},
+        {'status': 'expiring', 'claimed_at': {'$lt': now - datetime.timedelta(seconds=CLAIM_TIMEOUT)}}
+    ]}
+    if user_id:
+        query['user_id'] = user_id
+
+    sweep_id = uuid.uuid4().hex
+    claimed = db.active_dungeons.update_many(
+        query,
+        {'$set': {'status': 'expiring', 'sweep_id': sweep_id, 'claimed_at': now}}
+    )
+    if not claimed.modified_count:
+        return []
+
+    sessions = list(db.active_dungeons.find({'sweep_id': sweep_id}))
+    for s in sessions:
+        for field in ('status', 'sweep_id', 'claimed_at'):
+            s.pop(field, None)
+
+    apply_penalties(db, sessions)
+    archive_sessions(db, sessions, 'expired', now)
+    db.active_dungeons.delete_many({'sweep_id': sweep_id})
+    return sessions
+
+
+class DungeonSweeper(PeriodicJob):
+    """
+    Runs sweep_expired every `interval` seconds and hands each expired
+    session to `on_expired(session)`. Every worker may run one; the claim
+    step keeps them from double-processing a session.
+    """
+
+    name = 'dungeon-sweeper'
+
+    def __init__(self, db, interval=None, on_expired=None):
+        super().__init__(interval if interval is not None else Config.DUNGEON_SWEEP_INTERVAL)
+        self.db = db
+        self.on_expired = on_expired
+
+    def run(self):
+        sessions = sweep_expired(self.db)
+        if self.on_expired:
+            for session in sessions:
+                self.on_expired(session)
+        if sessions:
+            print(f"⏳ Expired {len(sessions)} dungeon session(s)")
+        return sessions
+
+
+def main():
+    """One-off sweep for deployments without long-lived workers (cron, Vercel)"""
+    from events import make_broker
+    from migrations import _connect
+    from versioning import bump_state_version
+
+    client = _connect()
+    try:
+        db = client['the_system']
+        broker = make_broker(db)
+        expired = sweep_expired(db)
+        for session in expired:
+            bump_state_version(db, session['user_id'])
+            broker.publish(session['user_id'], 'notice', expiry_notice(session))
+            broker.publish(session['user_id'], 'stale', {'path': 'dungeon_sweep'})
+        print(f"✅ Expired {len(expired)} dungeon session(s)")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""
+Event Bus
+Per-user pub/sub behind the /api/events Server-Sent Events stream.
+LocalBroker fans out within one process; MongoBroker fans out across workers via the `events` collection;
+NullBroker drops everything while LIVE_EVENTS is off.
+"""
+
+import datetime
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+
+from config import Config
+
+TICKETS = 'stream_tickets'
+
+
+class TooManyStreams(Exception):
+    """This worker already holds EVENT_MAX_STREAMS open streams"""
+
+
+class Subscription:
+    """One SSE connection's bounded mailbox"""
+
+    def __init__(self, user_id, maxsize):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Slow client: drop the oldest event rather than block publishers
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.queue.put_nowait(event)
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LocalBroker:
+    """In-memory fan-out for a single process (dev server, tests)"""
+
+    active = True  # False: nobody can subscribe, so publishers can skip building events
+
+    def __init__(self, queue_size=None, max_streams=None):
+        self.queue_size = queue_size or Config.EVENT_QUEUE_SIZE
+        self.max_streams = max_streams if max_streams is not None else Config.EVENT_MAX_STREAMS
+        self._lock = threading.Lock()
+        self._subscribers = {}  # user_id -> set of Subscription
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, self.queue_size)
+        with self._lock:
+            if self.max_streams and self._count() >= self.max_streams:
+                raise TooManyStreams(f'{self.max_streams} event streams already open in this worker')
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subs = self._subscribers.get(subscription.user_id)
+            if subs:
+                subs.discard(subscription)
+                if not subs:
+                    del self._subscribers[subscription.user_id]
+
+    def publish(self, user_id, event_type, data):
+        self._deliver(user_id, {'type': event_type, 'data': data})
+
+    def publish_many(self, events):
+        """[(user_id, event_type, data)] from a background job, in one write where the broker has one"""
+        for user_id, event_type, data in events:
+            self.publish(user_id, event_type, data)
+
+    def _deliver(self, user_id, event):
+        with self._lock:
+            subs = list(self._subscribers.get(user_id, ()))
+        for subscription in subs:
+            subscription.put(event)
+
+    def _count(self):
+        return sum(len(subs) for subs in self._subscribers.values())
+
+    def connections(self):
+        with self._lock:
+            return self._count()
+
+    def full(self):
+        return bool(self.max_streams) and self.connections() >= self.max_streams
+
+    def close(self):
+        pass
+
+
+class MongoBroker(LocalBroker):
+    """
+    Cross-worker fan-out: publish() inserts into the `events` collection
+    (TTL-indexed); each process runs one watcher thread that delivers
+    inserted events to its local subscribers. Uses a change stream when
+    available, otherwise polls for new _ids every EVENT_POLL_INTERVAL.
+    """
+
+    def __init__(self, db, queue_size=None, poll_interval=None, max_streams=None):
+        super().__init__(queue_size, max_streams)
+        self.db = db
+        self.poll_interval = poll_interval if poll_interval is not None else Config.EVENT_POLL_INTERVAL
+        self._watcher_pid = None
+        self._stop = threading.Event()
+
+    def subscribe(self, user_id):
+        self._ensure_watcher()
+        return super().subscribe(user_id)
+
+    def publish(self, user_id, event_type, data):
+        self.db.events.insert_one({
+            'user_id': user_id,
+            'type': event_type,
+            'data': data,
+            'created_at': datetime.datetime.utcnow()
+        })
+
+    def publish_many(self, events):
+        now = datetime.datetime.utcnow()
+        if events:
+            self.db.events.insert_many([
+                {'user_id': user_id, 'type': event_type, 'data': data, 'created_at': now}
+                for user_id, event_type, data in events
+            ], ordered=False)
+
+    def _ensure_watcher(self):
+        # Started lazily (and restarted after fork) so every worker process gets its own thread
+        if self._watcher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch, name='event-broker-watcher', daemon=True).start()
+
+    def _dispatch(self, doc):
+        self._deliver(doc['user_id'], {'type': doc['type'], 'data': doc['data']})
+
+    def _watch(self):
+        pipeline = [{'$match': {'operationType': 'insert'}}]
+        try:
+            with self.db.events.watch(pipeline) as stream:
+                while not self._stop.is_set():
+                    change = stream.try_next()
+                    if change:
+                        self._dispatch(change['fullDocument'])
+        except Exception as e:
+            if self._stop.is_set():
+                return
+            print(f"⚠️  Event change stream unavailable ({e}), polling every {self.poll_interval}s")
+            self._poll()
+
+    def _poll(self):
+        last = self.db.events.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+        last_id = last['_id'] if last else None
+        while not self._stop.wait(self.poll_interval):
+            try:
+                query = {'_id': {'$gt': last_id}} if last_id else {}
+                for doc in self.db.events.find(query).sort('_id', 1):
+                    last_id = doc['_id']
+                    self._dispatch(doc)
+            except Exception as e:
+                print(f"Event poll error: {e}")
+
+    def close(self):
+        self._stop.set()
+
+
+class NullBroker(LocalBroker):
+    """LIVE_EVENTS off: /api/events is disabled, so publishing costs nothing"""
+
+    active = False
+
+    def subscribe(self, user_id):
+        raise TooManyStreams('Live events are disabled')
+
+    def publish(self, user_id, event_type, data):
+        pass
+
+    def publish_many(self, events):
+        pass
+
+
+def issue_ticket(db, user_id):
+    """
+    Single-use credential for one /api/events connection. EventSource can't
+    send headers, and a URL ends up in access logs, so it never carries the JWT.
+    """
+    ticket = secrets.token_urlsafe(24)
+    db[TICKETS].insert_one({'_id': ticket, 'user_id': user_id, 'created_at': datetime.datetime.utcnow()})
+    return ticket
+
+
+def redeem_ticket(db, ticket):
+    """Consumes a ticket; returns its user_id, or None if it is unknown, spent or older than EVENT_TICKET_TTL"""
+    if not ticket:
+        return None
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=Config.EVENT_TICKET_TTL)
+    doc = db[TICKETS].find_one_and_delete({'_id': ticket, 'created_at': {'$gte': cutoff}})
+    return doc['user_id'] if doc else None
+
+
+def make_broker(db):
+    """NullBroker unless LIVE_EVENTS; then EVENT_BROKER=mongo (default when a database is available) or local"""
+    if not Config.LIVE_EVENTS:
+        return NullBroker()
+    if db is not None and Config.EVENT_BROKER == 'mongo':
+        return MongoBroker(db)
+    return LocalBroker()
+
+
+def sse_stream(broker, subscription, heartbeat=None, max_age=None):
+    """
+    Yields SSE frames for one subscription. Sends a comment every
+    `heartbeat` seconds to keep proxies from closing the idle connection,
+    and ends after `max_age` seconds (EventSource reconnects by itself)
+    so a connection never pins a worker thread indefinitely.
+    """
+    heartbeat = heartbeat or Config.EVENT_HEARTBEAT
+    max_age = max_age or Config.EVENT_MAX_AGE
+    deadline = time.monotonic() + max_age
+    try:
+        yield f"retry: 3000\n\n"
+        while time.monotonic() < deadline:
+            event = subscription.get(timeout=heartbeat)
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,60 @@
+"""
+Gunicorn Configuration
+Production serving mode: threaded (or gevent) workers sized to the machine, graceful shutdown.
+Run: cd backend && gunicorn simple_app:app   (this file is picked up automatically)
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# gthread: each worker serves `threads` requests at once; requests are short
+# Mongo round-trips, and bcrypt runs on its own pool (password_hasher.py).
+# Set GUNICORN_WORKER_CLASS=gevent (pip install gevent) for thousands of idle keep-alive clients.
+# Each open /api/events stream (LIVE_EVENTS=True) holds a gthread thread for up to
+# EVENT_MAX_AGE seconds; EVENT_MAX_STREAMS (default threads // 2) keeps the rest for the API.
+# For many live dashboards per worker switch to gevent and set EVENT_MAX_STREAMS=0.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))  # gevent only
+
+# Every worker imports the app (and builds its own MongoClient, caches and pools) after fork.
+# Leave this off: pymongo clients must not be shared across a fork.
+preload_app = False
+
+keepalive = 5
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 20))
+
+# Recycle workers occasionally (jittered so they don't all restart together)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = 500
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    """Master process, once per deployment and before any fork: seeds, migrations, indexes"""
+    if os.getenv('RUN_MIGRATIONS', 'true').lower() == 'false':
+        return
+    try:
+        from migrations import run_from_env
+        applied = run_from_env()
+        server.log.info(f"Migrations applied: {applied or 'none'}")
+    except Exception as e:
+        server.log.error(f"Migrations failed: {e}")
+
+
+def worker_exit(server, worker):
+    """In-flight requests have drained (or graceful_timeout hit); close the pool and watcher"""
+    import sys
+    app_module = sys.modules.get('simple_app')
+    if app_module is not None:
+        try:
+            app_module.shutdown()
+        except Exception as e:
+            server.log.warning(f"Worker shutdown error: {e}")
@@ -0,0 +1,192 @@
+"""
+Index Manager
+Declares the indexes behind every hot query, creates them idempotently and audits query plans.
+Run: python indexes.py ensure | audit
+"""
+
+import datetime
+import sys
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from config import Config
+from pymongo.errors import OperationFailure
+
+# collection -> indexes; unique where a duplicate would be a data bug
+INDEXES = {
+    'users': [
+        IndexModel([('username', ASCENDING)], name='username_unique', unique=True),
+        IndexModel([('email', ASCENDING)], name='email_unique', unique=True),
+        IndexModel([('level', DESCENDING), ('exp', DESCENDING)], name='leaderboard'),
+    ],
+    'stats': [
+        IndexModel([('user_id', ASCENDING)], name='user_id_unique', unique=True),
+        # Only players still regenerating carry stamina_full_tick (stamina.collect_full)
+        IndexModel([('stamina_full_tick', ASCENDING)], name='stamina_full_tick', sparse=True),
+        IndexModel([('regen_batch', ASCENDING)], name='regen_batch', sparse=True),
+    ],
+    'user_titles': [
+        IndexModel([('user_id', ASCENDING), ('title_id', ASCENDING)], name='user_title_unique', unique=True),
+    ],
+    'user_skills': [
+        IndexModel([('user_id', ASCENDING), ('skill_id', ASCENDING)], name='user_skill_unique', unique=True),
+    ],
+    'custom_quests': [
+        IndexModel([('user_id', ASCENDING), ('quest_id', ASCENDING)], name='user_quest'),
+    ],
+    'quests': [
+        IndexModel([('user_id', ASCENDING), ('quest_id', ASCENDING)], name='user_quest'),
+        IndexModel([('quest_id', ASCENDING)], name='quest_id'),
+    ],
+    'active_dungeons': [
+        IndexModel([('user_id', ASCENDING), ('status', ASCENDING)], name='user_status'),
+        # Only running sessions are indexed: the sweeper's overdue scan
+        IndexModel([('end_time', ASCENDING)], name='active_end_time',
+                   partialFilterExpression={'status': 'active'}),
+        IndexModel([('sweep_id', ASCENDING)], name='sweep_id', sparse=True),
+        IndexModel([('claimed_at', ASCENDING)], name='claimed_at', sparse=True),
+    ],
+    'dungeon_history': [
+        IndexModel([('user_id', ASCENDING), ('ended_at', DESCENDING)], name='user_ended'),
+    ],
+    'exp_buckets': [
+        IndexModel([('period', ASCENDING), ('bucket', ASCENDING), ('user_id', ASCENDING)],
+                   name='period_bucket_user_unique', unique=True),
+        IndexModel([('period', ASCENDING), ('bucket', ASCENDING), ('exp', DESCENDING)], name='period_ranking'),
+    ],
+    'events': [
+        IndexModel([('created_at', ASCENDING)], name='created_at_ttl', expireAfterSeconds=Config.EVENT_TTL),
+    ],
+    'stream_tickets': [
+        IndexModel([('created_at', ASCENDING)], name='created_at_ttl', expireAfterSeconds=Config.EVENT_TICKET_TTL),
+    ],
+    'progress_logs': [
+        IndexModel([('user_id', ASCENDING), ('timestamp', DESCENDING)], name='user_timestamp'),
+    ],
+    'analytics_rollups': [
+        IndexModel([('user_id', ASCENDING), ('period', ASCENDING), ('bucket', ASCENDING)],
+                   name='user_period_bucket_unique', unique=True),
+    ],
+    'cohort_insights': [
+        IndexModel([('user_id', ASCENDING)], name='user_id_unique', unique=True),
+    ],
+    'user_inventory': [
+        IndexModel([('user_id', ASCENDING), ('item_id', ASCENDING)], name='user_item_unique', unique=True),
+    ],
+    'skills': [
+        IndexModel([('skill_id', ASCENDING)], name='skill_id_unique', unique=True),
+    ],
+    'defined_titles': [
+        IndexModel([('title_id', ASCENDING)], name='title_id_unique', unique=True),
+    ],
+    'shop_items': [
+        IndexModel([('item_id', ASCENDING)], name='item_id_unique', unique=True),
+    ],
+}
+
+# Query shapes issued by simple_app.py: (name, collection, filter, sort).
+# Full catalog loads (skills, defined_titles, shop_items) are intentional scans and not listed.
+SAMPLE_USER = '000000000000000000000000'
+QUERY_SHAPES = [
+    ('login', 'users', {'username': 'x'}, None),
+    ('register_exists', 'users', {'$or': [{'username': 'x'}, {'email': 'x'}]}, None),
+    ('leaderboard', 'users', {}, [('level', DESCENDING), ('exp', DESCENDING)]),
+    ('leaderboard_above', 'users', {'$or': [{'level': {'$gt': 5}}, {'level': 5, 'exp': {'$gt': 0}}]},
+     [('level', ASCENDING), ('exp', ASCENDING)]),
+    ('period_leaderboard', 'exp_buckets', {'period': 'week', 'bucket': '2024-W01'}, [('exp', DESCENDING)]),
+    ('stats_by_user', 'stats', {'user_id': SAMPLE_USER}, None),
+    ('stamina_full_due', 'stats', {'stamina_full_tick': {'$lte': 100}}, None),
+    ('titles_by_user', 'user_titles', {'user_id': SAMPLE_USER}, None),
+    ('title_owned', 'user_titles', {'user_id': SAMPLE_USER, 'title_id': 'novice'}, None),
+    ('skills_by_user', 'user_skills', {'user_id': SAMPLE_USER}, None),
+    ('skill_owned', 'user_skills', {'user_id': SAMPLE_USER, 'skill_id': 'active_heal'}, None),
+    ('custom_quests_by_user', 'custom_quests', {'user_id': SAMPLE_USER}, None),
+    ('custom_quest', 'custom_quests', {'user_id': SAMPLE_USER, 'quest_id': 'q'}, None),
+    ('system_quests', 'quests', {'user_id': {'$exists': False}}, None),
+    ('user_quests', 'quests', {'user_id': SAMPLE_USER}, None),
+    ('quest_by_id', 'quests', {'quest_id': 'q'}, None),
+    ('active_dungeon', 'active_dungeons', {'user_id': SAMPLE_USER, 'status': 'active'}, None),
+    ('overdue_dungeons', 'active_dungeons', {'status': 'active', 'end_time': {'$lt': datetime.datetime(2024, 1, 1)}}, None),
+    ('dungeon_history', 'dungeon_history', {'user_id': SAMPLE_USER}, [('ended_at', DESCENDING)]),
+    ('recent_history', 'progress_logs', {'user_id': SAMPLE_USER}, [('timestamp', DESCENDING)]),
+    ('analytics_trends', 'analytics_rollups',
+     {'user_id': SAMPLE_USER, 'period': 'day', 'bucket': {'$gte': '2024-01-01', '$lte': '2024-01-30'}}, None),
+    ('progress_since_watermark', 'progress_logs', {'_id': {'$gt': ObjectId(SAMPLE_USER)}}, [('_id', ASCENDING)]),
+    ('cohort_insight', 'cohort_insights', {'user_id': SAMPLE_USER}, None),
+    ('inventory_by_user', 'user_inventory', {'user_id': SAMPLE_USER}, None),
+    ('inventory_item', 'user_inventory', {'user_id': SAMPLE_USER, 'item_id': 'i'}, None),
+]
+
+
+def ensure_indexes(db):
+    """Create every declared index; existing ones are a no-op. Returns names of failures."""
+    failed = []
+    for collection, models in INDEXES.items():
+        try:
+            db[collection].create_indexes(models)
+        except OperationFailure:
+            # Retry one by one so a single bad index (e.g. duplicates blocking a unique one) doesn't block the rest
+            for model in models:
+                try:
+                    db[collection].create_indexes([model])
+                except OperationFailure as e:
+                    name = model.document['name']
+                    print(f"❌ Index {collection}.{name} not created: {e}")
+                    failed.append(f"{collection}.{name}")
+    return failed
+
+
+def _plan_stages(plan):
+    """Yield every stage name in a (possibly nested) winning plan"""
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for key in ('inputStage', 'queryPlan'):
+            if key in plan:
+                yield from _plan_stages(plan[key])
+        for child in plan.get('inputStages', []):
+            yield from _plan_stages(child)
+
+
+def audit_query_plans(db):
+    """
+    Explains every registered query shape.
+    Returns {shape name: [stages]} for shapes whose winning plan contains a COLLSCAN.
+    """
+    offenders = {}
+    for name, collection, query, sort in QUERY_SHAPES:
+        command = {'find': collection, 'filter': query}
+        if sort:
+            command['sort'] = dict(sort)
+            command['limit'] = 10
+        explain = db.command('explain', command, verbosity='queryPlanner')
+        stages = list(_plan_stages(explain['queryPlanner']['winningPlan']))
+        if 'COLLSCAN' in stages:
+            offenders[name] = stages
+    return offenders
+
+
+def main():
+    from pymongo import MongoClient
+
+    from datastore import mongo_uri
+
+    action = sys.argv[1] if len(sys.argv) > 1 else 'audit'
+    db = MongoClient(mongo_uri(), serverSelectionTimeoutMS=5000)['the_system']
+
+    if action == 'ensure':
+        failed = ensure_indexes(db)
+        print("✅ Indexes ensured" if not failed else f"⚠️  {len(failed)} index(es) failed")
+        sys.exit(1 if failed else 0)
+
+    offenders = audit_query_plans(db)
+    for name, stages in offenders.items():
+        print(f"❌ COLLSCAN in '{name}': {' -> '.join(stages)}")
+    if offenders:
+        sys.exit(1)
+    print(f"✅ {len(QUERY_SHAPES)} query shapes use indexes")
+
+
+if __name__ == '__main__':
+    main()
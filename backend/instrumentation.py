@@ -0,0 +1,398 @@
+"""
+Instrumentation
+MongoDB command/pool listeners attributed to the active Flask endpoint, request latency
+histograms and a Prometheus text exporter for /metrics (process-local, like ConditionalMetrics)
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+from config import Config
+
+# Upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COMMAND_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+PREFIX = 'the_system'
+
+
+class RequestStats:
+    """What one request (or background job run) has done so far"""
+
+    __slots__ = ('endpoint', 'started', 'commands', 'command_seconds')
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.commands = 0
+        self.command_seconds = 0.0
+
+
+# Set per request by init_app and per run by jobs.PeriodicJob; copied into worker
+# threads that run on a request's behalf (dashboard.fetch_dashboard)
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+def current_stats():
+    return _current.get()
+
+
+def track(endpoint):
+    """Attribute the commands issued from here on (this context) to `endpoint`; returns a reset token"""
+    return _current.set(RequestStats(endpoint))
+
+
+def untrack(token):
+    _current.reset(token)
+
+
+@contextmanager
+def attributed_to(label):
+    """
+    Charge the commands inside the block to `label` instead of the current
+    request, e.g. a cache refill that happens to run on whichever request
+    finds the cache stale (keeps query budgets deterministic).
+    """
+    token = track(label)
+    try:
+        yield
+    finally:
+        untrack(token)
+
+
+# --- Query budgets ---
+
+def query_budget(max_commands):
+    """
+    Route decorator (directly under @app.route) declaring the most MongoDB
+    commands one request may issue, after_request hooks included. Checked on
+    every request per Config.QUERY_BUDGET_MODE: 'off', 'warn' (log + count
+    in /metrics) or 'strict' (raises QueryBudgetExceeded when app.testing,
+    so tests/test_query_budgets.py fails; otherwise the same as 'warn', since
+    the request's writes have already committed by then).
+    """
+    def decorator(fn):
+        fn.query_budget = max_commands
+        return fn
+    return decorator
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request issued more MongoDB commands than its @query_budget ('strict' mode, tests only)"""
+
+
+def budget_for(app, endpoint):
+    view = app.view_functions.get(endpoint)
+    return getattr(view, 'query_budget', None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label tuple"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.series = {}  # labels -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, labels, value):
+        counts = self.series.get(labels)
+        if counts is None:
+            counts = self.series[labels] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        counts[-2] += 1
+        counts[-1] += value
+
+
+class Metrics:
+    """All counters behind /metrics; every method is thread-safe"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}  # (endpoint, method, status) -> count
+        self.request_latency = Histogram(LATENCY_BUCKETS)  # (endpoint,)
+        self.request_commands = Histogram(COUNT_BUCKETS)  # (endpoint,)
+        self.commands = {}  # (endpoint, collection, command) -> [count, seconds, docs, failures]
+        self.command_latency = Histogram(COMMAND_BUCKETS)  # (command,)
+        self.pool = {'open': 0, 'in_use': 0, 'checkout_failures': 0}
+        self.checkout_wait = Histogram(COMMAND_BUCKETS)  # ()
+        self.gauges = []  # (name, help, fn -> number or {label value: number}, label name)
+        self.budget_overruns = {}  # endpoint -> count
+
+    def record_request(self, endpoint, method, status, seconds, commands):
+        with self._lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.request_latency.observe((endpoint,), seconds)
+            self.request_commands.observe((endpoint,), commands)
+
+    def record_command(self, endpoint, collection, command, seconds, docs, failed):
+        with self._lock:
+            entry = self.commands.setdefault((endpoint, collection, command), [0, 0.0, 0, 0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += docs
+            entry[3] += 1 if failed else 0
+            self.command_latency.observe((command,), seconds)
+
+    def record_overrun(self, endpoint):
+        with self._lock:
+            self.budget_overruns[endpoint] = self.budget_overruns.get(endpoint, 0) + 1
+
+    def record_pool(self, field, delta):
+        with self._lock:
+            self.pool[field] += delta
+
+    def record_checkout_wait(self, seconds):
+        with self._lock:
+            self.checkout_wait.observe((), seconds)
+
+    def commands_by_endpoint(self):
+        """{endpoint: (requests, MongoDB commands)} so far"""
+        with self._lock:
+            return {labels[0]: (counts[-2], counts[-1]) for labels, counts in self.request_commands.series.items()}
+
+    def register_gauge(self, name, help_text, fn, label=None):
+        """Sampled at export time: fn() returns a number, or {label value: number} with `label`"""
+        self.gauges.append((name, help_text, fn, label))
+
+    def slowest(self, limit=10):
+        """Endpoints by total time spent in MongoDB (for quick looks without Prometheus)"""
+        with self._lock:
+            totals = {}
+            for (endpoint, _, _), (count, seconds, _, _) in self.commands.items():
+                t = totals.setdefault(endpoint, [0, 0.0])
+                t[0] += count
+                t[1] += seconds
+        ranked = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [{'endpoint': e, 'commands': c, 'mongo_seconds': round(s, 4)} for e, (c, s) in ranked]
+
+    # --- Prometheus text exposition ---
+
+    def render(self):
+        lines = []
+        with self._lock:
+            _header(lines, 'http_requests_total', 'counter', 'Requests by endpoint, method and status')
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(_sample('http_requests_total',
+                                     {'endpoint': endpoint, 'method': method, 'status': status}, count))
+            _histogram(lines, 'http_request_duration_seconds', 'Request latency', self.request_latency, ('endpoint',))
+            _histogram(lines, 'mongo_commands_per_request', 'MongoDB commands issued per request',
+                       self.request_commands, ('endpoint',))
+            _header(lines, 'query_budget_exceeded_total', 'counter', 'Requests that issued more commands than their query_budget')
+            for endpoint, count in sorted(self.budget_overruns.items()):
+                lines.append(_sample('query_budget_exceeded_total', {'endpoint': endpoint}, count))
+
+            for index, (name, kind, help_text) in enumerate((
+                ('mongo_commands_total', 'counter', 'MongoDB commands by endpoint, collection and command'),
+                ('mongo_command_seconds_total', 'counter', 'Time spent in MongoDB commands'),
+                ('mongo_documents_returned_total', 'counter', 'Documents returned by find/aggregate/getMore/findAndModify'),
+                ('mongo_command_failures_total', 'counter', 'Failed MongoDB commands')
+            )):
+                _header(lines, name, kind, help_text)
+                for (endpoint, collection, command), values in sorted(self.commands.items()):
+                    labels = {'endpoint': endpoint, 'collection': collection, 'command': command}
+                    lines.append(_sample(name, labels, values[index]))
+            _histogram(lines, 'mongo_command_duration_seconds', 'MongoDB command latency',
+                       self.command_latency, ('command',))
+
+            _header(lines, 'mongo_pool_connections', 'gauge', 'Pooled connections by state')
+            lines.append(_sample('mongo_pool_connections', {'state': 'open'}, self.pool['open']))
+            lines.append(_sample('mongo_pool_connections', {'state': 'in_use'}, self.pool['in_use']))
+            _header(lines, 'mongo_pool_checkout_failures_total', 'counter', 'Connection checkouts that failed or timed out')
+            lines.append(_sample('mongo_pool_checkout_failures_total', {}, self.pool['checkout_failures']))
+            _histogram(lines, 'mongo_pool_checkout_wait_seconds', 'Time waiting for a pooled connection',
+                       self.checkout_wait, ())
+            gauges = list(self.gauges)
+
+        for name, help_text, fn, label in gauges:
+            try:
+                value = fn()
+            except Exception as e:
+                print(f"Metrics gauge {name} error: {e}")
+                continue
+            _header(lines, name, 'gauge', help_text)
+            if isinstance(value, dict):
+                for key, v in sorted(value.items()):
+                    lines.append(_sample(name, {label: key}, v))
+            else:
+                lines.append(_sample(name, {}, value))
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _sample(name, labels, value):
+    label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    return f"{PREFIX}_{name}{{{label_text}}} {value}" if label_text else f"{PREFIX}_{name} {value}"
+
+
+def _header(lines, name, kind, help_text):
+    lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+    lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+
+def _histogram(lines, name, help_text, histogram, label_names):
+    _header(lines, name, 'histogram', help_text)
+    for labels, counts in sorted(histogram.series.items()):
+        base = dict(zip(label_names, labels))
+        for bound, count in zip(histogram.buckets, counts):
+            lines.append(_sample(f'{name}_bucket', {**base, 'le': bound}, count))
+        lines.append(_sample(f'{name}_bucket', {**base, 'le': '+Inf'}, counts[-2]))
+        lines.append(_sample(f'{name}_sum', base, round(counts[-1], 6)))
+        lines.append(_sample(f'{name}_count', base, counts[-2]))
+
+
+metrics = Metrics()
+
+
+# --- pymongo listeners (pass to MongoClient(event_listeners=...)) ---
+
+def _documents(reply):
+    """Documents a command handed back: cursor batches, findAndModify values"""
+    cursor = reply.get('cursor')
+    if isinstance(cursor, dict):
+        return len(cursor.get('firstBatch') or cursor.get('nextBatch') or [])
+    if 'value' in reply:
+        return 1 if reply['value'] is not None else 0
+    return 0
+
+
+def charge_command(collection, command, seconds, docs=0, failed=False, stats=None, registry=None):
+    """
+    Counts one command against a request/job (the issuing context's unless
+    `stats` is given) and in /metrics. CommandMetrics calls this for pymongo;
+    the embedded datastore (local_store.py) calls it directly.
+    """
+    stats = stats if stats is not None else _current.get()
+    if stats is not None:
+        stats.commands += 1
+        stats.command_seconds += seconds
+    endpoint = stats.endpoint if stats is not None else 'unattributed'
+    (registry or metrics).record_command(endpoint, collection, command, seconds, docs, failed)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Times every command and charges it to the endpoint active on the issuing thread"""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        name = event.command_name
+        collection = event.command.get('collection') if name == 'getMore' else event.command.get(name)
+        stats = _current.get()
+        with self._lock:
+            self._inflight[(event.request_id, event.connection_id)] = (
+                stats, collection if isinstance(collection, str) else '-'
+            )
+
+    def _finish(self, event, docs, failed):
+        with self._lock:
+            stats, collection = self._inflight.pop((event.request_id, event.connection_id), (None, '-'))
+        charge_command(collection, event.command_name, event.duration_micros / 1e6, docs, failed,
+                       stats=stats, registry=self.registry)
+
+    def succeeded(self, event):
+        self._finish(event, _documents(event.reply), False)
+
+    def failed(self, event):
+        self._finish(event, 0, True)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Open/in-use connections, checkout failures and checkout wait time"""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._local = threading.local()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.registry.record_pool('open', 1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.registry.record_pool('open', -1)
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self.registry.record_pool('checkout_failures', 1)
+
+    def connection_checked_out(self, event):
+        self.registry.record_pool('in_use', 1)
+        started = getattr(self._local, 'started', None)
+        if started is not None:
+            self.registry.record_checkout_wait(time.perf_counter() - started)
+            self._local.started = None
+
+    def connection_checked_in(self, event):
+        self.registry.record_pool('in_use', -1)
+
+
+def event_listeners(registry=None):
+    registry = registry or metrics
+    return [CommandMetrics(registry), PoolMetrics(registry)]
+
+
+# --- Flask wiring ---
+
+def init_app(app, registry=None, budget_mode=None):
+    """Times every request, scopes command attribution to it and checks its query budget"""
+    from flask import g, request
+
+    registry = registry or metrics
+    budget_mode = budget_mode or Config.QUERY_BUDGET_MODE
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_token = track(request.endpoint or 'unmatched')
+
+    @app.after_request
+    def record_request_metrics(response):
+        stats = _current.get()
+        if stats is None:
+            return response
+        registry.record_request(stats.endpoint, request.method, response.status_code,
+                                time.perf_counter() - stats.started, stats.commands)
+
+        budget = budget_for(app, request.endpoint) if budget_mode != 'off' else None
+        if budget is not None and stats.commands > budget:
+            registry.record_overrun(stats.endpoint)
+            message = f"Query budget exceeded: {stats.endpoint} issued {stats.commands} MongoDB commands (budget {budget})"
+            print(f"⚠️  {message}")
+            if budget_mode == 'strict' and app.testing:
+                raise QueryBudgetExceeded(message)
+        return response
+
+    @app.teardown_request
+    def end_request_metrics(exc):
+        token = g.pop('metrics_token', None)
+        if token is not None:
+            try:
+                untrack(token)
+            except ValueError:
+                pass  # torn down from another context (streamed response); nothing to restore
@@ -0,0 +1,53 @@
+"""
+Background Jobs
+Per-process periodic tasks (dungeon expiry, stamina notifications) run on daemon threads
+"""
+
+import os
+import threading
+
+from instrumentation import track
+
+
+class PeriodicJob:
+    """
+    Calls `self.run()` every `interval` seconds on a daemon thread. Started
+    lazily with ensure_started() (and again after fork) so each worker owns
+    its thread; jobs must therefore be safe to run in several processes at
+    once. An interval of 0 disables the thread; run() can still be called.
+    """
+
+    name = 'periodic-job'
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._stop = threading.Event()
+
+    def run(self):
+        raise NotImplementedError
+
+    def ensure_started(self):
+        if self._pid == os.getpid() or self.interval <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._thread_main, name=self.name, daemon=True).start()
+
+    def _thread_main(self):
+        # MongoDB commands from this thread show up under endpoint="job:<name>" in /metrics
+        track(f'job:{self.name}')
+        self._loop()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run()
+            except Exception as e:
+                print(f"{self.name} error: {e}")
+
+    def close(self):
+        self._stop.set()
@@ -0,0 +1,246 @@
+"""
+Leaderboard Service
+In-memory top-N hunters kept current by EXP/level changes, index-backed rank lookups
+and weekly/monthly EXP rankings from time-bucketed counters
+"""
+
+import datetime
+import hashlib
+import json
+import threading
+import time
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from config import Config
+from instrumentation import attributed_to
+
+ENTRY_FIELDS = {'_id': 0, 'username': 1, 'level': 1, 'exp': 1, 'job_class': 1}
+DEFAULT_JOB_CLASS = 'E-Rank Hunter'
+
+# Periodic rankings: one exp_buckets doc per (period, bucket, user)
+PERIODS = ('week', 'month')
+BUCKET_FIELDS = {'_id': 0, 'username': 1, 'level': 1, 'exp': 1}
+
+
+def _key(entry):
+    return (entry.get('level', 1), entry.get('exp', 0))
+
+
+def _etag(payload):
+    """Content hash, so every worker hands out the same tag for the same ranking"""
+    digest = hashlib.md5(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+    return f'"lb-{digest}"'
+
+
+def _public(entry, rank):
+    return {
+        'rank': rank,
+        'username': entry['username'],
+        'level': entry.get('level', 1),
+        'job_class': entry.get('job_class', DEFAULT_JOB_CLASS)
+    }
+
+
+class Leaderboard:
+    """
+    Keeps the top `size` users (by level, then EXP) in memory.
+
+    Progress in this process is folded in immediately through record();
+    progress made by other workers shows up on the next reload, which is a
+    single indexed sort+limit every `ttl` seconds instead of one per hit.
+    """
+
+    def __init__(self, db, size=None, ttl=None):
+        self.db = db
+        self.size = size or Config.LEADERBOARD_SIZE
+        self.ttl = ttl if ttl is not None else Config.LEADERBOARD_TTL
+        self._lock = threading.Lock()
+        self._entries = []
+        self._loaded_at = None
+        self._etag_cache = {}
+
+    # --- Top N ---
+
+    def reload(self):
+        entries = list(self.db.users.find({}, ENTRY_FIELDS)
+                       .sort([('level', DESCENDING), ('exp', DESCENDING)])
+                       .limit(self.size))
+        with self._lock:
+            if entries != self._entries:
+                self._entries = entries
+                self._etag_cache = {}
+            self._loaded_at = time.monotonic()
+
+    def top(self, limit=10):
+        """Return (ranked entries, etag) for the first `limit` hunters"""
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            with attributed_to('cache:leaderboard'):
+                self.reload()
+        limit = max(1, min(limit, self.size))
+        with self._lock:
+            ranked = [_public(e, i + 1) for i, e in enumerate(self._entries[:limit])]
+            etag = self._etag_cache.get(limit)
+            if etag is None:
+                etag = self._etag_cache[limit] = _etag(ranked)
+        return ranked, etag
+
+    def record(self, user):
+        """
+        Fold one user's new level/EXP (a post-image with username, level, exp)
+        into the cached top N without touching the database.
+        """
+        if not user or 'username' not in user:
+            return
+        with self._lock:
+            previous = next((e for e in self._entries if e['username'] == user['username']), None)
+            if previous:
+                self._entries.remove(previous)
+
+            entry = {
+                'username': user['username'],
+                'level': user.get('level', 1),
+                'exp': user.get('exp', 0),
+                'job_class': (previous or user).get('job_class', DEFAULT_JOB_CLASS)
+            }
+            full = len(self._entries) >= self.size
+            if not full or _key(entry) >= _key(self._entries[-1]):
+                self._entries.append(entry)
+                self._entries.sort(key=_key, reverse=True)
+                del self._entries[self.size:]
+            elif previous:
+                # Dropped out of the cached window; the replacement has to come from the DB
+                self._loaded_at = None
+            self._etag_cache = {}
+
+    def on_exp(self, db, user_id, amount, user):
+        """progression EXP listener"""
+        self.record(user)
+
+    # --- Per-user rank ---
+
+    def _above(self, level, exp):
+        return {'$or': [{'level': {'$gt': level}}, {'level': level, 'exp': {'$gt': exp}}]}
+
+    def _below(self, level, exp, user_oid):
+        return {'$or': [
+            {'level': {'$lt': level}},
+            {'level': level, 'exp': {'$lte': exp}, '_id': {'$ne': user_oid}}
+        ]}
+
+    def rank_of(self, level, exp):
+        """1-based rank: users strictly ahead + 1 (an index range count)"""
+        return self.db.users.count_documents(self._above(level, exp)) + 1
+
+    def around(self, user_id, span=5, page=0):
+        """
+        The user's rank with their neighbours.
+        page 0: `span` hunters directly above and below; page n > 0 pages
+        further down, page n < 0 further up (towards #1).
+        Every query is a range over the (level, exp) index; nothing scans users.
+        Neighbours are ranked like rank_of (ties share a rank) from their
+        position; one extra row per side shows whether a tie crosses the
+        page edge, and only then is that rank counted.
+        """
+        oid = ObjectId(user_id)
+        me = self.db.users.find_one({'_id': oid}, ENTRY_FIELDS)
+        if not me:
+            return None
+        level, exp = me.get('level', 1), me.get('exp', 0)
+        rank = self.rank_of(level, exp)
+        skip = abs(page) * span
+
+        above, below = [], []
+        if page <= 0:
+            # Closest first: ascending from just above the user, plus the row after the page
+            rows = list(self.db.users.find(self._above(level, exp), ENTRY_FIELDS)
+                        .sort([('level', ASCENDING), ('exp', ASCENDING)])
+                        .skip(skip).limit(span + 1))
+            above, after = rows[:span], rows[span:]
+            ranks, later = [], (after[0] if after else None)
+            for i in range(len(above) - 1, -1, -1):
+                entry = above[i]
+                if later is not None and _key(later) == _key(entry):
+                    entry_rank = ranks[-1] if ranks else self.rank_of(*_key(entry))
+                else:
+                    # Everyone above the user but the skipped rows and this page up to i is ahead
+                    entry_rank = rank - skip - i - 1
+                ranks.append(entry_rank)
+                later = entry
+            above = [_public(entry, entry_rank) for entry, entry_rank in zip(above[::-1], ranks)]
+        if page >= 0:
+            # The row before the page (past page 0) tells whether its first entry shares a rank
+            rows = list(self.db.users.find(self._below(level, exp, oid), ENTRY_FIELDS)
+                        .sort([('level', DESCENDING), ('exp', DESCENDING)])
+                        .skip(skip - 1 if skip else 0).limit(span + 1 if skip else span))
+            previous, previous_rank = (rows.pop(0), None) if skip and rows else (me, rank)
+            for i, entry in enumerate(rows):
+                if _key(entry) == _key(previous):
+                    entry_rank = previous_rank if previous_rank is not None else self.rank_of(*_key(entry))
+                else:
+                    entry_rank = rank + skip + i + 1
+                below.append(_public(entry, entry_rank))
+                previous, previous_rank = entry, entry_rank
+
+        return {
+            'rank': rank,
+            'me': _public(me, rank),
+            'above': above,
+            'below': below,
+            'page': page,
+            'span': span
+        }
+
+
+# --- Periodic (weekly / monthly) EXP rankings ---
+
+def bucket_for(period, when=None):
+    """Bucket key for a timestamp: day '2024-02-14', ISO week '2024-W07' or month '2024-02' (UTC)"""
+    when = when or datetime.datetime.utcnow()
+    if period == 'day':
+        return when.strftime('%Y-%m-%d')
+    if period == 'week':
+        year, week, _ = when.isocalendar()
+        return f'{year}-W{week:02d}'
+    if period == 'month':
+        return when.strftime('%Y-%m')
+    raise ValueError(f'Unknown period: {period}')
+
+
+def record_exp_buckets(db, user_id, amount, user):
+    """
+    progression EXP listener: $inc the user's current week and month buckets.
+    One unordered bulk of upserts; the first grant in a period creates the doc.
+    """
+    if not amount or amount <= 0 or not user:
+        return
+    now = datetime.datetime.utcnow()
+    ops = [
+        UpdateOne(
+            {'period': period, 'bucket': bucket_for(period, now), 'user_id': user_id},
+            {
+                '$inc': {'exp': amount},
+                '$set': {'username': user.get('username'), 'level': user.get('level', 1), 'updated_at': now}
+            },
+            upsert=True
+        )
+        for period in PERIODS
+    ]
+    db.exp_buckets.bulk_write(ops, ordered=False)
+
+
+def period_top(db, period, limit=10, bucket=None):
+    """
+    Return (ranked entries, etag) by EXP gained in the current (or given) bucket.
+    An indexed (period, bucket, exp desc) range + limit: cost is O(limit).
+    """
+    bucket = bucket or bucket_for(period)
+    entries = list(db.exp_buckets.find({'period': period, 'bucket': bucket}, BUCKET_FIELDS)
+                   .sort('exp', DESCENDING)
+                   .limit(limit))
+    ranked = [
+        {'rank': i + 1, 'username': e['username'], 'level': e.get('level', 1), 'exp_gained': e['exp']}
+        for i, e in enumerate(entries)
+    ]
+    return ranked, _etag({'bucket': bucket, 'ranked': ranked})
@@ -0,0 +1,805 @@
+"""
+Local Query Engine
+MongoDB query, update, projection and aggregation-expression semantics over plain dicts:
+the subset this app uses, for the embedded datastore (local_store.py)
+"""
+
+import datetime
+import functools
+import math
+import re
+from copy import deepcopy
+
+from bson.objectid import ObjectId
+from pymongo.errors import OperationFailure
+
+MISSING = object()  # an absent field (distinct from null); also $$REMOVE
+
+_TYPE_ALIASES = {
+    'double': (float,), 'string': (str,), 'object': (dict,), 'array': (list,),
+    'objectId': (ObjectId,), 'bool': (bool,), 'date': (datetime.datetime,), 'null': (type(None),),
+    'int': (int,), 'long': (int,), 'number': (int, float)
+}
+_REGEX_FLAGS = {'i': re.IGNORECASE, 'm': re.MULTILINE, 's': re.DOTALL, 'x': re.VERBOSE}
+
+
+# --- Comparison (MongoDB's cross-type order) ---
+
+def _bracket(value):
+    if value is None or value is MISSING:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, list):
+        return 5
+    if isinstance(value, bytes):
+        return 6
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime.datetime):
+        return 9
+    return 10
+
+
+def compare(a, b):
+    """-1, 0 or 1: numbers < strings < objects < arrays < ObjectIds < booleans < dates"""
+    ba, bb = _bracket(a), _bracket(b)
+    if ba != bb:
+        return -1 if ba < bb else 1
+    if ba == 1:
+        return 0
+    if ba == 4:
+        a, b = list(a.items()), list(b.items())
+    if ba in (4, 5):
+        for x, y in zip(a, b):
+            result = compare(x, y) if ba == 5 else (compare(x[0], y[0]) or compare(x[1], y[1]))
+            if result:
+                return result
+        return (len(a) > len(b)) - (len(a) < len(b))
+    return (a > b) - (a < b)
+
+
+def equal(a, b):
+    return _bracket(a) == _bracket(b) and compare(a, b) == 0
+
+
+def _sort_value(doc, field, direction):
+    # An array sorts by its smallest element ascending, its largest descending
+    value = get_path(doc, field)
+    if isinstance(value, list) and value:
+        best = value[0]
+        for item in value[1:]:
+            if compare(item, best) * direction < 0:
+                best = item
+        return best
+    return value
+
+
+def sort_documents(docs, spec):
+    """Sorts in place by [(field, direction)], missing fields first ascending"""
+    def cmp(x, y):
+        for field, direction in spec:
+            result = compare(_sort_value(x, field, direction), _sort_value(y, field, direction))
+            if result:
+                return result if direction >= 0 else -result
+        return 0
+    docs.sort(key=functools.cmp_to_key(cmp))
+    return docs
+
+
+# --- Paths ---
+
+def get_path(doc, path):
+    """Value at a dotted path as expressions see it ($a.b over an array of documents is an array)"""
+    value = doc
+    for part in path.split('.'):
+        if isinstance(value, dict):
+            value = value.get(part, MISSING)
+        elif isinstance(value, list):
+            if part.isdigit():
+                index = int(part)
+                value = value[index] if index < len(value) else MISSING
+            else:
+                value = [item[part] for item in value if isinstance(item, dict) and part in item]
+        else:
+            return MISSING
+        if value is MISSING:
+            return MISSING
+    return value
+
+
+def _query_values(value, parts):
+    """Every value a query on the path sees: arrays of documents are traversed, missing yields nothing"""
+    if not parts:
+        return [value]
+    if isinstance(value, dict):
+        return _query_values(value[parts[0]], parts[1:]) if parts[0] in value else []
+    if isinstance(value, list):
+        found = []
+        if parts[0].isdigit() and int(parts[0]) < len(value):
+            found.extend(_query_values(value[int(parts[0])], parts[1:]))
+        for item in value:
+            if isinstance(item, dict):
+                found.extend(_query_values(item, parts))
+        return found
+    return []
+
+
+def query_values(doc, path):
+    """Values a query on `path` compares against, arrays flattened (distinct, $lookup)"""
+    flat = []
+    for value in _query_values(doc, path.split('.')):
+        flat.extend(value if isinstance(value, list) else [value])
+    return flat
+
+
+def _candidates(values):
+    # An array matches as a whole or through any of its elements
+    for value in values:
+        yield value
+        if isinstance(value, list):
+            yield from value
+
+
+def _check_path(path):
+    if any(part.startswith('$') or not part for part in path.split('.')):
+        raise OperationFailure(f"Unsupported field path '{path}' (positional operators are not supported locally)")
+
+
+def _container(doc, path, create):
+    """(parent, last key) of a dotted path; parent is None if it does not exist and create is False"""
+    _check_path(path)
+    parts = path.split('.')
+    target = doc
+    for part in parts[:-1]:
+        if isinstance(target, list) and part.isdigit():
+            index = int(part)
+            if index >= len(target):
+                if not create:
+                    return None, parts[-1]
+                target.extend([None] * (index + 1 - len(target)))
+            if target[index] is None and create:
+                target[index] = {}
+            target = target[index]
+        elif isinstance(target, dict):
+            if not isinstance(target.get(part), (dict, list)):
+                if not create:
+                    return None, parts[-1]
+                if part in target and target[part] is not None:
+                    raise OperationFailure(f"Cannot create field '{parts[-1]}' in element {{{part}: {target[part]!r}}}")
+                target[part] = {}
+            target = target[part]
+        else:
+            return None, parts[-1]
+    return target, parts[-1]
+
+
+def _get_field(parent, key):
+    if isinstance(parent, dict):
+        return parent.get(key, MISSING)
+    if isinstance(parent, list) and key.isdigit() and int(key) < len(parent):
+        return parent[int(key)]
+    return MISSING
+
+
+def set_path(doc, path, value):
+    parent, key = _container(doc, path, create=True)
+    if isinstance(parent, list):
+        index = int(key)
+        parent.extend([None] * (index + 1 - len(parent)))
+        parent[index] = value
+    else:
+        parent[key] = value
+
+
+def unset_path(doc, path):
+    parent, key = _container(doc, path, create=False)
+    if isinstance(parent, dict):
+        parent.pop(key, None)
+    elif isinstance(parent, list) and key.isdigit() and int(key) < len(parent):
+        parent[int(key)] = None  # $unset on an array element nulls it, as MongoDB does
+
+
+# --- Query matching ---
+
+def _is_operators(cond):
+    return isinstance(cond, dict) and bool(cond) and next(iter(cond)).startswith('$')
+
+
+def _regex(pattern, options=''):
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    flags = 0
+    for option in options or '':
+        flags |= _REGEX_FLAGS.get(option, 0)
+    return re.compile(pattern, flags)
+
+
+def _eq(values, arg):
+    if isinstance(arg, re.Pattern):
+        return any(isinstance(v, str) and arg.search(v) for v in _candidates(values))
+    if arg is None and not values:
+        return True
+    return any(equal(v, arg) for v in _candidates(values))
+
+
+def _ordered(values, arg, test):
+    if arg is None:
+        return test(0) and _eq(values, None)  # $gte/$lte null match null and missing
+    return any(_bracket(v) == _bracket(arg) and test(compare(v, arg)) for v in _candidates(values))
+
+
+def _type_matches(values, names):
+    names = names if isinstance(names, list) else [names]
+    for name in names:
+        types = _TYPE_ALIASES.get(name)
+        if types is None:
+            raise OperationFailure(f'Unknown type name alias: {name}')
+        for value in _candidates(values):
+            if isinstance(value, types) and not (isinstance(value, bool) and bool not in types):
+                return True
+    return False
+
+
+def _elem_match(values, query):
+    for value in values:
+        if not isinstance(value, list):
+            continue
+        for item in value:
+            if _is_operators(query):
+                if _match_operators([item], query):
+                    return True
+            elif isinstance(item, dict) and matches(item, query):
+                return True
+    return False
+
+
+def _match_operators(values, cond):
+    options = cond.get('$options', '')
+    for op, arg in cond.items():
+        if op == '$eq':
+            ok = _eq(values, arg)
+        elif op == '$ne':
+            ok = not _eq(values, arg)
+        elif op == '$gt':
+            ok = _ordered(values, arg, lambda c: c > 0) if arg is not None else False
+        elif op == '$gte':
+            ok = _ordered(values, arg, lambda c: c >= 0)
+        elif op == '$lt':
+            ok = _ordered(values, arg, lambda c: c < 0) if arg is not None else False
+        elif op == '$lte':
+            ok = _ordered(values, arg, lambda c: c <= 0)
+        elif op in ('$in', '$nin'):
+            if not isinstance(arg, (list, tuple)):
+                raise OperationFailure(f'{op} needs an array')
+            ok = any(_eq(values, item) for item in arg) == (op == '$in')
+        elif op == '$exists':
+            ok = bool(values) == bool(arg)
+        elif op == '$type':
+            ok = _type_matches(values, arg)
+        elif op == '$regex':
+            pattern = _regex(arg, options)
+            ok = any(isinstance(v, str) and pattern.search(v) for v in _candidates(values))
+        elif op == '$options':
+            continue
+        elif op == '$not':
+            if _is_operators(arg):
+                ok = not _match_operators(values, arg)
+            elif isinstance(arg, re.Pattern):
+                ok = not _eq(values, arg)
+            else:
+                raise OperationFailure('$not needs a regex or a document of operators')
+        elif op == '$size':
+            ok = any(isinstance(v, list) and len(v) == arg for v in values)
+        elif op == '$all':
+            ok = bool(arg) and all(_eq(values, item) for item in arg)
+        elif op == '$elemMatch':
+            ok = _elem_match(values, arg)
+        else:
+            raise OperationFailure(f'unknown operator: {op}')
+        if not ok:
+            return False
+    return True
+
+
+def matches(doc, query):
+    """True if `doc` satisfies the MongoDB filter `query`"""
+    for key, cond in (query or {}).items():
+        if key == '$and':
+            ok = all(matches(doc, q) for q in cond)
+        elif key == '$or':
+            ok = any(matches(doc, q) for q in cond)
+        elif key == '$nor':
+            ok = not any(matches(doc, q) for q in cond)
+        elif key == '$expr':
+            ok = truthy(evaluate(cond, doc))
+        elif key == '$comment':
+            continue
+        elif key.startswith('$'):
+            raise OperationFailure(f'unknown top level operator: {key}')
+        else:
+            values = _query_values(doc, key.split('.'))
+            ok = _match_operators(values, cond) if _is_operators(cond) else _eq(values, cond)
+        if not ok:
+            return False
+    return True
+
+
+def seed_from_filter(query):
+    """The document an upsert starts from: the filter's equality conditions"""
+    doc = {}
+    for key, cond in (query or {}).items():
+        if key == '$and':
+            for part in cond:
+                for field, value in seed_from_filter(part).items():
+                    doc[field] = value
+        elif key.startswith('$'):
+            continue
+        elif _is_operators(cond):
+            if '$eq' in cond:
+                set_path(doc, key, deepcopy(cond['$eq']))
+        elif not isinstance(cond, re.Pattern):
+            set_path(doc, key, deepcopy(cond))
+    return doc
+
+
+# --- Aggregation expressions ---
+
+def truthy(value):
+    return value is not MISSING and value not in (None, False, 0)
+
+
+def _null(value):
+    return value is None or value is MISSING
+
+
+def evaluate(expr, root, variables=None):
+    """Evaluates an aggregation expression against `root` (MISSING for absent fields)"""
+    if isinstance(expr, str):
+        if expr.startswith('$$'):
+            name, _, rest = expr[2:].partition('.')
+            if name in ('ROOT', 'CURRENT'):
+                base = root
+            elif name == 'REMOVE':
+                return MISSING
+            elif variables is not None and name in variables:
+                base = variables[name]
+            else:
+                raise OperationFailure(f'Use of undefined variable: {name}')
+            return get_path(base, rest) if rest else base
+        if expr.startswith('$'):
+            return get_path(root, expr[1:])
+        return expr
+    if isinstance(expr, list):
+        return [evaluate(item, root, variables) for item in expr]
+    if isinstance(expr, dict):
+        operators = [key for key in expr if key.startswith('$')]
+        if operators:
+            if len(expr) > 1:
+                raise OperationFailure(f'An expression object takes exactly one operator, got {list(expr)}')
+            handler = _EXPRESSIONS.get(operators[0])
+            if handler is None:
+                raise OperationFailure(f"Unrecognized expression '{operators[0]}'")
+            return handler(expr[operators[0]], root, variables)
+        result = {}
+        for key, value in expr.items():
+            value = evaluate(value, root, variables)
+            if value is not MISSING:
+                result[key] = value
+        return result
+    return expr
+
+
+def _args(arg, root, variables):
+    return [evaluate(item, root, variables) for item in (arg if isinstance(arg, list) else [arg])]
+
+
+def _add(arg, root, variables):
+    values = _args(arg, root, variables)
+    if any(_null(v) for v in values):
+        return None
+    dates = [v for v in values if isinstance(v, datetime.datetime)]
+    if len(dates) > 1:
+        raise OperationFailure('only one date allowed in an $add expression')
+    total = sum(v for v in values if not isinstance(v, datetime.datetime))
+    return dates[0] + datetime.timedelta(milliseconds=total) if dates else total
+
+
+def _subtract(arg, root, variables):
+    a, b = _args(arg, root, variables)
+    if _null(a) or _null(b):
+        return None
+    if isinstance(a, datetime.datetime):
+        if isinstance(b, datetime.datetime):
+            return int((a - b) / datetime.timedelta(milliseconds=1))
+        return a - datetime.timedelta(milliseconds=b)
+    return a - b
+
+
+def _multiply(arg, root, variables):
+    values = _args(arg, root, variables)
+    if any(_null(v) for v in values):
+        return None
+    return functools.reduce(lambda x, y: x * y, values, 1)
+
+
+def _divide(arg, root, variables):
+    a, b = _args(arg, root, variables)
+    if _null(a) or _null(b):
+        return None
+    if b == 0:
+        raise OperationFailure("can't $divide by zero")
+    return a / b
+
+
+def _rounding(fn):
+    def handler(arg, root, variables):
+        value = evaluate(arg[0] if isinstance(arg, list) else arg, root, variables)
+        if _null(value):
+            return None
+        # Same numeric type as the input, as MongoDB returns
+        return float(fn(value)) if isinstance(value, float) else fn(value)
+    return handler
+
+
+def _extreme(sign):
+    def handler(arg, root, variables):
+        values = _args(arg, root, variables)
+        if len(values) == 1 and isinstance(values[0], list):
+            values = values[0]
+        values = [v for v in values if not _null(v)]
+        if not values:
+            return None
+        best = values[0]
+        for value in values[1:]:
+            if compare(value, best) * sign > 0:
+                best = value
+        return best
+    return handler
+
+
+def _if_null(arg, root, variables):
+    values = _args(arg, root, variables)
+    for value in values[:-1]:
+        if not _null(value):
+            return value
+    return values[-1]
+
+
+def _cond(arg, root, variables):
+    if isinstance(arg, dict):
+        test, then, otherwise = arg['if'], arg['then'], arg['else']
+    else:
+        test, then, otherwise = arg
+    return evaluate(then if truthy(evaluate(test, root, variables)) else otherwise, root, variables)
+
+
+def _comparison(test):
+    # Unlike queries, expressions order a missing field below null: {$eq: ['$absent', null]} is false
+    def handler(arg, root, variables):
+        a, b = _args(arg, root, variables)
+        if a is MISSING or b is MISSING:
+            return test((b is MISSING) - (a is MISSING))
+        return test(compare(a, b))
+    return handler
+
+
+def _in(arg, root, variables):
+    value, array = _args(arg, root, variables)
+    if not isinstance(array, list):
+        raise OperationFailure('$in requires an array as a second argument')
+    return any(equal(value, item) for item in array)
+
+
+def _iterate(arg, root, variables, body):
+    values = evaluate(arg['input'], root, variables)
+    if _null(values):
+        return None
+    name = arg.get('as', 'this')
+    scope = dict(variables or {})
+    results = []
+    for value in values:
+        scope[name] = value
+        results.append((value, evaluate(arg[body], root, scope)))
+    return results
+
+
+def _filter(arg, root, variables):
+    results = _iterate(arg, root, variables, 'cond')
+    return None if results is None else [value for value, keep in results if truthy(keep)]
+
+
+def _map(arg, root, variables):
+    results = _iterate(arg, root, variables, 'in')
+    return None if results is None else [mapped for _, mapped in results]
+
+
+def _sum(arg, root, variables):
+    values = _args(arg, root, variables)
+    if len(values) == 1 and isinstance(values[0], list):
+        values = values[0]
+    return sum(v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool))
+
+
+def _to_string(arg, root, variables):
+    value = evaluate(arg, root, variables)
+    if _null(value):
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(timespec='milliseconds') + 'Z'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))  # MongoDB prints 2.0 as "2"
+    if isinstance(value, (dict, list)):
+        raise OperationFailure(f'Unsupported conversion from {type(value).__name__} to string in $toString')
+    return str(value)
+
+
+def _size(arg, root, variables):
+    value = evaluate(arg[0] if isinstance(arg, list) else arg, root, variables)
+    if not isinstance(value, list):
+        raise OperationFailure('The argument to $size must be an array')
+    return len(value)
+
+
+def _concat_arrays(arg, root, variables):
+    arrays = _args(arg, root, variables)
+    if any(_null(a) for a in arrays):
+        return None
+    if not all(isinstance(a, list) for a in arrays):
+        raise OperationFailure('$concatArrays only supports arrays')
+    return [item for array in arrays for item in array]
+
+
+def _slice(arg, root, variables):
+    # [array, n] (n < 0: the last -n items) or [array, position, n]
+    array, *bounds = _args(arg, root, variables)
+    if _null(array):
+        return None
+    if not isinstance(array, list):
+        raise OperationFailure('First argument to $slice must be an array')
+    if len(bounds) == 1:
+        n = bounds[0]
+        return array[n:] if n < 0 else array[:n]
+    position, n = bounds
+    start = max(len(array) + position, 0) if position < 0 else position
+    return array[start:start + n]
+
+
+_EXPRESSIONS = {
+    '$add': _add,
+    '$subtract': _subtract,
+    '$multiply': _multiply,
+    '$divide': _divide,
+    '$floor': _rounding(math.floor),
+    '$ceil': _rounding(math.ceil),
+    '$abs': _rounding(abs),
+    '$max': _extreme(1),
+    '$min': _extreme(-1),
+    '$ifNull': _if_null,
+    '$cond': _cond,
+    '$eq': _comparison(lambda c: c == 0),
+    '$ne': _comparison(lambda c: c != 0),
+    '$gt': _comparison(lambda c: c > 0),
+    '$gte': _comparison(lambda c: c >= 0),
+    '$lt': _comparison(lambda c: c < 0),
+    '$lte': _comparison(lambda c: c <= 0),
+    '$and': lambda arg, root, variables: all(truthy(v) for v in _args(arg, root, variables)),
+    '$or': lambda arg, root, variables: any(truthy(v) for v in _args(arg, root, variables)),
+    '$not': lambda arg, root, variables: not truthy(_args(arg, root, variables)[0]),
+    '$in': _in,
+    '$filter': _filter,
+    '$map': _map,
+    '$sum': _sum,
+    '$size': _size,
+    '$concatArrays': _concat_arrays,
+    '$slice': _slice,
+    '$literal': lambda arg, root, variables: arg,
+    '$toString': _to_string,
+}
+
+
+# --- Updates ---
+
+def _number(value, op, path):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise OperationFailure(f"Cannot apply {op} to a value of non-numeric type (field '{path}')")
+    return value
+
+
+def _each(value, op):
+    if isinstance(value, dict) and '$each' in value:
+        if set(value) != {'$each'}:
+            raise OperationFailure(f'{op} modifiers other than $each are not supported locally: {sorted(value)}')
+        return value['$each']
+    return [value]
+
+
+def _array_at(doc, path, op):
+    parent, key = _container(doc, path, create=True)
+    current = _get_field(parent, key)
+    if current is MISSING or current is None:
+        set_path(doc, path, [])
+        return get_path(doc, path)
+    if not isinstance(current, list):
+        raise OperationFailure(f"The field '{path}' must be an array to apply {op}")
+    return current
+
+
+def _pull_matches(item, cond):
+    if _is_operators(cond):
+        return _match_operators([item], cond)
+    if isinstance(cond, dict):
+        return isinstance(item, dict) and matches(item, cond)
+    return equal(item, cond)
+
+
+def apply_update(doc, update, inserting=False):
+    """Applies an update document or pipeline; returns the updated document (may be `doc` itself)"""
+    if isinstance(update, list):
+        for stage in update:
+            doc = apply_stage(doc, stage)
+        return doc
+    for op, fields in update.items():
+        if op == '$setOnInsert' and not inserting:
+            continue
+        for path, value in fields.items():
+            parent, key = _container(doc, path, create=op not in ('$unset', '$pull', '$rename'))
+            current = _get_field(parent, key) if parent is not None else MISSING
+            if op in ('$set', '$setOnInsert'):
+                set_path(doc, path, deepcopy(value))
+            elif op == '$unset':
+                unset_path(doc, path)
+            elif op == '$inc':
+                _number(value, op, path)
+                set_path(doc, path, value if current is MISSING else _number(current, op, path) + value)
+            elif op == '$mul':
+                _number(value, op, path)
+                set_path(doc, path, 0 * value if current is MISSING else _number(current, op, path) * value)
+            elif op in ('$max', '$min'):
+                sign = 1 if op == '$max' else -1
+                if current is MISSING or compare(value, current) * sign > 0:
+                    set_path(doc, path, deepcopy(value))
+            elif op == '$push':
+                _array_at(doc, path, op).extend(deepcopy(_each(value, op)))
+            elif op == '$addToSet':
+                array = _array_at(doc, path, op)
+                for item in _each(value, op):
+                    if not any(equal(item, existing) for existing in array):
+                        array.append(deepcopy(item))
+            elif op == '$pull':
+                if isinstance(current, list):
+                    current[:] = [item for item in current if not _pull_matches(item, value)]
+            elif op == '$rename':
+                if current is not MISSING:
+                    unset_path(doc, path)
+                    set_path(doc, value, current)
+            elif op == '$currentDate':
+                if value is not True and value != {'$type': 'date'}:
+                    raise OperationFailure(f'$currentDate only supports dates locally (field {path!r})')
+                now = datetime.datetime.utcnow()
+                set_path(doc, path, now.replace(microsecond=now.microsecond // 1000 * 1000))
+            else:
+                raise OperationFailure(f'Unknown modifier: {op}')
+    return doc
+
+
+def apply_stage(doc, stage):
+    """One document-shaping aggregation stage ($set/$addFields, $unset, $project, $replaceWith)"""
+    if len(stage) != 1:
+        raise OperationFailure(f'A pipeline stage specification object must contain exactly one field, got {list(stage)}')
+    name, spec = next(iter(stage.items()))
+    if name in ('$set', '$addFields'):
+        values = {path: evaluate(expr, doc) for path, expr in spec.items()}
+        for path, value in values.items():
+            if value is MISSING:
+                unset_path(doc, path)
+            else:
+                set_path(doc, path, value)
+        return doc
+    if name == '$unset':
+        for path in [spec] if isinstance(spec, str) else spec:
+            unset_path(doc, path)
+        return doc
+    if name == '$project':
+        return project(doc, spec)
+    if name in ('$replaceWith', '$replaceRoot'):
+        new_root = evaluate(spec['newRoot'] if name == '$replaceRoot' else spec, doc)
+        if not isinstance(new_root, dict):
+            raise OperationFailure(f'{name} requires a document')
+        return new_root
+    raise OperationFailure(f'Unsupported stage {name}')
+
+
+# --- Projection ---
+
+class _Computed:
+    """A projected field set from an expression (a leaf, never a sub-projection)"""
+
+    def __init__(self, expr):
+        self.expr = expr
+
+
+def _tree(paths):
+    tree = {}
+    for path, value in paths:
+        _check_path(path)
+        node = tree
+        parts = path.split('.')
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+            if not isinstance(node, dict):
+                raise OperationFailure(f'Path collision at {path}')
+        if parts[-1] in node:
+            raise OperationFailure(f'Path collision at {path}')
+        node[parts[-1]] = value
+    return tree
+
+
+def _exclude(value, tree):
+    if isinstance(value, list):
+        return [_exclude(item, tree) if isinstance(item, (dict, list)) else item for item in value]
+    for key, sub in tree.items():
+        if key not in value:
+            continue
+        if isinstance(sub, dict):
+            if isinstance(value[key], (dict, list)):
+                value[key] = _exclude(value[key], sub)
+        else:
+            del value[key]
+    return value
+
+
+def _include(value, tree, root):
+    if isinstance(value, list):
+        return [_include(item, tree, root) for item in value if isinstance(item, (dict, list))]
+    result = {}
+    for key, sub in tree.items():
+        if isinstance(sub, _Computed):
+            computed = evaluate(sub.expr, root)
+            if computed is not MISSING:
+                result[key] = computed
+        elif isinstance(sub, dict):
+            if key in value and isinstance(value[key], (dict, list)):
+                result[key] = _include(value[key], sub, root)
+        elif key in value:
+            result[key] = value[key]
+    return result
+
+
+def project(doc, projection):
+    """Applies a find/$project projection (inclusion, exclusion or computed fields)"""
+    if not projection:
+        return doc
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    id_spec = projection.get('_id', True)
+    keep_id = _projects(id_spec) is not False
+    fields = [(path, _projects(value)) for path, value in projection.items() if path != '_id']
+    excluding = [path for path, kind in fields if kind is False]
+    if len(excluding) == len(fields):
+        excluded = _tree([(path, None) for path in excluding] + ([] if keep_id else [('_id', None)]))
+        return _exclude(doc, excluded)
+    if excluding:
+        raise OperationFailure(f"Cannot do exclusion on field {excluding[0]} in inclusion projection")
+    result = _include(doc, _tree(fields), doc)
+    id_kind = _projects(id_spec)
+    if isinstance(id_kind, _Computed):
+        result['_id'] = evaluate(id_kind.expr, doc)
+    elif keep_id and '_id' in doc:
+        result = {'_id': doc['_id'], **result}
+    return result
+
+
+def _projects(value):
+    """False (exclude), True (include) or a _Computed field, as MongoDB reads a projection value"""
+    if isinstance(value, bool) or isinstance(value, (int, float)):
+        return bool(value)
+    return _Computed(value)
@@ -0,0 +1,887 @@
+"""
+Local Datastore
+Embedded, file-backed stand-in for MongoDB (DATASTORE=sqlite): one SQLite table of JSON documents
+per collection behind the pymongo calls the app makes, with expression indexes for the declared keys
+"""
+
+import datetime
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from bson.objectid import ObjectId
+from pymongo.common import validate_ok_for_replace, validate_ok_for_update
+from pymongo.errors import BulkWriteError, DuplicateKeyError, InvalidOperation, OperationFailure
+from pymongo.operations import DeleteMany, DeleteOne, IndexModel, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+from instrumentation import charge_command
+from local_query import (MISSING, apply_stage, apply_update, equal, get_path, matches, project, query_values,
+                         seed_from_filter, sort_documents)
+
+DEFAULT_DATABASE = 'the_system'
+# JSON strings starting with TAG hold a BSON value: TAG + 'd' + ISO datetime, 'o' + ObjectId hex,
+# 'b' + bytes hex, 'j' + JSON (non-scalar _id). Tagged dates and ids sort like the values.
+TAG = '\ue000'
+FETCH_SIZE = 256
+TTL_PURGE_INTERVAL = 60  # seconds between expireAfterSeconds sweeps of a collection
+SQL_OPERATORS = {'$eq': '=', '$gt': '>', '$gte': '>=', '$lt': '<', '$lte': '<='}
+STAGES = {'$match', '$sort', '$skip', '$limit', '$count', '$lookup', '$unwind',
+          '$set', '$addFields', '$unset', '$project', '$replaceWith', '$replaceRoot'}
+
+
+# --- Documents <-> JSON ---
+
+def _tagged(value):
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return TAG + 'd' + value.isoformat(timespec='milliseconds')  # BSON dates are milliseconds
+    if isinstance(value, ObjectId):
+        return TAG + 'o' + str(value)
+    if isinstance(value, bytes):
+        return TAG + 'b' + value.hex()
+    raise TypeError(f'Cannot store {type(value).__name__} in the local datastore')
+
+
+def _untagged(text):
+    kind, body = text[1:2], text[2:]
+    if kind == 'd':
+        return datetime.datetime.fromisoformat(body)
+    if kind == 'o':
+        return ObjectId(body)
+    if kind == 'b':
+        return bytes.fromhex(body)
+    if kind == 'j':
+        return _loads(body)
+    return text
+
+
+def _revive_list(values):
+    for i, value in enumerate(values):
+        if isinstance(value, str):
+            if value.startswith(TAG):
+                values[i] = _untagged(value)
+        elif isinstance(value, list):
+            _revive_list(value)
+    return values
+
+
+def _revive(obj):
+    for key, value in obj.items():
+        if isinstance(value, str):
+            if value.startswith(TAG):
+                obj[key] = _untagged(value)
+        elif isinstance(value, list):
+            _revive_list(value)
+    return obj
+
+
+def _dumps(doc):
+    # NaN would make the row unreadable to SQLite's json_extract
+    return json.dumps(doc, default=_tagged, ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+
+
+def _loads(text):
+    return json.loads(text, object_hook=_revive)
+
+
+def _param(value):
+    """SQL value comparing like json_extract() of the stored value; MISSING for documents/arrays"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (datetime.datetime, ObjectId, bytes)):
+        return _tagged(value)
+    return MISSING
+
+
+def _key(value):
+    """Primary key column value for an _id"""
+    key = _param(value)
+    return TAG + 'j' + _dumps(value) if key is MISSING else key
+
+
+def _unkey(key):
+    return _untagged(key) if isinstance(key, str) and key.startswith(TAG) else key
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _column(field):
+    if field == '_id':
+        return 'id'
+    path = '$.' + '.'.join('"' + part + '"' for part in field.split('.'))
+    return "json_extract(doc, '" + path.replace("'", "''") + "')"
+
+
+def _as_filter(spec):
+    if spec is None:
+        return {}
+    return spec if isinstance(spec, dict) else {'_id': spec}
+
+
+def _sort_spec(key_or_list, direction=None):
+    if key_or_list is None:
+        return None
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return [(key, direction) for key, direction in key_or_list]
+
+
+def _order_by(sort):
+    if not sort:
+        return 'rowid'
+    return ', '.join(_column(field) + (' DESC' if direction == -1 else '') for field, direction in sort)
+
+
+def _sql_ordered(doc, sort):
+    # json_extract orders numbers, strings and tagged values like MongoDB; arrays, documents and booleans it does not
+    return all(not isinstance(get_path(doc, field), (list, dict, bool)) for field, _ in sort)
+
+
+def _duplicate(collection, error):
+    message = f'E11000 duplicate key error collection: {collection} ({error})'
+    return DuplicateKeyError(message, 11000, {'code': 11000, 'errmsg': message})
+
+
+def _update_result(matched, modified, upserted_id):
+    raw = {'n': 1 if upserted_id is not None else matched, 'nModified': modified,
+           'updatedExisting': bool(matched), 'ok': 1.0}
+    if upserted_id is not None:
+        raw['upserted'] = upserted_id
+    return UpdateResult(raw, True)
+
+
+def _bulk_totals():
+    return {'writeErrors': [], 'writeConcernErrors': [], 'nInserted': 0, 'nUpserted': 0,
+            'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'upserted': []}
+
+
+# --- Client / database ---
+
+class LocalClient:
+    """
+    pymongo.MongoClient look-alike over one SQLite file (WAL). Reads use a
+    small pool of connections and never wait for the writer; writes share one
+    connection and run in BEGIN IMMEDIATE transactions, so read-modify-write
+    operations (find_one_and_update, $inc) are atomic like their MongoDB
+    counterparts, across threads and across processes using the same file.
+
+    change_log(collection) -> bool turns on the change log that local_sync
+    pushes to MongoDB: triggers record the _id of every written document.
+    """
+
+    def __init__(self, path, change_log=None, timeout=10):
+        self.path = path
+        self.timeout = timeout
+        self.change_log = change_log
+        self._lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._idle = []
+        self._closed = False
+        self._databases = {}
+        self._tables = set()  # created in this process (or found at open)
+        self._indexes = {}  # table -> {index name: spec}
+        self._ttl = {}  # table -> (field, seconds)
+        self._purged = {}  # table -> time.monotonic() of the last TTL sweep
+        self._writer = self._connect()
+
+        with self._write() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS _local_indexes '
+                         '(tbl TEXT NOT NULL, name TEXT NOT NULL, spec TEXT NOT NULL, PRIMARY KEY (tbl, name))')
+            conn.execute('CREATE TABLE IF NOT EXISTS _local_changes '
+                         '(seq INTEGER PRIMARY KEY AUTOINCREMENT, tbl TEXT NOT NULL, id)')
+            for tbl, name, spec in conn.execute('SELECT tbl, name, spec FROM _local_indexes').fetchall():
+                self._remember_index(tbl, name, _loads(spec))
+            for table in self._table_names(conn):
+                self._tables.add(table)
+                self._log_changes(conn, table, backfill=True)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')  # durable at checkpoints; a crash loses at most the last commits
+        return conn
+
+    @contextmanager
+    def _read(self):
+        if self._closed:
+            raise InvalidOperation('Cannot use LocalClient after close')
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                if self._closed:
+                    conn.close()
+                else:
+                    self._idle.append(conn)
+
+    @contextmanager
+    def _write(self):
+        if self._closed:
+            raise InvalidOperation('Cannot use LocalClient after close')
+        with self._write_lock:
+            conn = self._writer
+            if conn.in_transaction:  # nested (bulk_write -> _update)
+                yield conn
+                return
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                self._tables.clear()  # CREATE TABLEs were rolled back too; writes re-issue them
+                raise
+            conn.execute('COMMIT')
+
+    @staticmethod
+    def _table_names(conn):
+        rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                            "AND name NOT LIKE '\\_%' ESCAPE '\\' AND name NOT LIKE 'sqlite%'").fetchall()
+        return [name for (name,) in rows]
+
+    def _ensure_table(self, conn, table):
+        if table in self._tables:
+            return
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {_quote(table)} (id PRIMARY KEY, doc TEXT NOT NULL)')
+        self._log_changes(conn, table)
+        self._tables.add(table)
+
+    def _log_changes(self, conn, table, backfill=False):
+        if self.change_log is None or not self.change_log(table.split('.', 1)[1]):
+            return
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+                        (table + '/insert',)).fetchone():
+            return
+        literal = "'" + table.replace("'", "''") + "'"
+        for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            conn.execute(f'CREATE TRIGGER {_quote(table + "/" + event.lower())} AFTER {event} '
+                         f'ON {_quote(table)} BEGIN INSERT INTO _local_changes (tbl, id) '
+                         f'VALUES ({literal}, {row}.id); END')
+        # A file written before the log was turned on gets its existing rows queued once
+        if backfill:
+            conn.execute(f'INSERT INTO _local_changes (tbl, id) SELECT ?, id FROM {_quote(table)} ORDER BY rowid', (table,))
+
+    def _remember_index(self, table, name, spec):
+        self._indexes.setdefault(table, {})[name] = spec
+        if 'expireAfterSeconds' in spec:
+            self._ttl[table] = (next(iter(spec['key'])), spec['expireAfterSeconds'])
+
+    def _indexed_fields(self, table):
+        return {field for spec in self._indexes.get(table, {}).values() for field in spec['key']}
+
+    def _expire(self, conn, table):
+        ttl = self._ttl.get(table)
+        now = time.monotonic()
+        if ttl is None or now - self._purged.get(table, 0) < TTL_PURGE_INTERVAL:
+            return
+        self._purged[table] = now
+        field, seconds = ttl
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=seconds)
+        column = _column(field)
+        # Only dates expire; tagged dates sort after every plain string
+        conn.execute(f'DELETE FROM {_quote(table)} WHERE {column} >= ? AND {column} < ?',
+                     (TAG + 'd', _tagged(cutoff)))
+
+    def __getitem__(self, name):
+        database = self._databases.get(name)
+        if database is None:
+            database = self._databases.setdefault(name, LocalDatabase(self, name))
+        return database
+
+    def get_database(self, name=DEFAULT_DATABASE, **kwargs):
+        return self[name]
+
+    def server_info(self):
+        return {'version': f'sqlite {sqlite3.sqlite_version}', 'ok': 1.0}
+
+    # --- Change log (local_sync) ---
+
+    def pending_changes(self, limit=500):
+        """[(seq, database, collection, _id)] oldest first; one entry per document, at its latest change"""
+        with self._read() as conn:
+            rows = conn.execute('SELECT MAX(seq) AS last, tbl, id FROM _local_changes '
+                                'GROUP BY tbl, id ORDER BY last LIMIT ?', (limit,)).fetchall()
+        return [(seq, *table.split('.', 1), _unkey(key)) for seq, table, key in rows]
+
+    def ack_changes(self, changes):
+        """Forgets the given pending_changes() entries; later writes to the same documents stay queued"""
+        with self._write() as conn:
+            conn.executemany('DELETE FROM _local_changes WHERE tbl = ? AND id = ? AND seq <= ?',
+                             [(f'{database}.{collection}', _key(_id), seq) for seq, database, collection, _id in changes])
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+        with self._write_lock:
+            self._writer.close()
+
+
+class LocalDatabase:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self._collections = {}
+
+    def __getitem__(self, name):
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections.setdefault(name, LocalCollection(self, name))
+        return collection
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name, **kwargs):
+        return self[name]
+
+    def list_collection_names(self, **kwargs):
+        prefix = self.name + '.'
+        with self.client._read() as conn:
+            return [table[len(prefix):] for table in LocalClient._table_names(conn) if table.startswith(prefix)]
+
+    def drop_collection(self, name):
+        self[name].drop()
+
+    def command(self, command, value=1, **kwargs):
+        name = command if isinstance(command, str) else next(iter(command))
+        if name == 'ping':
+            return {'ok': 1.0}
+        raise OperationFailure(f"Command '{name}' is not supported by the local datastore")
+
+    def watch(self, *args, **kwargs):
+        raise OperationFailure('Change streams are not supported by the local datastore')
+
+
+# --- Collections ---
+
+class LocalCommandCursor:
+    """Already-computed results (aggregate)"""
+
+    def __init__(self, docs):
+        self._docs = iter(docs)
+        self.alive = True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            self.alive = False
+            raise
+
+    next = __next__
+
+    def close(self):
+        self._docs = iter(())
+        self.alive = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LocalCursor(LocalCommandCursor):
+    """find() cursor: sort/skip/limit apply until the first document is read"""
+
+    def __init__(self, collection, filter=None, projection=None, skip=0, limit=0, sort=None, **kwargs):
+        self.collection = collection
+        self.alive = True
+        self._filter = _as_filter(filter)
+        self._projection = projection
+        self._skip = skip
+        self._limit = limit
+        self._sort = _sort_spec(sort)
+        self._docs = None
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = _sort_spec(key_or_list, direction)
+        return self
+
+    def skip(self, skip):
+        self._skip = skip
+        return self
+
+    def limit(self, limit):
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size):
+        return self
+
+    def __next__(self):
+        if self._docs is None:
+            self._docs = iter(self.collection._find(self._filter, self._projection, self._sort,
+                                                    self._skip, abs(self._limit)))
+        return super().__next__()
+
+    next = __next__
+
+
+class LocalCollection:
+    """
+    Queries run in two steps: the conditions SQLite can answer from the _id
+    column or an index on the field (equality, ranges, $in on scalars) become
+    the WHERE clause, then every candidate is decoded and checked with the
+    full MongoDB semantics (local_query.matches). Unindexed filters scan.
+    """
+
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self.full_name = f'{database.name}.{name}'
+        self._client = database.client
+        self._table = _quote(self.full_name)
+
+    @contextmanager
+    def _command(self, command):
+        # Same accounting as pymongo commands: per-request budgets and /metrics
+        started = time.perf_counter()
+        outcome = {'docs': 0}
+        failed = True
+        try:
+            yield outcome
+            failed = False
+        finally:
+            charge_command(self.name, command, time.perf_counter() - started, outcome['docs'], failed)
+
+    def _prepare(self, conn):
+        self._client._ensure_table(conn, self.full_name)
+        self._client._expire(conn, self.full_name)
+
+    def _where(self, query):
+        # Indexed fields hold scalars here; json_extract of an array would not match its elements
+        indexed = self._client._indexed_fields(self.full_name)
+        clauses, params = [], []
+        for field, cond in query.items():
+            if field != '_id' and field not in indexed:
+                continue
+            column = _column(field)
+            operators = cond.items() if isinstance(cond, dict) and cond and next(iter(cond)).startswith('$') else [('$eq', cond)]
+            for op, arg in operators:
+                if op == '$eq' and arg is None:
+                    clauses.append(f'{column} IS NULL')
+                elif op in SQL_OPERATORS:
+                    value = _param(arg)
+                    if value is not MISSING and value is not None:
+                        clauses.append(f'{column} {SQL_OPERATORS[op]} ?')
+                        params.append(value)
+                elif op == '$in' and isinstance(arg, (list, tuple)):
+                    values = [_param(value) for value in arg]
+                    if not any(value is MISSING or value is None for value in values):
+                        clauses.append(f'{column} IN ({", ".join("?" * len(values))})' if values else '0')
+                        params.extend(values)
+        return ' AND '.join(clauses), params
+
+    def _select(self, conn, query, sort=None, skip=0, limit=0):
+        """Decoded documents matching `query`, in `sort` order (rowid without one)"""
+        where, params = self._where(query)
+        sql = f'SELECT doc FROM {self._table}{" WHERE " + where if where else ""} ORDER BY {_order_by(sort)}'
+        try:
+            cursor = conn.execute(sql, params)
+        except sqlite3.OperationalError as e:
+            if 'no such table' in str(e):
+                return []
+            raise
+        found = []
+        in_order = True  # until a sort value SQL cannot order turns up; then all matches are sorted here
+        try:
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                for (text,) in rows:
+                    doc = _loads(text)
+                    if not matches(doc, query):
+                        continue
+                    found.append(doc)
+                    if sort and in_order and not _sql_ordered(doc, sort):
+                        in_order = False
+                    if in_order and limit and len(found) >= skip + limit:
+                        return found[skip:]
+        finally:
+            cursor.close()
+        if not in_order:
+            sort_documents(found, sort)
+        return found[skip:skip + limit] if limit else found[skip:]
+
+    def _find(self, query, projection, sort, skip, limit):
+        with self._command('find') as outcome:
+            with self._client._read() as conn:
+                docs = self._select(conn, query, sort, skip, limit)
+            outcome['docs'] = len(docs)
+        return [project(doc, projection) for doc in docs] if projection else docs
+
+    def _insert(self, conn, doc):
+        if '_id' not in doc:
+            doc['_id'] = ObjectId()
+        try:
+            conn.execute(f'INSERT INTO {self._table} (id, doc) VALUES (?, ?)', (_key(doc['_id']), _dumps(doc)))
+        except sqlite3.IntegrityError as e:
+            raise _duplicate(self.full_name, e)
+
+    def _update(self, conn, query, update, upsert=False, multi=False, replace=False, sort=None):
+        """(matched, modified, upserted _id, first document before, first document after)"""
+        docs = self._select(conn, query, sort, limit=0 if multi else 1)
+        modified = 0
+        before = after = None
+        for doc in docs:
+            old = _dumps(doc)
+            if before is None:
+                before = _loads(old)
+            if replace:
+                new = {'_id': doc['_id'], **{k: v for k, v in update.items() if k != '_id'}}
+                if '_id' in update and not equal(update['_id'], doc['_id']):
+                    raise OperationFailure("The _id field cannot be changed", 66)
+            else:
+                _id = doc['_id']
+                new = apply_update(doc, update)
+                if not equal(new.get('_id', MISSING), _id):
+                    raise OperationFailure("Performing an update on the path '_id' would modify the immutable field '_id'", 66)
+            text = _dumps(new)
+            if text != old:
+                try:
+                    conn.execute(f'UPDATE {self._table} SET doc = ? WHERE id = ?', (text, _key(doc['_id'])))
+                except sqlite3.IntegrityError as e:
+                    raise _duplicate(self.full_name, e)
+                modified += 1
+            if after is None:
+                after = _loads(text)  # stored form: millisecond dates, no aliasing with the caller
+        if docs:
+            return len(docs), modified, None, before, after
+        if not upsert:
+            return 0, 0, None, None, None
+
+        seed = seed_from_filter(query)
+        if replace:
+            new = {**({'_id': seed['_id']} if '_id' in seed else {}), **update}
+        else:
+            new = apply_update(seed, update, inserting=True)
+        self._insert(conn, new)
+        return 0, 0, new['_id'], None, _loads(_dumps(new))
+
+    def _delete(self, conn, query, multi, sort=None):
+        docs = self._select(conn, query, sort, limit=0 if multi else 1)
+        conn.executemany(f'DELETE FROM {self._table} WHERE id = ?', [(_key(doc['_id']),) for doc in docs])
+        return docs
+
+    # --- Reads ---
+
+    def find(self, *args, **kwargs):
+        return LocalCursor(self, *args, **kwargs)
+
+    def find_one(self, filter=None, *args, **kwargs):
+        for doc in self.find(filter, *args, **kwargs).limit(1):
+            return doc
+        return None
+
+    def count_documents(self, filter, skip=0, limit=0, **kwargs):
+        with self._command('count') as outcome:
+            with self._client._read() as conn:
+                outcome['docs'] = 1
+                return len(self._select(conn, filter, skip=skip, limit=limit))
+
+    def estimated_document_count(self, **kwargs):
+        with self._command('count') as outcome:
+            with self._client._read() as conn:
+                outcome['docs'] = 1
+                try:
+                    return conn.execute(f'SELECT COUNT(*) FROM {self._table}').fetchone()[0]
+                except sqlite3.OperationalError:
+                    return 0
+
+    def distinct(self, key, filter=None, **kwargs):
+        values = []
+        with self._command('distinct') as outcome:
+            with self._client._read() as conn:
+                for doc in self._select(conn, _as_filter(filter)):
+                    for value in query_values(doc, key):
+                        if value is not MISSING and not any(equal(value, seen) for seen in values):
+                            values.append(value)
+            outcome['docs'] = 1
+        return values
+
+    def aggregate(self, pipeline, **kwargs):
+        """
+        Leading $match (and a $sort/$limit right after it) run as a find;
+        then $match, $sort, $skip, $limit, $count, $lookup (localField/
+        foreignField), $unwind, $set/$addFields, $project, $unset and
+        $replaceWith/$replaceRoot run in Python.
+        """
+        stages = list(pipeline)
+        for stage in stages:
+            if len(stage) != 1 or next(iter(stage)) not in STAGES:
+                raise OperationFailure(f'Unsupported pipeline stage {list(stage)} in the local datastore')
+        query, sort, limit = {}, None, 0
+        if stages and '$match' in stages[0]:
+            query = stages.pop(0)['$match']
+            if stages and '$sort' in stages[0]:
+                sort = _sort_spec(stages.pop(0)['$sort'])
+            if stages and '$limit' in stages[0]:
+                limit = stages.pop(0)['$limit']
+        with self._command('aggregate') as outcome:
+            with self._client._read() as conn:
+                docs = self._select(conn, query, sort, limit=limit)
+                for stage in stages:
+                    docs = self._run_stage(conn, docs, stage)
+            outcome['docs'] = len(docs)
+        return LocalCommandCursor(docs)
+
+    def _run_stage(self, conn, docs, stage):
+        (name, spec), = stage.items()
+        if name == '$match':
+            return [doc for doc in docs if matches(doc, spec)]
+        if name == '$sort':
+            return sort_documents(docs, list(spec.items()))
+        if name == '$skip':
+            return docs[spec:]
+        if name == '$limit':
+            return docs[:spec]
+        if name == '$count':
+            return [{spec: len(docs)}] if docs else []
+        if name == '$lookup':
+            return [self._lookup(conn, doc, spec) for doc in docs]
+        if name == '$unwind':
+            return self._unwind(docs, spec)
+        return [apply_stage(doc, stage) for doc in docs]
+
+    def _lookup(self, conn, doc, spec):
+        if 'pipeline' in spec:
+            raise OperationFailure('$lookup with a pipeline is not supported by the local datastore')
+        values = [value for value in query_values(doc, spec['localField']) if value is not MISSING]
+        # A missing/null local field joins documents whose foreign field is missing or null
+        query = {spec['foreignField']: {'$in': values} if values else None}
+        doc[spec['as']] = self.database[spec['from']]._select(conn, query)
+        return doc
+
+    @staticmethod
+    def _unwind(docs, spec):
+        if isinstance(spec, str):
+            spec = {'path': spec}
+        if set(spec) - {'path', 'preserveNullAndEmptyArrays'} or '.' in spec['path']:
+            raise OperationFailure(f'$unwind {spec} is not supported by the local datastore')
+        field = spec['path'][1:]
+        keep_empty = spec.get('preserveNullAndEmptyArrays', False)
+        unwound = []
+        for doc in docs:
+            values = doc.get(field)
+            if isinstance(values, list) and values:
+                unwound.extend({**doc, field: value} for value in values)
+            elif values is not None and not isinstance(values, list):
+                unwound.append(doc)
+            elif keep_empty:
+                if values == []:
+                    doc.pop(field)  # MongoDB drops an empty array but keeps a null
+                unwound.append(doc)
+        return unwound
+
+    # --- Writes ---
+
+    def insert_one(self, document, **kwargs):
+        with self._command('insert') as outcome:
+            with self._client._write() as conn:
+                self._prepare(conn)
+                self._insert(conn, document)
+            outcome['docs'] = 1
+        return InsertOneResult(document['_id'], True)
+
+    def insert_many(self, documents, ordered=True, **kwargs):
+        documents = list(documents)
+        for doc in documents:
+            if '_id' not in doc:
+                doc['_id'] = ObjectId()
+        totals = _bulk_totals()
+        with self._command('insert') as outcome:
+            with self._client._write() as conn:
+                self._prepare(conn)
+                for index, doc in enumerate(documents):
+                    try:
+                        self._insert(conn, doc)
+                        totals['nInserted'] += 1
+                    except DuplicateKeyError as e:
+                        totals['writeErrors'].append({'index': index, 'code': e.code, 'errmsg': str(e), 'op': doc})
+                        if ordered:
+                            break
+            outcome['docs'] = totals['nInserted']
+        if totals['writeErrors']:
+            raise BulkWriteError(totals)
+        return InsertManyResult([doc['_id'] for doc in documents], True)
+
+    def _write_update(self, command, filter, update, upsert, multi=False, replace=False):
+        with self._command(command) as outcome:
+            with self._client._write() as conn:
+                self._prepare(conn)
+                matched, modified, upserted_id, _, _ = self._update(
+                    conn, _as_filter(filter), update, upsert, multi=multi, replace=replace)
+            outcome['docs'] = matched
+        return _update_result(matched, modified, upserted_id)
+
+    def update_one(self, filter, update, upsert=False, **kwargs):
+        validate_ok_for_update(update)
+        return self._write_update('update', filter, update, upsert)
+
+    def update_many(self, filter, update, upsert=False, **kwargs):
+        validate_ok_for_update(update)
+        return self._write_update('update', filter, update, upsert, multi=True)
+
+    def replace_one(self, filter, replacement, upsert=False, **kwargs):
+        validate_ok_for_replace(replacement)
+        return self._write_update('update', filter, replacement, upsert, replace=True)
+
+    def _write_delete(self, filter, multi):
+        with self._command('delete') as outcome:
+            with self._client._write() as conn:
+                self._prepare(conn)
+                removed = len(self._delete(conn, _as_filter(filter), multi))
+            outcome['docs'] = removed
+        return DeleteResult({'n': removed, 'ok': 1.0}, True)
+
+    def delete_one(self, filter, **kwargs):
+        return self._write_delete(filter, False)
+
+    def delete_many(self, filter, **kwargs):
+        return self._write_delete(filter, True)
+
+    def _find_and_modify(self, filter, update, projection, sort, upsert, return_document, replace=False):
+        with self._command('findAndModify') as outcome:
+            with self._client._write() as conn:
+                self._prepare(conn)
+                matched, _, upserted_id, before, after = self._update(
+                    conn, _as_filter(filter), update, upsert, replace=replace, sort=_sort_spec(sort))
+            outcome['docs'] = 1 if matched or upserted_id is not None else 0
+        doc = after if return_document else before
+        return project(doc, projection) if doc is not None and projection else doc
+
+    def find_one_and_update(self, filter, update, projection=None, sort=None, upsert=False,
+                            return_document=False, **kwargs):
+        validate_ok_for_update(update)
+        return self._find_and_modify(filter, update, projection, sort, upsert, return_document)
+
+    def find_one_and_replace(self, filter, replacement, projection=None, sort=None, upsert=False,
+                             return_document=False, **kwargs):
+        validate_ok_for_replace(replacement)
+        return self._find_and_modify(filter, replacement, projection, sort, upsert, return_document, replace=True)
+
+    def find_one_and_delete(self, filter, projection=None, sort=None, **kwargs):
+        with self._command('findAndModify') as outcome:
+            with self._client._write() as conn:
+                self._prepare(conn)
+                removed = self._delete(conn, _as_filter(filter), False, _sort_spec(sort))
+            outcome['docs'] = len(removed)
+        if not removed:
+            return None
+        return project(removed[0], projection) if projection else removed[0]
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        """One transaction; failed operations are reported like MongoDB's (BulkWriteError), the rest commit"""
+        totals = _bulk_totals()
+        with self._command('bulkWrite') as outcome:
+            with self._client._write() as conn:
+                self._prepare(conn)
+                for index, request in enumerate(requests):
+                    try:
+                        self._apply(conn, index, request, totals)
+                    except OperationFailure as e:
+                        op = getattr(request, '_doc', None) or getattr(request, '_filter', None)
+                        totals['writeErrors'].append({'index': index, 'code': e.code, 'errmsg': str(e), 'op': op})
+                        if ordered:
+                            break
+            outcome['docs'] = totals['nInserted'] + totals['nMatched'] + totals['nUpserted'] + totals['nRemoved']
+        if totals['writeErrors']:
+            raise BulkWriteError(totals)
+        return BulkWriteResult(totals, True)
+
+    def _apply(self, conn, index, request, totals):
+        if isinstance(request, InsertOne):
+            self._insert(conn, request._doc)
+            totals['nInserted'] += 1
+        elif isinstance(request, (UpdateOne, UpdateMany, ReplaceOne)):
+            matched, modified, upserted_id, _, _ = self._update(
+                conn, request._filter, request._doc, request._upsert,
+                multi=isinstance(request, UpdateMany), replace=isinstance(request, ReplaceOne))
+            totals['nMatched'] += matched
+            totals['nModified'] += modified
+            if upserted_id is not None:
+                totals['nUpserted'] += 1
+                totals['upserted'].append({'index': index, '_id': upserted_id})
+        elif isinstance(request, (DeleteOne, DeleteMany)):
+            totals['nRemoved'] += len(self._delete(conn, request._filter, isinstance(request, DeleteMany)))
+        else:
+            raise TypeError(f'{request!r} is not a valid request')
+
+    # --- Indexes / admin ---
+
+    def create_indexes(self, indexes, **kwargs):
+        names = []
+        with self._command('createIndexes'):
+            with self._client._write() as conn:
+                self._client._ensure_table(conn, self.full_name)
+                for model in indexes:
+                    names.append(self._create_index(conn, dict(model.document)))
+        return names
+
+    def create_index(self, keys, **kwargs):
+        return self.create_indexes([IndexModel(keys, **kwargs)])[0]
+
+    def _create_index(self, conn, spec):
+        """
+        SQLite expression index on json_extract() of each key. unique holds
+        across missing fields (NULLs are distinct, as with sparse); sparse and
+        partialFilterExpression only narrow MongoDB's index, so a full index
+        serves the same queries. expireAfterSeconds purges on writes.
+        """
+        spec['key'] = dict(spec['key'])
+        name = spec['name']
+        if any(direction not in (1, -1) for direction in spec['key'].values()):
+            raise OperationFailure(f'Index {name}: only ascending/descending keys are supported locally')
+        if spec.get('unique') and spec.get('partialFilterExpression'):
+            raise OperationFailure(f'Index {name}: partial unique indexes are not supported locally')
+        if list(spec['key']) != ['_id']:
+            columns = ', '.join(_column(field) + (' DESC' if direction == -1 else '')
+                                for field, direction in spec['key'].items())
+            unique = 'UNIQUE ' if spec.get('unique') else ''
+            try:
+                conn.execute(f'CREATE {unique}INDEX IF NOT EXISTS {_quote(self.full_name + "/" + name)} '
+                             f'ON {self._table} ({columns})')
+            except sqlite3.IntegrityError as e:
+                raise OperationFailure(f'Index build failed: {name}: {e}', 11000)
+        conn.execute('INSERT OR REPLACE INTO _local_indexes (tbl, name, spec) VALUES (?, ?, ?)',
+                     (self.full_name, name, _dumps(spec)))
+        self._client._remember_index(self.full_name, name, spec)
+        return name
+
+    def index_information(self):
+        info = {'_id_': {'key': [('_id', 1)]}}
+        for name, spec in self._client._indexes.get(self.full_name, {}).items():
+            info[name] = {**{k: v for k, v in spec.items() if k not in ('key', 'name')}, 'key': list(spec['key'].items())}
+        return info
+
+    def drop(self, **kwargs):
+        with self._client._write() as conn:
+            conn.execute(f'DROP TABLE IF EXISTS {self._table}')
+            conn.execute('DELETE FROM _local_indexes WHERE tbl = ?', (self.full_name,))
+        self._client._tables.discard(self.full_name)
+        self._client._indexes.pop(self.full_name, None)
+        self._client._ttl.pop(self.full_name, None)
+
+    def watch(self, *args, **kwargs):
+        raise OperationFailure('Change streams are not supported by the local datastore')
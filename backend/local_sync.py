@@ -0,0 +1,128 @@
+"""
+Local Sync
+One-way push of the desktop datastore (DATASTORE=sqlite) to MongoDB: documents written locally
+since the last push are upserted by _id (or deleted) in the remote database
+Run: python local_sync.py   (one push now, with LOCAL_DB_PATH and LOCAL_SYNC_URI)
+"""
+
+import os
+import sys
+
+from pymongo import DeleteOne, MongoClient, ReplaceOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from config import Config
+from jobs import PeriodicJob
+
+# Per-process or derived data; the server's migrations and jobs rebuild these from what is pushed
+NOT_SYNCED = {'events', 'stream_tickets', '_migrations', 'analytics_state', 'analytics_rollups', 'cohort_insights'}
+
+
+def should_log(collection):
+    """LocalClient change_log predicate"""
+    return collection not in NOT_SYNCED
+
+
+def _syncable(collection, doc):
+    # Player data only: catalogs (skills, titles, system quests, shop) are seeded on both sides
+    return collection == 'users' or 'user_id' in doc
+
+
+def push_changes(local_db, remote_db, changes):
+    """
+    Sends the documents behind `changes` (LocalClient.pending_changes) and
+    acknowledges them; returns how many were sent. Network errors propagate
+    and leave the changes queued. Writes the server rejects (typically a
+    unique key held there by another _id) are reported and dropped: the local
+    copy is sent again the next time it changes.
+    """
+    by_collection = {}
+    for _, _, collection, _id in changes:
+        by_collection.setdefault(collection, []).append(_id)
+
+    sent = 0
+    for collection, ids in by_collection.items():
+        docs = {doc['_id']: doc for doc in local_db[collection].find({'_id': {'$in': ids}})}
+        requests = []
+        for _id in ids:
+            doc = docs.get(_id)
+            if doc is None:
+                requests.append(DeleteOne({'_id': _id}))
+            elif _syncable(collection, doc):
+                requests.append(ReplaceOne({'_id': _id}, doc, upsert=True))
+        if not requests:
+            continue
+        try:
+            remote_db[collection].bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details['writeErrors']
+            print(f"Local sync: {len(errors)} {collection} document(s) rejected ({errors[0]['errmsg']})")
+        sent += len(requests)
+
+    local_db.client.ack_changes(changes)
+    return sent
+
+
+def push_all(local_db, remote_db, batch_size=None):
+    """Pushes batches until the change log is empty; returns the number of documents sent"""
+    total = 0
+    while True:
+        changes = local_db.client.pending_changes(batch_size or Config.LOCAL_SYNC_BATCH)
+        if not changes:
+            return total
+        total += push_changes(local_db, remote_db, changes)
+
+
+class LocalSyncJob(PeriodicJob):
+    """
+    Pushes the local change log every `interval` seconds. Disabled without
+    LOCAL_SYNC_URI. Offline runs fail after server selection times out and
+    keep everything queued for the next one.
+    """
+
+    name = 'local-sync'
+
+    def __init__(self, db, uri=None, interval=None):
+        self.uri = uri if uri is not None else Config.LOCAL_SYNC_URI
+        interval = interval if interval is not None else Config.LOCAL_SYNC_INTERVAL
+        super().__init__(interval if self.uri else 0)
+        self.db = db
+        self._remote = None
+
+    def run(self):
+        if self._remote is None:
+            self._remote = MongoClient(self.uri, serverSelectionTimeoutMS=Config.MONGO_SERVER_SELECTION_TIMEOUT_MS)
+        pushed = push_all(self.db, self._remote[self.db.name])
+        if pushed:
+            print(f"🔄 Local sync: {pushed} document(s) pushed")
+        return pushed
+
+    def close(self):
+        super().close()
+        if self._remote is not None:
+            self._remote.close()
+
+
+def main():
+    """One push now (before switching machines, or from a scheduled task)"""
+    from local_store import LocalClient
+    from migrations import _connect
+
+    client = _connect()
+    job = LocalSyncJob(client['the_system'], uri=os.getenv('LOCAL_SYNC_URI'))
+    if not job.uri or not isinstance(client, LocalClient):
+        client.close()
+        print("❌ Needs DATASTORE=sqlite and LOCAL_SYNC_URI")
+        sys.exit(1)
+    try:
+        print(f"✅ {job.run()} document(s) pushed")
+    except PyMongoError as e:
+        print(f"❌ Sync failed, changes stay queued: {e}")
+        sys.exit(1)
+    finally:
+        job.close()
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,351 @@
+"""
+Migrations
+Versioned seed/migration runner; applied versions are recorded in `_migrations`.
+Runs once per deployment (gunicorn on_starting hook, `python simple_app.py` or the CLI),
+never on the request path. A lease lock makes one process the leader when several start together.
+Run: python migrations.py run | status
+"""
+
+import datetime
+import os
+import socket
+import sys
+import time
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from indexes import ensure_indexes
+
+COLLECTION = '_migrations'
+LOCK_ID = '_lock'
+LOCK_TTL = 300  # seconds; a crashed leader's lock expires after this
+
+# --- Seed data ---
+
+DEFAULT_QUESTS = [
+    # --- PHYSICAL TRAINING (The Daily Quest) ---
+    {
+        'quest_id': 'physical_pushups',
+        'title': '100 Push-ups',
+        'description': 'Target: Pectalis Major, Triceps. Keep core tight.',
+        'type': 'daily',
+        'category': 'physical', # NEW FIELD
+        'difficulty': 'SS',
+        'exp_reward': 100,
+        'stat_rewards': {'strength': 3},
+        'stamina_cost': 10,
+        'is_custom': False
+    },
+    {
+        'quest_id': 'physical_situps',
+        'title': '100 Sit-ups',
+        'description': 'Target: Abdominal Muscles.',
+        'type': 'daily',
+        'category': 'physical',
+        'difficulty': 'SS',
+        'exp_reward': 100,
+        'stat_rewards': {'agility': 1, 'stamina': 2},
+        'stamina_cost': 10,
+        'is_custom': False
+    },
+    {
+        'quest_id': 'physical_squats',
+        'title': '100 Squats',
+        'description': 'Target: Quadriceps, Glutes.',
+        'type': 'daily',
+        'category': 'physical',
+        'difficulty': 'SS',
+        'exp_reward': 100,
+        'stat_rewards': {'strength': 2, 'agility': 1},
+        'stamina_cost': 10,
+        'is_custom': False
+    },
+    {
+        'quest_id': 'physical_run',
+        'title': '10km Run',
+        'description': 'Cardio Endurance Training.',
+        'type': 'daily',
+        'category': 'physical',
+        'difficulty': 'SS',
+        'exp_reward': 200,
+        'stat_rewards': {'stamina': 5, 'agility': 3},
+        'stamina_cost': 30,
+        'is_custom': False
+    },
+
+    # --- SYSTEM MISSIONS ---
+    {
+        'quest_id': 'sys_coding',
+        'title': 'Code for 2 Hours',
+        'description': 'Practice coding / Project Development.',
+        'type': 'daily',
+        'category': 'system',
+        'difficulty': 'medium',
+        'exp_reward': 150,
+        'stat_rewards': {'intelligence': 4},
+        'stamina_cost': 20,
+        'is_custom': False
+    },
+    {
+        'quest_id': 'sys_reading',
+        'title': 'Read Technical Docs',
+        'description': 'Acquire new knowledge.',
+        'type': 'daily',
+        'category': 'system',
+        'difficulty': 'easy',
+        'exp_reward': 50,
+        'stat_rewards': {'intelligence': 2},
+        'stamina_cost': 10,
+        'is_custom': False
+    }
+]
+
+DEFAULT_SKILLS = [
+    {
+        'skill_id': 'active_heal',
+        'name': 'Recovery',
+        'type': 'active',
+        'description': 'Restores Health. Effect increases with level.',
+        'effect': {'health': 30},
+        'scaling': {'health': 5}, # +5 per level
+        'stamina_cost': 20,
+        'unlock_cost': 1,
+        'max_level': 5,
+        'real_world_effect': {
+            'type': 'breathing',
+            'duration': 60 # seconds
+        }
+    },
+    {
+        'skill_id': 'active_focus',
+        'name': 'Focus Mode',
+        'type': 'active',
+        'description': 'Grants immediate EXP. Effect increases with level.',
+        'effect': {'exp': 50},
+        'scaling': {'exp': 5}, # +5 per level
+        'stamina_cost': 15,
+        'unlock_cost': 2,
+        'max_level': 10,
+        'real_world_effect': {
+            'type': 'audio',
+            'src': 'https://cdn.pixabay.com/download/audio/2022/05/27/audio_1808fbf07a.mp3?filename=lofi-study-112762.mp3', 
+            'label': 'Lo-Fi Beats'
+        }
+    },
+    {
+        'skill_id': 'passive_str',
+        'name': 'Iron Will',
+        'type': 'passive',
+        'description': 'Increases Strength.',
+        'stat_bonus': {'strength': 5},
+        'scaling': {'strength': 1}, # +1 per level
+        'unlock_cost': 2,
+        'max_level': 10
+    }
+]
+
+DEFAULT_SHOP_ITEMS = [
+    {
+        'item_id': 'potion_stamina_small',
+        'name': 'Minor Stamina Potion',
+        'type': 'consumable',
+        'description': 'Restores 50 Stamina.',
+        'effect': {'stamina': 50},
+        'price': 100,
+        'image': '🧪'
+    },
+    {
+        'item_id': 'potion_health_small',
+        'name': 'Minor Health Potion',
+        'type': 'consumable',
+        'description': 'Restores 50 Health.',
+        'effect': {'health': 50},
+        'price': 150,
+        'image': '❤️'
+    },
+    {
+        'item_id': 'xp_booster_1h',
+        'name': 'XP Scroll (Small)',
+        'type': 'consumable',
+        'description': 'Grants instant 500 EXP.',
+        'effect': {'exp': 500},
+        'price': 500,
+        'image': '📜'
+    }
+]
+
+# Quest ids from before the Physical/System split
+LEGACY_QUEST_IDS = ['daily_coding', 'morning_exercise', 'study_session']
+
+
+def _upsert_defaults(collection, key, docs, extra_filter=None, always_set=()):
+    """
+    Insert defaults that are missing (matched on `key`) without touching
+    existing ones, except for the fields in `always_set`.
+    """
+    ops = []
+    for doc in docs:
+        query = {key: doc[key], **(extra_filter or {})}
+        update = {'$setOnInsert': {k: v for k, v in doc.items() if k not in always_set}}
+        overwrite = {k: doc[k] for k in always_set if k in doc}
+        if overwrite:
+            update['$set'] = overwrite
+        ops.append(UpdateOne(query, update, upsert=True))
+    return collection.bulk_write(ops, ordered=False).upserted_count
+
+
+# --- Migrations (append only; never renumber) ---
+
+def seed_quests(db):
+    """Physical/System quest split: drop the legacy defaults, add the new system quests"""
+    db.quests.delete_many({'quest_id': {'$in': LEGACY_QUEST_IDS}})
+    _upsert_defaults(db.quests, 'quest_id', DEFAULT_QUESTS, extra_filter={'user_id': {'$exists': False}})
+
+
+def seed_skills(db):
+    """Default skills; real_world_effect is (re)applied to existing ones too"""
+    _upsert_defaults(db.skills, 'skill_id', DEFAULT_SKILLS, always_set=('real_world_effect',))
+
+
+def seed_shop(db):
+    _upsert_defaults(db.shop_items, 'item_id', DEFAULT_SHOP_ITEMS)
+
+
+def dungeon_dates_and_history(db):
+    """
+    Dungeon timestamps become BSON dates (the sweeper range-scans end_time),
+    and sessions that already ended move to dungeon_history.
+    """
+    ops = []
+    for session in db.active_dungeons.find({'end_time': {'$type': 'string'}}, {'start_time': 1, 'end_time': 1}):
+        ops.append(UpdateOne({'_id': session['_id']}, {'$set': {
+            'start_time': datetime.datetime.fromisoformat(session['start_time']),
+            'end_time': datetime.datetime.fromisoformat(session['end_time'])
+        }}))
+    if ops:
+        db.active_dungeons.bulk_write(ops, ordered=False)
+
+    finished = list(db.active_dungeons.find({'status': {'$ne': 'active'}}))
+    if finished:
+        for session in finished:
+            ended = session.get('completed_at') or session.get('failed_at')
+            session['ended_at'] = datetime.datetime.fromisoformat(ended) if isinstance(ended, str) else ended
+        db.dungeon_history.insert_many(finished, ordered=False)
+        db.active_dungeons.delete_many({'_id': {'$in': [s['_id'] for s in finished]}})
+
+
+def stamina_regen_fields(db):
+    """Start the regeneration clock (stamina_updated_at/stamina_full_tick) for existing players"""
+    from stamina import regen_update
+    db.stats.update_many({'stamina_updated_at': {'$exists': False}}, regen_update(datetime.datetime.utcnow()))
+
+
+MIGRATIONS = [
+    ('0001_seed_quests', 'Physical/System default quests', seed_quests),
+    ('0002_seed_skills', 'Default skills and real-world effects', seed_skills),
+    ('0003_seed_shop', 'Default shop items', seed_shop),
+    ('0004_dungeon_dates_and_history', 'Dungeon BSON dates; archive finished sessions', dungeon_dates_and_history),
+    ('0005_stamina_regen_fields', 'Lazy stamina regeneration clock', stamina_regen_fields),
+]
+
+
+# --- Runner ---
+
+def applied_versions(db):
+    return set(db[COLLECTION].distinct('_id', {'_id': {'$ne': LOCK_ID}}))
+
+
+def pending(db):
+    done = applied_versions(db)
+    return [m for m in MIGRATIONS if m[0] not in done]
+
+
+def _acquire_lock(db, owner):
+    now = datetime.datetime.utcnow()
+    try:
+        db[COLLECTION].find_one_and_update(
+            {'_id': LOCK_ID, '$or': [{'expires_at': {'$lt': now}}, {'owner': owner}]},
+            {'$set': {'owner': owner, 'expires_at': now + datetime.timedelta(seconds=LOCK_TTL)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        # Held (and not expired) by another process
+        return False
+
+
+def _release_lock(db, owner):
+    db[COLLECTION].delete_one({'_id': LOCK_ID, 'owner': owner})
+
+
+def run_migrations(db, wait=30):
+    """
+    Ensures indexes and applies pending migrations in order.
+    Waits up to `wait` seconds for another leader to finish.
+    Returns the versions applied here, or None if the lock was never acquired.
+    """
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    deadline = time.monotonic() + wait
+    while not _acquire_lock(db, owner):
+        if time.monotonic() >= deadline:
+            print("⚠️  Migrations are running elsewhere; not waiting any longer")
+            return None
+        time.sleep(1)
+
+    applied = []
+    try:
+        ensure_indexes(db)
+        for version, description, migrate in pending(db):
+            started = time.monotonic()
+            migrate(db)
+            db[COLLECTION].insert_one({
+                '_id': version,
+                'description': description,
+                'applied_at': datetime.datetime.utcnow(),
+                'duration_ms': int((time.monotonic() - started) * 1000)
+            })
+            applied.append(version)
+            print(f"✅ Migration {version}: {description}")
+    finally:
+        _release_lock(db, owner)
+    return applied
+
+
+def _connect():
+    from datastore import mongo_uri, open_client
+
+    # The app's .env and URI resolution (config.find_env_file, datastore.mongo_uri);
+    # DATASTORE=sqlite opens the desktop build's local file instead
+    return open_client(mongo_uri(), datastore=os.getenv('DATASTORE'), path=os.getenv('LOCAL_DB_PATH'),
+                       sync_uri=os.getenv('LOCAL_SYNC_URI'), serverSelectionTimeoutMS=5000)
+
+
+def run_from_env(wait=30):
+    """Connects with MONGO_URI (or the local file), runs pending migrations and closes the client (pre-fork safe)"""
+    client = _connect()
+    try:
+        return run_migrations(client['the_system'], wait=wait)
+    finally:
+        client.close()
+
+
+def main():
+    action = sys.argv[1] if len(sys.argv) > 1 else 'status'
+
+    if action == 'run':
+        applied = run_from_env()
+        if applied is None:
+            sys.exit(1)
+        print(f"✅ {len(applied)} migration(s) applied" if applied else "✅ Up to date")
+        return
+
+    client = _connect()
+    done = applied_versions(client['the_system'])
+    for version, description, _ in MIGRATIONS:
+        print(f"{'✅' if version in done else '⏳'} {version}  {description}")
+    client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,8 @@ Handles user data and authentication
 from datetime import datetime
 import bcrypt
 
+from config import Config
+
 class User:
     """User model for authentication and profile"""
     
@@ -19,7 +21,7 @@ class User:
             return None
         
         # Hash password
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(Config.BCRYPT_ROUNDS))
         
         user_data = {
             'username': username,
@@ -101,26 +103,22 @@ class User:
         return True
     
     def add_exp(self, user_id, exp_amount):
-        """Add EXP to user and handle level-ups"""
+        """Add EXP to user and handle level-ups (any number of levels, one update)"""
         from bson.objectid import ObjectId
+        from progression import compute_progression
         user = self.get_user_by_id(user_id)
         if not user:
             return False
         
-        new_exp = user['exp'] + exp_amount
-        leveled_up = False
+        result = compute_progression(user['level'], user['exp'], user['exp_required'], exp_amount)
+        leveled_up = result['levels_gained'] > 0
         
-        # Check for level-up
-        while new_exp >= user['exp_required']:
-            new_exp -= user['exp_required']
-            self.level_up(user_id)
-            user = self.get_user_by_id(user_id)
-            leveled_up = True
+        update = {'$set': {'exp': result['exp']}}
+        if leveled_up:
+            update['$set']['level'] = result['level']
+            update['$set']['exp_required'] = result['exp_required']
+            update['$inc'] = {'skill_points': result['skill_points']}
         
-        # Update EXP
-        self.collection.update_one(
-            {'_id': ObjectId(user_id)},
-            {'$set': {'exp': new_exp}}
-        )
+        self.collection.update_one({'_id': ObjectId(user_id)}, update)
         
-        return {'leveled_up': leveled_up, 'new_level': user['level'] if leveled_up else None}
+        return {'leveled_up': leveled_up, 'new_level': result['level'] if leveled_up else None}
@@ -0,0 +1,88 @@
+"""
+Password Hasher
+Runs bcrypt on a bounded worker pool with backpressure, a configurable cost and rehash-on-login
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import bcrypt
+
+from config import Config
+
+
+class HasherBusy(Exception):
+    """Raised when every worker and queue slot is taken, or a job outlives HASH_TIMEOUT; maps to HTTP 429"""
+
+
+def hash_cost(password_hash):
+    """Cost factor of a stored hash ($2b$12$... -> 12), None if unparseable"""
+    if isinstance(password_hash, str):
+        password_hash = password_hash.encode('utf-8')
+    try:
+        return int(password_hash.split(b'$')[2])
+    except (IndexError, ValueError, AttributeError):
+        return None
+
+
+class PasswordHasher:
+    """
+    bcrypt releases the GIL, so a small thread pool runs hashes in parallel
+    without occupying the request threads' interpreter time. At most
+    `workers + queue_size` jobs are admitted; past that, callers get
+    HasherBusy immediately instead of piling up behind a login burst.
+    """
+
+    def __init__(self, rounds=None, workers=None, queue_size=None, timeout=None):
+        self.rounds = rounds or Config.BCRYPT_ROUNDS
+        self.workers = workers or Config.HASH_WORKERS
+        self.timeout = timeout or Config.HASH_TIMEOUT
+        capacity = self.workers + (queue_size if queue_size is not None else Config.HASH_QUEUE_SIZE)
+        self._slots = threading.BoundedSemaphore(capacity)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+
+    def _executor(self):
+        # Created lazily (and recreated after fork) so each worker process owns its threads
+        if self._pool_pid != os.getpid():
+            with self._lock:
+                if self._pool_pid != os.getpid():
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='password-hasher')
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy('Too many concurrent authentication requests')
+        try:
+            future = self._executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()  # still queued: drop it and free its slot now
+            raise HasherBusy('Authentication is taking too long')
+
+    def hash(self, password):
+        return self._run(lambda pw: bcrypt.hashpw(pw, bcrypt.gensalt(self.rounds)),
+                         password.encode('utf-8'))
+
+    def verify(self, password, password_hash):
+        if isinstance(password_hash, str):
+            password_hash = password_hash.encode('utf-8')
+        return self._run(bcrypt.checkpw, password.encode('utf-8'), password_hash)
+
+    def needs_rehash(self, password_hash):
+        return hash_cost(password_hash) != self.rounds
+
+    def shutdown(self):
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.shutdown(wait=True)
+            self._pool = None
+            self._pool_pid = None
@@ -0,0 +1,146 @@
+"""
+Profile Pipeline
+Builds the full player profile (user + stats + title/skill bonuses) in one round trip
+"""
+
+from bson.objectid import ObjectId
+
+from stamina import apply_regen
+
+
+def build_profile_pipeline(user_id):
+    """
+    Aggregation run against db.users that joins stats, earned titles,
+    unlocked skills and the precomputed cohort insight for a single player.
+    Title and skill definitions come from the catalog cache, not from the pipeline.
+    """
+    return [
+        {'$match': {'_id': ObjectId(user_id)}},
+        {'$limit': 1},
+        # stats/user_titles/user_skills store the id as a string
+        {'$addFields': {'uid': {'$toString': '$_id'}}},
+        {'$lookup': {
+            'from': 'stats',
+            'localField': 'uid',
+            'foreignField': 'user_id',
+            'as': 'stats'
+        }},
+        {'$lookup': {
+            'from': 'user_titles',
+            'localField': 'uid',
+            'foreignField': 'user_id',
+            'as': 'user_titles'
+        }},
+        {'$lookup': {
+            'from': 'user_skills',
+            'localField': 'uid',
+            'foreignField': 'user_id',
+            'as': 'user_skills'
+        }},
+        {'$lookup': {
+            'from': 'cohort_insights',
+            'localField': 'uid',
+            'foreignField': 'user_id',
+            'as': 'cohort'
+        }},
+        {'$project': {
+            'password_hash': 0,
+            'stats._id': 0,
+            'user_titles._id': 0,
+            'user_skills._id': 0,
+            'cohort._id': 0
+        }}
+    ]
+
+
+def apply_profile_bonuses(stats, title_defs, user_skills, skill_defs):
+    """
+    Adds earned-title and passive-skill stat bonuses onto a stats dict in place.
+    Passive bonus = base + (skill level * scaling).
+    """
+    for t in title_defs:
+        for stat, val in t.get('stat_bonus', {}).items():
+            if stat in stats:
+                stats[stat] += int(val)
+
+    # skill_id -> level, so matching is O(1) per definition
+    skill_levels = {us['skill_id']: us.get('level', 1) for us in user_skills}
+
+    for s in skill_defs:
+        if s.get('type') != 'passive':
+            continue
+        level = skill_levels.get(s['skill_id'], 1)
+        scaling = s.get('scaling', {})
+        for stat, val in s.get('stat_bonus', {}).items():
+            if stat in stats:
+                stats[stat] += int(val + (level * scaling.get(stat, 0)))
+
+    return stats
+
+
+def fetch_profile(db, user_id, catalog):
+    """
+    Returns (user, stats, user_titles) with bonuses already applied to stats,
+    or (None, None, []) if the user or their stats document is missing.
+    """
+    docs = list(db.users.aggregate(build_profile_pipeline(user_id)))
+    if not docs or not docs[0]['stats']:
+        return None, None, []
+
+    user = docs[0]
+    stats = user.pop('stats')[0]
+
+    # Init default if missing
+    if 'max_stamina' not in stats:
+        stats['max_stamina'] = 100
+    apply_regen(stats)
+
+    title_defs = [catalog.get('titles', t['title_id']) for t in user['user_titles']]
+    skill_defs = [catalog.get('skills', s['skill_id']) for s in user['user_skills']]
+
+    apply_profile_bonuses(
+        stats,
+        [t for t in title_defs if t],
+        user['user_skills'],
+        [s for s in skill_defs if s]
+    )
+    return user, stats, user['user_titles']
+
+
+def effective_stats(db, catalog, user_id, stats):
+    """
+    Title/passive-skill bonuses applied onto a raw stats document (e.g. an
+    update post-image), so it matches what get_profile reports. Two small
+    indexed reads instead of the full profile aggregation.
+    """
+    user_titles = list(db.user_titles.find({'user_id': user_id}, {'_id': 0, 'title_id': 1}))
+    user_skills = list(db.user_skills.find({'user_id': user_id}, {'_id': 0, 'skill_id': 1, 'level': 1}))
+    return _with_bonuses(catalog, stats, user_titles, user_skills)
+
+
+def effective_stats_many(db, catalog, stats_docs):
+    """effective_stats for many players: {user_id: stats}, with the same two reads for all of them"""
+    user_ids = [doc['user_id'] for doc in stats_docs]
+    titles, skills = {}, {}
+    for row in db.user_titles.find({'user_id': {'$in': user_ids}}, {'_id': 0, 'user_id': 1, 'title_id': 1}):
+        titles.setdefault(row['user_id'], []).append(row)
+    for row in db.user_skills.find({'user_id': {'$in': user_ids}}, {'_id': 0, 'user_id': 1, 'skill_id': 1, 'level': 1}):
+        skills.setdefault(row['user_id'], []).append(row)
+    return {
+        doc['user_id']: _with_bonuses(catalog, doc, titles.get(doc['user_id'], []), skills.get(doc['user_id'], []))
+        for doc in stats_docs
+    }
+
+
+def _with_bonuses(catalog, stats, user_titles, user_skills):
+    stats = dict(stats)
+    stats.setdefault('max_stamina', 100)
+    apply_regen(stats)
+    title_defs = [catalog.get('titles', t['title_id']) for t in user_titles]
+    skill_defs = [catalog.get('skills', s['skill_id']) for s in user_skills]
+    return apply_profile_bonuses(
+        stats,
+        [t for t in title_defs if t],
+        user_skills,
+        [s for s in skill_defs if s]
+    )
@@ -0,0 +1,246 @@
+"""
+Live Profiler
+On-demand stack sampling of a running worker (collapsed stacks for flame graphs plus per-route
+wall/CPU/MongoDB time) and opt-in cProfile dumps of single requests, both behind ADMIN_TOKEN
+"""
+
+import cProfile
+import datetime
+import hmac
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from config import Config
+from instrumentation import current_stats
+
+MAX_SECONDS = 60
+DEFAULT_INTERVAL_MS = 10
+# Innermost Python frames of a thread with nothing to do (idle pool workers block in C inside
+# _worker; watchers, keep-alive sockets). Dropped unless the thread is serving a request,
+# where waiting is the interesting part.
+IDLE_FUNCTIONS = {'_worker', 'wait', 'select', 'poll', 'accept', 'sleep', 'get', '_wait_for_tstate_lock'}
+PROFILE_ID = re.compile(r'^[\w.-]+$')
+
+
+class ProfilerBusy(Exception):
+    """A sampling session is already running in this process"""
+
+
+def is_admin(token):
+    """Constant-time check against ADMIN_TOKEN; always False when it is unset"""
+    return bool(Config.ADMIN_TOKEN and token) and hmac.compare_digest(token.encode(), Config.ADMIN_TOKEN.encode())
+
+
+def _frame_label(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)})'
+
+
+def _thread_label(name):
+    # Pool threads are numbered (password-hasher_3); one root per pool is enough
+    return re.sub(r'_\d+$', '', name)
+
+
+class Session:
+    """One sampling window: stack counts and the requests that finished inside it"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.ticks = 0
+        self.stacks = Counter()
+        self.route_samples = Counter()
+        self.routes = {}  # thread ident -> endpoint it is serving
+        self.requests = {}  # endpoint -> [requests, wall, cpu, mongo] (seconds)
+        self.stop = threading.Event()
+        self.owner = threading.get_ident()
+
+    def sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident in (own, self.owner):
+                continue
+            endpoint = self.routes.get(ident)
+            if endpoint is None and frame.f_code.co_name in IDLE_FUNCTIONS:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            root = f'route:{endpoint}' if endpoint else _thread_label(names.get(ident, 'thread'))
+            stack.append(root)
+            self.stacks[';'.join(reversed(stack))] += 1
+            if endpoint:
+                self.route_samples[endpoint] += 1
+        self.ticks += 1
+
+    def run(self):
+        while not self.stop.wait(self.interval):
+            self.sample()
+
+    def record(self, endpoint, wall, cpu, mongo):
+        totals = self.requests.setdefault(endpoint, [0, 0.0, 0.0, 0.0])
+        totals[0] += 1
+        totals[1] += wall
+        totals[2] += cpu
+        totals[3] += mongo
+
+    def collapsed(self):
+        """Brendan Gregg's folded format (flamegraph.pl, speedscope, inferno): 'a;b;c count' per line"""
+        return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common()) + '\n'
+
+    def report(self):
+        routes = {}
+        for endpoint, (requests, wall, cpu, mongo) in sorted(self.requests.items(), key=lambda item: -item[1][1]):
+            routes[endpoint] = {
+                'requests': requests,
+                'wall_ms': round(wall * 1000, 1),
+                'cpu_ms': round(cpu * 1000, 1),
+                'mongo_ms': round(mongo * 1000, 1),
+                # Neither on-CPU in this thread nor in MongoDB: GIL, locks, the bcrypt pool, network
+                'waiting_ms': round(max(wall - cpu - mongo, 0) * 1000, 1),
+                'samples': self.route_samples.get(endpoint, 0)
+            }
+        return {
+            'pid': os.getpid(),
+            'seconds': round(time.perf_counter() - self.started, 3),
+            'interval_ms': round(self.interval * 1000, 3),
+            'ticks': self.ticks,
+            'routes': routes,
+            'collapsed': self.collapsed()
+        }
+
+
+class Profiler:
+    """
+    Process-local. sample() blocks the calling request for the window while a
+    daemon thread reads every thread's stack (sys._current_frames) each
+    interval; requests are attributed by the thread that serves them, so
+    work handed to pools (bcrypt, dashboard reads) shows under the pool name.
+    OS threads only: under gevent all greenlets share one stack root.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.session = None
+
+    def sample(self, seconds, interval_ms=DEFAULT_INTERVAL_MS):
+        seconds = max(0.1, min(float(seconds), MAX_SECONDS))
+        interval = max(1.0, min(float(interval_ms), 1000.0)) / 1000
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy('A profiling session is already running in this worker')
+        try:
+            session = self.session = Session(interval)
+            sampler = threading.Thread(target=session.run, name='stack-sampler', daemon=True)
+            sampler.start()
+            time.sleep(seconds)
+            session.stop.set()
+            sampler.join()
+            return session.report()
+        finally:
+            self.session = None
+            self._lock.release()
+
+    # --- Request hooks (init_app) ---
+
+    def request_started(self, endpoint):
+        session = self.session
+        if session is None:
+            return None
+        session.routes[threading.get_ident()] = endpoint
+        return session, time.perf_counter(), time.thread_time()
+
+    def request_finished(self, endpoint, started):
+        session, wall_started, cpu_started = started
+        session.routes.pop(threading.get_ident(), None)
+        stats = current_stats()
+        session.record(endpoint, time.perf_counter() - wall_started, time.thread_time() - cpu_started,
+                       stats.command_seconds if stats is not None else 0.0)
+
+
+profiler = Profiler()
+
+
+# --- Single-request cProfile dumps ---
+
+def save_profile(profile, endpoint, directory=None, keep=None):
+    """Writes a .prof (pstats/snakeviz) and prunes the oldest beyond `keep`; returns its id"""
+    directory = directory or Config.PROFILE_DIR
+    keep = keep or Config.PROFILE_KEEP
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+    profile_id = f'{stamp}-{endpoint}-{uuid.uuid4().hex[:8]}'
+    profile.dump_stats(os.path.join(directory, f'{profile_id}.prof'))
+
+    dumps = sorted(name for name in os.listdir(directory) if name.endswith('.prof'))
+    for name in dumps[:-keep]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass  # pruned by another worker
+    return profile_id
+
+
+def profile_path(profile_id, directory=None):
+    """Path of a saved dump, or None if the id is malformed or the file is gone"""
+    if not PROFILE_ID.match(profile_id or ''):
+        return None
+    path = os.path.join(directory or Config.PROFILE_DIR, f'{profile_id}.prof')
+    return path if os.path.exists(path) else None
+
+
+def profile_text(path, sort='cumulative', limit=40):
+    """pstats table of a saved dump"""
+    out = io.StringIO()
+    stats = pstats.Stats(path, stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+# --- Flask wiring ---
+
+def init_app(app, registry=None):
+    """
+    Request hooks for the sampler's per-route totals and for X-Profile-Token
+    (cProfile of that one request; the response names the dump in
+    X-Profile-Id). Register after instrumentation.init_app: Flask runs
+    after/teardown hooks in reverse, so these still see the request's MongoDB time.
+    """
+    from flask import g, request
+
+    registry = registry or profiler
+
+    @app.before_request
+    def start_profiling():
+        g.profiler_started = registry.request_started(request.endpoint or 'unmatched')
+        if is_admin(request.headers.get('X-Profile-Token')):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                return  # another profiler owns the interpreter (Python 3.12+ allows one)
+            g.cprofile = profile
+
+    @app.after_request
+    def finish_cprofile(response):
+        profile = g.pop('cprofile', None)
+        if profile is not None:
+            profile.disable()
+            response.headers['X-Profile-Id'] = save_profile(profile, request.endpoint or 'unmatched')
+        return response
+
+    @app.teardown_request
+    def finish_profiling(exc):
+        profile = g.pop('cprofile', None)
+        if profile is not None:
+            profile.disable()  # the view raised before after_request
+        started = g.pop('profiler_started', None)
+        if started is not None:
+            registry.request_finished(request.endpoint or 'unmatched', started)
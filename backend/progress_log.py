@@ -0,0 +1,139 @@
+"""
+Progress Log
+Append-only history of player actions (`progress_logs`), buffered in memory and written with insert_many
+"""
+
+import datetime
+import threading
+
+from pymongo.errors import BulkWriteError
+
+from config import Config
+from jobs import PeriodicJob
+
+COLLECTION = 'progress_logs'
+
+# Actions that count as a failed attempt for burnout prediction; written through (see record)
+FAILURE_ACTIONS = ('dungeon_failed', 'dungeon_expired')
+
+
+class ProgressLog(PeriodicJob):
+    """
+    record() only appends to a bounded in-process buffer; a background
+    thread writes the buffer with one insert_many when it reaches
+    `batch_size` events or every `flush_interval` seconds, whichever comes
+    first. close() (gunicorn worker_exit via simple_app.shutdown) flushes
+    what is left. When the buffer is full new events are dropped and
+    counted rather than blocking the request. insert_many stamps each event
+    with an _id; a failed flush requeues the unwritten events without it,
+    so they are numbered when they are finally written and do not land
+    behind the analytics rollup's _id watermark (the cost: an insert whose
+    acknowledgement was lost is written twice).
+
+    Documents keep the models/progress.py shape:
+    {user_id, action_type, details, timestamp}. The profile's burnout
+    notice counts FAILURE_ACTIONS among them, so those skip the buffer
+    (insert_one; buffered only if that fails): the caller bumps the
+    player's state_version after recording them, and a profile cached
+    after that bump must already see the failure. Other events only
+    shift the notice's window; a flush does not bump again for them.
+    """
+
+    name = 'progress-log-flusher'
+
+    def __init__(self, db, batch_size=None, flush_interval=None, max_buffer=None):
+        super().__init__(flush_interval if flush_interval is not None else Config.PROGRESS_LOG_FLUSH_INTERVAL)
+        self.db = db
+        self.batch_size = batch_size or Config.PROGRESS_LOG_BATCH
+        self.max_buffer = max_buffer or Config.PROGRESS_LOG_MAX_BUFFER
+        self._buffer = []
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one insert_many at a time
+        self._wake = threading.Event()
+        self.written = 0
+        self.dropped = 0
+
+    def record(self, user_id, action_type, details=None):
+        event = {
+            'user_id': user_id,
+            'action_type': action_type,
+            'details': details or {},
+            'timestamp': datetime.datetime.utcnow()
+        }
+        if action_type in FAILURE_ACTIONS:
+            try:
+                self.db[COLLECTION].insert_one(event)
+                with self._buffer_lock:
+                    self.written += 1
+                return
+            except Exception as e:
+                print(f"Progress log write error: {e}")
+                event.pop('_id', None)
+        with self._buffer_lock:
+            if len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                return
+            self._buffer.append(event)
+            full = len(self._buffer) >= self.batch_size
+        self.ensure_started()
+        if full:
+            if self.interval <= 0:
+                self.flush()  # no background thread: size trigger only
+            else:
+                self._wake.set()
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of events written"""
+        with self._flush_lock:
+            with self._buffer_lock:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return 0
+            try:
+                self.db[COLLECTION].insert_many(batch, ordered=False)
+            except Exception as e:
+                print(f"Progress log flush error: {e}")
+                if isinstance(e, BulkWriteError):
+                    # Unordered: everything but the write errors was written
+                    failed = {err['index'] for err in e.details['writeErrors']}
+                    self.written += len(batch) - len(failed)
+                    batch = [event for i, event in enumerate(batch) if i in failed]
+                for event in batch:
+                    event.pop('_id', None)
+                # Put the batch back (oldest first) if there is room; otherwise it is lost
+                with self._buffer_lock:
+                    room = self.max_buffer - len(self._buffer)
+                    self.dropped += max(0, len(batch) - room)
+                    self._buffer = batch[:room] + self._buffer
+                return 0
+            self.written += len(batch)
+        return len(batch)
+
+    run = flush
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"{self.name} error: {e}")
+
+    def close(self):
+        super().close()
+        self._wake.set()
+        self.flush()
+
+    def snapshot(self):
+        with self._buffer_lock:
+            buffered = len(self._buffer)
+        return {'buffered': buffered, 'written': self.written, 'dropped': self.dropped}
+
+
+def recent_history(db, user_id, limit=20):
+    """Latest events for one player, newest first (user_id/timestamp index)"""
+    return list(db[COLLECTION].find(
+        {'user_id': user_id},
+        {'_id': 0, 'action_type': 1, 'details': 1, 'timestamp': 1}
+    ).sort('timestamp', -1).limit(limit))
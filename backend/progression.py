@@ -0,0 +1,167 @@
+"""
+Progression
+Shared EXP / level-up computation over the level² × EXP_MULTIPLIER curve
+"""
+
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+
+from config import Config
+
+USER_FIELDS = {'_id': 0, 'username': 1, 'level': 1, 'exp': 1, 'exp_required': 1, 'skill_points': 1}
+STATS_FIELDS = {'_id': 0, 'strength': 1, 'agility': 1, 'intelligence': 1, 'stamina': 1,
+                'health': 1, 'max_health': 1, 'max_stamina': 1}
+
+MAX_LEVEL_UP_RETRIES = 5
+
+# Called as fn(db, user_id, amount, user) after every EXP grant (user is the post-image)
+EXP_LISTENERS = []
+
+
+def add_exp_listener(fn):
+    """Registers a callback for EXP grants (leaderboard, rollups, ...)"""
+    if fn not in EXP_LISTENERS:
+        EXP_LISTENERS.append(fn)
+    return fn
+
+
+def _notify(db, user_id, amount, user):
+    for listener in EXP_LISTENERS:
+        try:
+            listener(db, user_id, amount, user)
+        except Exception as e:
+            print(f"EXP listener error: {e}")
+
+
+def exp_required_for(level):
+    """EXP needed to clear `level`"""
+    return (level ** 2) * Config.EXP_MULTIPLIER
+
+
+def _sum_of_squares(n):
+    """1² + 2² + ... + n²"""
+    return n * (n + 1) * (2 * n + 1) // 6
+
+
+def _max_level_within(target):
+    """Largest n with 1² + ... + n² <= target"""
+    n = int(round((3 * target) ** (1 / 3))) if target > 0 else 0
+    while n > 0 and _sum_of_squares(n) > target:
+        n -= 1
+    while _sum_of_squares(n + 1) <= target:
+        n += 1
+    return n
+
+
+def compute_progression(level, exp, exp_required, gain):
+    """
+    Resolves an EXP grant into the resulting level in one pass.
+
+    The current level is cleared against the stored `exp_required` (older
+    accounts may carry values from a different curve); every level after
+    that follows level² × EXP_MULTIPLIER, so the number of further levels
+    comes from the closed-form sum of squares instead of a per-level loop.
+
+    Returns level, exp, exp_required, levels_gained, exp_consumed (the EXP
+    removed by level-ups, so callers can apply it with $inc), skill_points,
+    stat_bonuses and max_stamina.
+    """
+    pool = exp + gain
+    result = {
+        'level': level,
+        'exp': pool,
+        'exp_required': exp_required,
+        'levels_gained': 0,
+        'exp_consumed': 0,
+        'skill_points': 0,
+        'stat_bonuses': {},
+        'max_stamina': None
+    }
+    if pool < exp_required:
+        return result
+
+    multiplier = Config.EXP_MULTIPLIER
+    new_level = level + 1
+    consumed = exp_required
+
+    # Further levels: need M × (Q(n) - Q(new_level - 1)) <= remaining pool
+    base = _sum_of_squares(new_level - 1)
+    top = _max_level_within((pool - consumed) // multiplier + base)
+    consumed += multiplier * (_sum_of_squares(top) - base)
+    new_level = top + 1
+
+    levels = new_level - level
+    result.update({
+        'level': new_level,
+        'exp': pool - consumed,
+        'exp_required': exp_required_for(new_level),
+        'levels_gained': levels,
+        'exp_consumed': consumed,
+        'skill_points': levels * Config.SKILL_POINTS_PER_LEVEL,
+        'stat_bonuses': {stat: val * levels for stat, val in Config.LEVEL_UP_STATS.items()},
+        'max_stamina': Config.BASE_MAX_STAMINA + new_level * Config.MAX_STAMINA_PER_LEVEL
+    })
+    return result
+
+
+def apply_exp(db, user_id, amount):
+    """
+    Grants EXP and applies any resulting level-ups.
+
+    No level-up: a single $inc on users. Level-up: one guarded users update
+    (levels, skill points and consumed EXP for any number of levels at once)
+    plus one stats update for the accumulated bonuses. The guard on the
+    previous level means concurrent grants never double-apply a level-up
+    and never lose each other's EXP.
+
+    Returns {'user', 'stats', 'levels_gained'}; stats is only fetched
+    (as a post-image) when a level-up happened. EXP_LISTENERS are notified
+    with the final user post-image.
+    """
+    user = db.users.find_one_and_update(
+        {'_id': ObjectId(user_id)},
+        {'$inc': {'exp': amount}},
+        projection=USER_FIELDS,
+        return_document=ReturnDocument.AFTER
+    )
+    outcome = {'user': user, 'stats': None, 'levels_gained': 0}
+    if not user:
+        return outcome
+
+    for _ in range(MAX_LEVEL_UP_RETRIES):
+        progress = compute_progression(user['level'], user['exp'], user['exp_required'], 0)
+        if not progress['levels_gained']:
+            outcome['user'] = user
+            _notify(db, user_id, amount, user)
+            return outcome
+
+        updated = db.users.find_one_and_update(
+            {'_id': ObjectId(user_id), 'level': user['level']},
+            {
+                '$set': {'level': progress['level'], 'exp_required': progress['exp_required']},
+                '$inc': {'exp': -progress['exp_consumed'], 'skill_points': progress['skill_points']}
+            },
+            projection=USER_FIELDS,
+            return_document=ReturnDocument.AFTER
+        )
+        if updated:
+            outcome['user'] = updated
+            outcome['levels_gained'] = progress['levels_gained']
+            outcome['stats'] = db.stats.find_one_and_update(
+                {'user_id': user_id},
+                {
+                    '$inc': progress['stat_bonuses'],
+                    '$max': {'max_stamina': progress['max_stamina']}
+                },
+                projection=STATS_FIELDS,
+                return_document=ReturnDocument.AFTER
+            )
+            _notify(db, user_id, amount, updated)
+            return outcome
+
+        # Someone else levelled up first; re-evaluate against their result
+        user = db.users.find_one({'_id': ObjectId(user_id)}, USER_FIELDS)
+
+    outcome['user'] = user
+    _notify(db, user_id, amount, user)
+    return outcome
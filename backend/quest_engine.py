@@ -0,0 +1,175 @@
+"""
+Quest Engine
+Applies quest completion (stamina cost, stat rewards, EXP, level-up, titles) with atomic updates
+"""
+
+import datetime
+
+from pymongo import ReturnDocument, UpdateOne
+
+from progression import STATS_FIELDS, apply_exp
+from stamina import has_stamina, regen_update
+
+# Legacy reward table for quests that have no definition anywhere
+LEGACY_REWARDS = {
+    'daily_coding': {'exp': 100, 'stamina': 20, 'stat_rewards': {'intelligence': 3, 'agility': 1}, 'category': 'system'},
+    'morning_exercise': {'exp': 50, 'stamina': 10, 'stat_rewards': {'strength': 2}, 'category': 'physical'},
+    'study_session': {'exp': 60, 'stamina': 15, 'stat_rewards': {'intelligence': 2}, 'category': 'system'}
+}
+DEFAULT_REWARD = {'exp': 50, 'stamina': 10, 'stat_rewards': {}, 'category': 'system'}
+
+# Bounds on the rewards players set on custom quests and overrides (the dashboard form's min/max)
+CUSTOM_LIMITS = {'exp_reward': (10, 500), 'stamina_cost': (5, 50)}
+
+# Titles granted when a level threshold is reached: (level, title_id, title_name)
+LEVEL_TITLES = [
+    (5, 'novice', 'Novice'),
+    (10, 'apprentice', 'Apprentice')
+]
+
+
+class QuestError(Exception):
+    """Raised when a quest cannot be completed; carries the HTTP status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _whole_number(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def clamp_reward(field, value):
+    """`value` (an int) held to CUSTOM_LIMITS[field]"""
+    low, high = CUSTOM_LIMITS[field]
+    return min(max(value, low), high)
+
+
+def custom_rewards(data, defaults=None):
+    """
+    exp_reward/stamina_cost for a custom quest from a request body, clamped
+    to CUSTOM_LIMITS. A field missing from `data` takes its value from
+    `defaults`, or is left out when there are none. Raises QuestError (400)
+    for a value that is not a whole number.
+    """
+    rewards = {}
+    for field in CUSTOM_LIMITS:
+        if field not in data:
+            if defaults is not None:
+                rewards[field] = defaults[field]
+            continue
+        value = _whole_number(data[field])
+        if value is None:
+            raise QuestError(f"{field} must be a whole number")
+        rewards[field] = clamp_reward(field, value)
+    return rewards
+
+
+def resolve_reward(db, catalog, user_id, quest_id):
+    """
+    Reward for a quest: the user's own override/custom quest first,
+    then the system catalog, then the legacy table. Player-set rewards
+    are held to CUSTOM_LIMITS here too (documents saved before the
+    write-time check).
+    """
+    custom = db.custom_quests.find_one(
+        {'user_id': user_id, 'quest_id': quest_id},
+        {'_id': 0, 'exp_reward': 1, 'stamina_cost': 1, 'stat_rewards': 1, 'category': 1}
+    )
+    quest = custom or catalog.get('quests', quest_id)
+
+    if not quest:
+        return LEGACY_REWARDS.get(quest_id, DEFAULT_REWARD)
+
+    exp = _whole_number(quest.get('exp_reward', DEFAULT_REWARD['exp']))
+    stamina = _whole_number(quest.get('stamina_cost', DEFAULT_REWARD['stamina']))
+    exp = DEFAULT_REWARD['exp'] if exp is None else exp
+    stamina = DEFAULT_REWARD['stamina'] if stamina is None else stamina
+    if custom:
+        exp, stamina = clamp_reward('exp_reward', exp), clamp_reward('stamina_cost', stamina)
+
+    return {
+        'exp': exp,
+        'stamina': stamina,
+        'stat_rewards': quest.get('stat_rewards') or {},
+        'category': quest.get('category') or DEFAULT_REWARD['category']
+    }
+
+
+def grant_level_titles(db, user_id, level):
+    """
+    Upserts every level title the user qualifies for in one bulk write.
+    Returns the names of titles that were newly granted.
+    """
+    earned = [t for t in LEVEL_TITLES if level >= t[0]]
+    if not earned:
+        return []
+
+    ops = [
+        UpdateOne(
+            {'user_id': user_id, 'title_id': title_id},
+            {'$setOnInsert': {'title_name': title_name, 'earned_at': None}},
+            upsert=True
+        )
+        for _, title_id, title_name in earned
+    ]
+    result = db.user_titles.bulk_write(ops, ordered=False)
+    return [earned[i][2] for i in sorted(result.upserted_ids)]
+
+
+def apply_quest_completion(db, catalog, user_id, quest_id):
+    """
+    Completes a quest for a user and returns the response payload.
+
+    Common path: one conditional find_one_and_update on stats (stamina check
+    with regeneration, cost and stat rewards together) and one $inc on users returning the
+    post-image. A level-up (of any size) adds one guarded users update, one
+    stats update and one bulk title upsert. No values are computed from
+    stale reads.
+    """
+    reward = resolve_reward(db, catalog, user_id, quest_id)
+    cost = reward['stamina']
+
+    stat_inc = dict(reward['stat_rewards'])
+    stat_inc['stamina'] = stat_inc.get('stamina', 0) - cost
+
+    now = datetime.datetime.utcnow()
+    stats = db.stats.find_one_and_update(
+        {'user_id': user_id, **has_stamina(now, cost)},
+        regen_update(now, stat_inc),
+        projection=STATS_FIELDS,
+        return_document=ReturnDocument.AFTER
+    )
+    if not stats:
+        if db.stats.find_one({'user_id': user_id}, {'_id': 1}) is None:
+            raise QuestError('User not found', 404)
+        raise QuestError('Not enough stamina')
+
+    progress = apply_exp(db, user_id, reward['exp'])
+    user = progress['user']
+    if not user:
+        raise QuestError('User not found', 404)
+
+    leveled_up = progress['levels_gained'] > 0
+    new_titles = []
+
+    if leveled_up:
+        stats = progress['stats']
+        new_titles = grant_level_titles(db, user_id, user['level'])
+
+    return {
+        'message': 'Quest completed successfully',
+        'exp_gained': reward['exp'],
+        'leveled_up': leveled_up,
+        'new_level': user['level'] if leveled_up else None,
+        'new_titles': new_titles,
+        'reward': reward,
+        'user': user,
+        'stats': stats
+    }
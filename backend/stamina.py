@@ -0,0 +1,155 @@
+"""
+Stamina Regeneration
+Stamina is stored as (value, stamina_updated_at) and regenerated lazily: STAMINA_REGEN_AMOUNT
+per STAMINA_REGEN_SECONDS, counted on fixed epoch-aligned ticks so every reader agrees.
+"""
+
+import datetime
+import uuid
+
+from config import Config
+from jobs import PeriodicJob
+
+EPOCH = datetime.datetime(1970, 1, 1)
+DEFAULT_MAX_STAMINA = 100
+REGEN_FIELDS = ('stamina_updated_at', 'stamina_full_tick')
+
+
+def regen_tick(when):
+    """Index of the regeneration tick `when` falls in"""
+    return int((when - EPOCH).total_seconds() // Config.STAMINA_REGEN_SECONDS)
+
+
+def current_stamina(stats, now=None):
+    """O(1): stored value plus the ticks elapsed since it was written, capped at max_stamina"""
+    stamina = stats.get('stamina', 0)
+    updated_at = stats.get('stamina_updated_at')
+    max_stamina = stats.get('max_stamina', DEFAULT_MAX_STAMINA)
+    if updated_at is None or stamina >= max_stamina:
+        return stamina
+    ticks = regen_tick(now or datetime.datetime.utcnow()) - regen_tick(updated_at)
+    return min(max_stamina, stamina + max(ticks, 0) * Config.STAMINA_REGEN_AMOUNT)
+
+
+def apply_regen(stats, now=None):
+    """Replaces the stored stamina with the current value (in place) and drops the bookkeeping fields"""
+    if stats:
+        stats['stamina'] = current_stamina(stats, now)
+        for field in REGEN_FIELDS:
+            stats.pop(field, None)
+    return stats
+
+
+def full_tick(stamina, max_stamina, now):
+    """Tick at which a player at `stamina` now reaches max_stamina (None if already full)"""
+    missing = max_stamina - stamina
+    if missing <= 0:
+        return None
+    return regen_tick(now) + -(-missing // Config.STAMINA_REGEN_AMOUNT)
+
+
+def initial_fields(stamina, max_stamina, now=None):
+    """Regen fields for a freshly inserted stats document"""
+    now = now or datetime.datetime.utcnow()
+    fields = {'stamina': stamina, 'stamina_updated_at': now}
+    tick = full_tick(stamina, max_stamina, now)
+    if tick is not None:
+        fields['stamina_full_tick'] = tick
+    return fields
+
+
+# --- Update expressions (server-side equivalents of the functions above) ---
+
+_MAX = {'$ifNull': ['$max_stamina', DEFAULT_MAX_STAMINA]}
+
+
+def current_expr(now):
+    """Aggregation expression for current_stamina() evaluated at `now`"""
+    stored_tick = {'$floor': {'$divide': [
+        {'$subtract': [{'$ifNull': ['$stamina_updated_at', now]}, EPOCH]},
+        Config.STAMINA_REGEN_SECONDS * 1000
+    ]}}
+    regenerated = {'$add': ['$stamina', {'$multiply': [
+        {'$max': [0, {'$subtract': [regen_tick(now), stored_tick]}]},
+        Config.STAMINA_REGEN_AMOUNT
+    ]}]}
+    # Never lowers a value that is already above the cap
+    return {'$max': ['$stamina', {'$min': [_MAX, regenerated]}]}
+
+
+def has_stamina(now, cost):
+    """Filter fragment: current stamina (regen included) is at least `cost`"""
+    return {'$expr': {'$gte': [current_expr(now), cost]}}
+
+
+def regen_update(now, changes=None):
+    """
+    Update pipeline that materializes regeneration up to `now`, then adds
+    `changes` (stat -> amount; a 'stamina' entry is the cost/restore), caps
+    stamina at max_stamina, re-anchors stamina_updated_at and recomputes
+    stamina_full_tick (removed once full). Atomic per document.
+    """
+    changes = dict(changes or {})
+    stamina_change = changes.pop('stamina', 0)
+    missing = {'$subtract': [_MAX, '$stamina']}
+    return [
+        {'$set': {'stamina': current_expr(now)}},
+        {'$set': {
+            **{stat: {'$add': [{'$ifNull': [f'${stat}', 0]}, amount]} for stat, amount in changes.items()},
+            'stamina': {'$max': [0, {'$min': [_MAX, {'$add': ['$stamina', stamina_change]}]}]},
+            'stamina_updated_at': now
+        }},
+        {'$set': {'stamina_full_tick': {'$cond': [
+            {'$lt': ['$stamina', _MAX]},
+            {'$add': [regen_tick(now), {'$ceil': {'$divide': [missing, Config.STAMINA_REGEN_AMOUNT]}}]},
+            '$$REMOVE'
+        ]}}}
+    ]
+
+
+# --- Full-regeneration notifications ---
+
+def collect_full(db, now=None):
+    """
+    Finds everyone whose stamina has fully regenerated since the last run
+    with one range query on the sparse stamina_full_tick index, materializes
+    their stamina at max in one update_many and returns their user_ids.
+    Entries made stale by a later max_stamina increase (level-up) are
+    re-anchored instead of reported.
+    """
+    now = now or datetime.datetime.utcnow()
+    due = {'stamina_full_tick': {'$lte': regen_tick(now)}}
+    batch = uuid.uuid4().hex
+
+    claimed = db.stats.update_many(
+        {**due, '$expr': {'$gte': [current_expr(now), _MAX]}},
+        [
+            {'$set': {'stamina': {'$max': ['$stamina', _MAX]}, 'stamina_updated_at': now, 'regen_batch': batch}},
+            {'$project': {'stamina_full_tick': 0}}
+        ]
+    )
+    user_ids = []
+    if claimed.modified_count:
+        user_ids = [doc['user_id'] for doc in db.stats.find({'regen_batch': batch}, {'_id': 0, 'user_id': 1})]
+        db.stats.update_many({'regen_batch': batch}, [{'$project': {'regen_batch': 0}}])
+
+    # Still due but not full (max_stamina grew after the estimate): recompute the estimate
+    db.stats.update_many(due, regen_update(now))
+    return user_ids
+
+
+class StaminaNotifier(PeriodicJob):
+    """Runs collect_full every `interval` seconds and calls on_full(user_ids) once with the players it found"""
+
+    name = 'stamina-notifier'
+
+    def __init__(self, db, interval=None, on_full=None):
+        super().__init__(interval if interval is not None else Config.STAMINA_NOTIFY_INTERVAL)
+        self.db = db
+        self.on_full = on_full
+
+    def run(self):
+        user_ids = collect_full(self.db)
+        if self.on_full and user_ids:
+            self.on_full(user_ids)
+        return user_ids
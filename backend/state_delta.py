@@ -0,0 +1,83 @@
+"""
+State Delta
+Normalized description of what a mutation changed, applied client-side instead of re-fetching lists
+"""
+
+from profile_pipeline import effective_stats, effective_stats_many
+
+USER_FIELDS = ('level', 'exp', 'exp_required', 'skill_points', 'gold')
+STATS_FIELDS = ('strength', 'agility', 'intelligence', 'stamina', 'health', 'max_health', 'max_stamina')
+
+
+def _pick(doc, fields):
+    return {f: doc[f] for f in fields if f in doc}
+
+
+def stats_deltas(db, catalog, stats_docs):
+    """{user_id: delta} carrying only 'stats', for many players at once (background notifications)"""
+    return {
+        user_id: {'stats': _pick(stats, STATS_FIELDS)}
+        for user_id, stats in effective_stats_many(db, catalog, stats_docs).items()
+    }
+
+
+class StateDelta:
+    """
+    Collects the state one request changed. Shape of to_dict():
+
+        {
+          'user':      {changed user fields},
+          'stats':     {stats, title/skill bonuses applied},
+          'skills':    {'upsert': [user skill rows]},
+          'titles':    {'earned': [{title_id, name, description}]},
+          'dungeon':   {active dungeon fields} or None once it has ended
+        }
+
+    Only the keys that were touched are present.
+    """
+
+    def __init__(self, db, catalog, user_id):
+        self.db = db
+        self.catalog = catalog
+        self.user_id = user_id
+        self._delta = {}
+
+    def user(self, doc):
+        if doc:
+            self._delta.setdefault('user', {}).update(_pick(doc, USER_FIELDS))
+        return self
+
+    def stats(self, doc):
+        """`doc` is a raw stats document/post-image; bonuses are added here"""
+        if doc:
+            self._delta['stats'] = _pick(effective_stats(self.db, self.catalog, self.user_id, doc), STATS_FIELDS)
+        return self
+
+    def skill(self, row):
+        self._delta.setdefault('skills', {'upsert': []})['upsert'].append(row)
+        return self
+
+    def titles(self, names):
+        """Newly granted title names (as returned by the title granters)"""
+        if not names:
+            return self
+        earned = self._delta.setdefault('titles', {'earned': []})['earned']
+        granted = self.db.user_titles.find(
+            {'user_id': self.user_id, 'title_name': {'$in': list(names)}},
+            {'_id': 0, 'title_id': 1, 'title_name': 1}
+        )
+        for title in granted:
+            definition = self.catalog.get('titles', title['title_id']) or {}
+            earned.append({
+                'title_id': title['title_id'],
+                'name': title['title_name'],
+                'description': definition.get('description', '')
+            })
+        return self
+
+    def dungeon(self, session):
+        self._delta['dungeon'] = session
+        return self
+
+    def to_dict(self):
+        return self._delta
@@ -1,5 +1,11 @@
 from datetime import datetime, timedelta
 
+# Thresholds shared with the batch (whole user base) version in cohort.py
+CORE_STATS = ('strength', 'agility', 'intelligence')
+WEAKNESS_RATIO = 0.8  # Flag if 20% below average
+BURNOUT_STAMINA_RATIO = 0.2  # < 20% stamina is high risk
+LAGGING_PERCENTILE = 25  # Bottom quarter of all hunters
+
 # --- 1. Weakness Exposure Module ---
 def analyze_weakness(stats):
     """
@@ -11,7 +17,7 @@ def analyze_weakness(stats):
     i = stats.get('intelligence', 10)
     
     avg = (s + a + i) / 3
-    threshold = avg * 0.8 # Flag if 20% below average
+    threshold = avg * WEAKNESS_RATIO
     
     notices = []
     
@@ -161,12 +167,34 @@ def get_recommended_action(stats, quests):
 def predict_burnout(stats, user_history):
     """
     Predicts burnout risk based on stamina and recent failures.
+    user_history: latest progress_logs events, newest first.
     """
     current_stamina = stats.get('stamina', 50)
     max_stamina = stats.get('max_stamina', 100)
     
     # Simple Heuristic: < 20% stamina is high risk
-    if current_stamina < (max_stamina * 0.2):
+    if current_stamina < (max_stamina * BURNOUT_STAMINA_RATIO):
          return "⚠️ PREDICTION: High Burnout Risk. Efficiency dropping. Rest recommended."
+    
+    # Repeated failed/abandoned gates among the recent actions
+    failures = sum(1 for e in user_history if e.get('action_type') in ('dungeon_failed', 'dungeon_expired'))
+    if failures >= 2:
+         return "⚠️ PREDICTION: Repeated gate failures detected. Burnout risk rising. Lower the difficulty or rest."
          
     return None
+
+# --- 6. PHASE 3: Population-relative Analysis ---
+def cohort_notice(insight):
+    """
+    Turns a precomputed cohort_insights document (cohort.py) into a notice.
+    Returns a string or None.
+    """
+    if not insight:
+        return None
+    
+    lagging = insight.get('lagging', [])
+    if lagging:
+        areas = ", ".join(stat.upper() for stat in lagging)
+        return f"📊 SYSTEM ANALYSIS: {areas} ranks in the bottom {LAGGING_PERCENTILE}% of all hunters. Training recommended."
+    
+    return None
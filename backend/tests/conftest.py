@@ -0,0 +1,53 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Config reads the environment once, on first import: before any test imports the app, point it at
+# an embedded datastore in a scratch file with background jobs off. Events go through production's
+# broker (MongoBroker) so its inserts count against the query budgets.
+SCRATCH = tempfile.mkdtemp(prefix='evolvex-tests-')
+os.environ.update({
+    'DATASTORE': 'sqlite',
+    'LOCAL_DB_PATH': os.path.join(SCRATCH, 'the_system.db'),
+    'LOCAL_SYNC_URI': '',
+    'EVENT_BROKER': 'mongo',
+    'LIVE_EVENTS': 'True',
+    'QUERY_BUDGET_MODE': 'strict',
+    'BCRYPT_ROUNDS': '4',
+    **{setting: '0' for setting in ('DUNGEON_SWEEP_INTERVAL', 'STAMINA_NOTIFY_INTERVAL', 'ANALYTICS_ROLLUP_INTERVAL',
+                                    'COHORT_ANALYSIS_INTERVAL', 'PROGRESS_LOG_FLUSH_INTERVAL')}
+})
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(SCRATCH, ignore_errors=True)
+
+
+@pytest.fixture
+def local_db(tmp_path):
+    from local_store import LocalClient
+
+    client = LocalClient(str(tmp_path / 'test.db'))
+    yield client['the_system']
+    client.close()
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    """simple_app against the scratch datastore, migrated, in testing mode (strict budgets raise)"""
+    import simple_app
+    from migrations import run_migrations
+
+    run_migrations(simple_app.db)
+    simple_app.app.testing = True
+    simple_app.app.config['UPLOAD_FOLDER'] = os.path.join(SCRATCH, 'uploads')
+    os.makedirs(simple_app.app.config['UPLOAD_FOLDER'], exist_ok=True)
+    yield simple_app
+    simple_app.progress_log.flush()
+    simple_app.shutdown()
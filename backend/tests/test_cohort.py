@@ -0,0 +1,57 @@
+"""
+Cohort runs and progress-log writes: which players' cached profiles they invalidate
+"""
+
+import datetime
+
+import pytest
+from bson.objectid import ObjectId
+
+from progress_log import COLLECTION as PROGRESS_LOGS
+from progress_log import ProgressLog
+
+NOW = datetime.datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def players(local_db):
+    user_ids = [ObjectId() for _ in range(4)]
+    local_db.users.insert_many([{'_id': uid, 'state_version': 0} for uid in user_ids])
+    local_db.stats.insert_many([
+        {'user_id': str(uid), 'strength': 10 + 5 * i, 'agility': 10, 'intelligence': 10, 'stamina': 100,
+         'max_stamina': 100}
+        for i, uid in enumerate(user_ids)
+    ])
+    return [str(uid) for uid in user_ids]
+
+
+def versions(db):
+    return {str(doc['_id']): doc['state_version'] for doc in db.users.find()}
+
+
+def test_cohort_run_bumps_only_players_whose_profile_changed(local_db, players):
+    cohort = pytest.importorskip('cohort')
+
+    cohort.run_analysis(local_db, NOW)
+    assert set(versions(local_db).values()) == {1}
+
+    cohort.run_analysis(local_db, NOW)
+    assert set(versions(local_db).values()) == {1}
+
+    # The weakest player overtakes everyone: every strength percentile moves
+    local_db.stats.update_one({'user_id': players[0]}, {'$set': {'strength': 100}})
+    cohort.run_analysis(local_db, NOW)
+    assert versions(local_db) == {uid: 2 for uid in players}
+
+
+def test_failures_are_written_through_and_flushes_do_not_bump(local_db, players):
+    log = ProgressLog(local_db, batch_size=100, flush_interval=0)
+
+    log.record(players[0], 'dungeon_failed', {'rank': 'E'})
+    assert local_db[PROGRESS_LOGS].count_documents({'action_type': 'dungeon_failed'}) == 1
+
+    log.record(players[1], 'quest_completed')
+    assert local_db[PROGRESS_LOGS].count_documents({}) == 1
+    assert log.flush() == 1
+    assert log.snapshot() == {'buffered': 0, 'written': 2, 'dropped': 0}
+    assert set(versions(local_db).values()) == {0}
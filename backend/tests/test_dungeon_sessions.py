@@ -0,0 +1,45 @@
+"""
+Dungeon sweeps: a sweep that dies part-way is retried without charging anyone twice
+"""
+
+import datetime
+
+import pytest
+
+import dungeon_sessions
+from dungeon_sessions import CLAIM_TIMEOUT, HISTORY, sweep_expired
+
+NOW = datetime.datetime(2026, 1, 1, 12)
+
+
+@pytest.fixture
+def overdue(local_db):
+    local_db.stats.insert_one({'user_id': 'u1', 'health': 100, 'max_health': 100})
+    local_db.active_dungeons.insert_many([
+        {'user_id': 'u1', 'rank': rank, 'status': 'active', 'end_time': NOW - datetime.timedelta(hours=1)}
+        for rank in ('E', 'D')
+    ])
+    return local_db
+
+
+def test_sweep_retried_after_a_crash_charges_each_session_once(overdue, monkeypatch):
+    archive = dungeon_sessions.archive_sessions
+
+    def archive_then_crash(*args, **kwargs):
+        archive(*args, **kwargs)
+        raise RuntimeError('worker died')
+
+    monkeypatch.setattr(dungeon_sessions, 'archive_sessions', archive_then_crash)
+    with pytest.raises(RuntimeError):
+        sweep_expired(overdue, NOW, grace=0)
+    assert overdue.stats.find_one({'user_id': 'u1'})['health'] == 60
+
+    monkeypatch.setattr(dungeon_sessions, 'archive_sessions', archive)
+    # Nobody retries a claim until CLAIM_TIMEOUT has passed
+    assert sweep_expired(overdue, NOW, grace=0) == []
+    retried = sweep_expired(overdue, NOW + datetime.timedelta(seconds=CLAIM_TIMEOUT + 1), grace=0)
+
+    assert len(retried) == 2
+    assert overdue.stats.find_one({'user_id': 'u1'})['health'] == 60
+    assert overdue.active_dungeons.count_documents({}) == 0
+    assert overdue[HISTORY].count_documents({'status': 'expired'}) == 2
@@ -0,0 +1,248 @@
+"""
+Local datastore tests: each case is what MongoDB returns for the same call
+"""
+
+import datetime
+
+import pytest
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+
+@pytest.fixture
+def people(local_db):
+    local_db.people.insert_many([
+        {'_id': 1, 'name': 'a', 'level': 5, 'tags': ['x', 'y'], 'stats': {'hp': 10}},
+        {'_id': 2, 'name': 'b', 'level': 3, 'tags': [], 'stats': {'hp': 0}},
+        {'_id': 3, 'name': 'c', 'level': None, 'tags': ['y']},
+        {'_id': 4, 'name': 'd'},
+    ])
+    return local_db.people
+
+
+def ids(cursor):
+    return [doc['_id'] for doc in cursor]
+
+
+# --- Queries ---
+
+def test_comparison_skips_missing_and_null(people):
+    assert ids(people.find({'level': {'$gte': 3}}).sort('_id')) == [1, 2]
+    assert ids(people.find({'level': {'$lt': 4}})) == [2]
+
+
+def test_not_and_ne_match_missing_fields(people):
+    assert ids(people.find({'level': {'$not': {'$gte': 4}}}).sort('_id')) == [2, 3, 4]
+    assert ids(people.find({'level': {'$ne': 5}}).sort('_id')) == [2, 3, 4]
+
+
+def test_null_matches_missing(people):
+    assert ids(people.find({'level': None}).sort('_id')) == [3, 4]
+    assert ids(people.find({'level': {'$exists': False}})) == [4]
+
+
+def test_array_fields_match_any_element(people):
+    assert ids(people.find({'tags': 'y'}).sort('_id')) == [1, 3]
+    assert ids(people.find({'tags': {'$all': ['x', 'y']}})) == [1]
+    assert ids(people.find({'tags': {'$all': []}})) == []
+    assert ids(people.find({'tags': {'$size': 0}})) == [2]
+    assert ids(people.find({'tags': []})) == [2]
+
+
+def test_dotted_paths(people):
+    assert ids(people.find({'stats.hp': {'$gt': 0}})) == [1]
+    assert ids(people.find({'stats.hp': {'$exists': True}}).sort('_id')) == [1, 2]
+
+
+def test_elem_match_and_positional_array_index(local_db):
+    local_db.runs.insert_one({'_id': 1, 'events': [{'seq': 1, 'damage': 5}, {'seq': 2, 'damage': 20}]})
+    assert local_db.runs.count_documents({'events': {'$elemMatch': {'seq': 2, 'damage': {'$gt': 10}}}}) == 1
+    assert local_db.runs.count_documents({'events': {'$elemMatch': {'seq': 1, 'damage': {'$gt': 10}}}}) == 0
+    assert local_db.runs.count_documents({'events.1.seq': 2}) == 1
+
+
+def test_sort_skip_limit(people):
+    assert ids(people.find().sort([('level', ASCENDING), ('_id', DESCENDING)])) == [4, 3, 2, 1]
+    assert ids(people.find().sort([('level', DESCENDING), ('_id', ASCENDING)]).skip(1).limit(2)) == [2, 3]
+
+
+def test_sort_by_array_uses_min_ascending_and_max_descending(local_db):
+    local_db.arrays.insert_many([{'_id': 1, 'v': [1, 9]}, {'_id': 2, 'v': [5]}])
+    assert ids(local_db.arrays.find().sort('v', ASCENDING)) == [1, 2]
+    assert ids(local_db.arrays.find().sort('v', DESCENDING)) == [1, 2]
+
+
+def test_unsupported_query_operators_raise(people):
+    with pytest.raises(OperationFailure):
+        people.find_one({'level': {'$near': [0, 0]}})
+    with pytest.raises(OperationFailure):
+        people.find_one({'$where': 'true'})
+    with pytest.raises(OperationFailure):
+        people.find_one({'level': {'$in': 5}})
+    with pytest.raises(OperationFailure):
+        people.find_one({'level': {'$not': 5}})
+
+
+# --- Updates ---
+
+def test_update_operators(local_db):
+    local_db.users.insert_one({'_id': 1, 'gold': 10, 'items': ['a']})
+    local_db.users.update_one({'_id': 1}, {
+        '$inc': {'gold': -3, 'stats.xp': 5},
+        '$push': {'items': {'$each': ['b', 'c']}},
+        '$max': {'best': 7},
+        '$setOnInsert': {'ignored': True},
+    })
+    assert local_db.users.find_one({'_id': 1}) == {
+        '_id': 1, 'gold': 7, 'items': ['a', 'b', 'c'], 'stats': {'xp': 5}, 'best': 7}
+    local_db.users.update_one({'_id': 1}, {'$pull': {'items': {'$in': ['a', 'c']}}, '$unset': {'best': ''}})
+    assert local_db.users.find_one({'_id': 1}, {'_id': 0, 'items': 1, 'best': 1}) == {'items': ['b']}
+
+
+def test_update_many(local_db):
+    local_db.users.insert_many([{'_id': 1, 'v': 1}, {'_id': 2}, {'_id': 3, 'v': 5}])
+    result = local_db.users.update_many({'_id': {'$in': [1, 2]}}, {'$inc': {'v': 1}})
+    assert (result.matched_count, result.modified_count) == (2, 2)
+    assert [doc.get('v') for doc in local_db.users.find().sort('_id')] == [2, 1, 5]
+    with pytest.raises(OperationFailure):
+        local_db.users.update_many({}, {'$set': {'_id': 9}})
+
+
+def test_conditional_inc_does_not_overdraw(local_db):
+    local_db.users.insert_one({'_id': 1, 'gold': 5})
+    result = local_db.users.update_one({'_id': 1, 'gold': {'$gte': 8}}, {'$inc': {'gold': -8}})
+    assert result.matched_count == 0
+    assert local_db.users.find_one({'_id': 1})['gold'] == 5
+
+
+def test_upsert_seeds_equality_fields(local_db):
+    result = local_db.counters.update_one({'user_id': 'u', 'day': {'$gte': 1}, 'kind': 'x'},
+                                          {'$inc': {'n': 1}}, upsert=True)
+    doc = local_db.counters.find_one({'_id': result.upserted_id}, {'_id': 0})
+    assert doc == {'user_id': 'u', 'kind': 'x', 'n': 1}
+
+
+def test_unique_index_rejects_duplicate_upserts(local_db):
+    local_db.users.create_index('username', unique=True)
+    local_db.users.insert_one({'username': 'a', 'n': 1})
+    with pytest.raises(DuplicateKeyError):
+        local_db.users.insert_one({'username': 'a'})
+    with pytest.raises(DuplicateKeyError):
+        local_db.users.update_one({'username': 'b', 'n': 1}, {'$set': {'username': 'a'}}, upsert=True)
+    with pytest.raises(BulkWriteError) as error:
+        local_db.users.bulk_write([UpdateOne({'username': 'c'}, {'$set': {'n': 2}}, upsert=True),
+                                   UpdateOne({'n': 1}, {'$set': {'username': 'c'}})], ordered=True)
+    assert error.value.details['nUpserted'] == 1
+    assert error.value.details['writeErrors'][0]['code'] == 11000
+    assert local_db.users.count_documents({}) == 2
+
+
+def test_find_one_and_update_returns_before_or_after(local_db):
+    local_db.users.insert_one({'_id': 1, 'n': 1})
+    before = local_db.users.find_one_and_update({'_id': 1}, {'$inc': {'n': 1}})
+    after = local_db.users.find_one_and_update({'_id': 1}, {'$inc': {'n': 1}}, return_document=ReturnDocument.AFTER)
+    assert (before['n'], after['n']) == (1, 3)
+    assert local_db.users.find_one_and_update({'_id': 2}, {'$inc': {'n': 1}}) is None
+
+
+def test_pipeline_update(local_db):
+    local_db.bosses.insert_one({'_id': 1, 'health': 50, 'last_seq': 2, 'events': [{'seq': 1}, {'seq': 3}]})
+    local_db.bosses.update_one({'_id': 1}, [
+        {'$set': {
+            'fresh': {'$filter': {'input': '$events', 'as': 'e', 'cond': {'$gt': ['$$e.seq', '$last_seq']}}},
+            'last_seq': {'$add': [{'$ifNull': ['$last_seq', 0]}, 1]},
+        }},
+        {'$set': {'health': {'$max': [0, {'$subtract': ['$health', {'$multiply': [{'$size': '$fresh'}, 30]}]}]}}},
+        {'$unset': ['events', 'fresh']},
+    ])
+    assert local_db.bosses.find_one({'_id': 1}) == {'_id': 1, 'health': 20, 'last_seq': 3}
+
+
+def test_expressions_compare_missing_below_null(local_db):
+    local_db.docs.insert_one({'_id': 1, 'n': None})
+    doc = next(local_db.docs.aggregate([{'$project': {
+        'missing_is_null': {'$eq': ['$absent', None]},
+        'null_is_null': {'$eq': ['$n', None]},
+        'missing_below': {'$lt': ['$absent', None]},
+        'as_text': {'$toString': 2.0},
+    }}]))
+    assert doc == {'_id': 1, 'missing_is_null': False, 'null_is_null': True, 'missing_below': True, 'as_text': '2'}
+
+
+def test_array_expressions(local_db):
+    local_db.docs.insert_one({'_id': 1, 'a': [1, 2, 3], 'n': None})
+    doc = next(local_db.docs.aggregate([{'$project': {
+        'joined': {'$concatArrays': ['$a', [4], []]},
+        'with_null': {'$concatArrays': ['$a', '$n']},
+        'last_two': {'$slice': ['$a', -2]},
+        'first_two': {'$slice': ['$a', 2]},
+        'middle': {'$slice': ['$a', 1, 1]},
+        'from_end': {'$slice': ['$a', -5, 2]},
+    }}]))
+    assert doc == {'_id': 1, 'joined': [1, 2, 3, 4], 'with_null': None, 'last_two': [2, 3], 'first_two': [1, 2],
+                   'middle': [2], 'from_end': [1, 2]}
+
+
+def test_unsupported_update_operators_raise(local_db):
+    local_db.users.insert_one({'_id': 1, 'items': [1, 2]})
+    for update in ({'$bit': {'n': {'and': 1}}},
+                   {'$set': {'items.$': 5}},
+                   {'$push': {'items': {'$each': [3], '$slice': -2}}},
+                   {'$inc': {'missing': 'one'}},
+                   [{'$set': {'n': {'$dateTrunc': {'date': '$$NOW', 'unit': 'day'}}}}]):
+        with pytest.raises(OperationFailure):
+            local_db.users.update_one({'_id': 1}, update)
+    assert local_db.users.find_one({'_id': 1}) == {'_id': 1, 'items': [1, 2]}
+
+
+# --- Aggregation and projection ---
+
+def test_computed_projection(local_db):
+    local_db.docs.insert_one({'_id': 1, 'j': [1, 2, 3], 'k': {'a': 1, 'b': 2}})
+    doc = next(local_db.docs.aggregate([{'$project': {'j': {'$size': '$j'}, 'k.a': 1, 'first': {'$literal': 1}}}]))
+    assert doc == {'_id': 1, 'j': 3, 'k': {'a': 1}, 'first': 1}
+    assert local_db.docs.find_one({}, {'k.b': 0, '_id': 0}) == {'j': [1, 2, 3], 'k': {'a': 1}}
+
+
+def test_mixed_projection_raises(local_db):
+    local_db.docs.insert_one({'_id': 1, 'a': 1, 'b': 2})
+    with pytest.raises(OperationFailure):
+        local_db.docs.find_one({}, {'a': 1, 'b': 0})
+    with pytest.raises(OperationFailure):
+        local_db.docs.find_one({}, {'a': 1, 'a.b': 1})
+
+
+def test_lookup_and_unwind(local_db):
+    local_db.users.insert_many([{'_id': 'u1', 'name': 'a'}, {'_id': 'u2', 'name': 'b'}])
+    local_db.quests.insert_many([{'_id': 1, 'user_id': 'u1'}, {'_id': 2, 'user_id': 'u1'}, {'_id': 3, 'user_id': 'u3'}])
+    rows = list(local_db.users.aggregate([
+        {'$lookup': {'from': 'quests', 'localField': '_id', 'foreignField': 'user_id', 'as': 'quests'}},
+        {'$unwind': {'path': '$quests', 'preserveNullAndEmptyArrays': True}},
+        {'$project': {'name': 1, 'quest': '$quests._id'}},
+        {'$sort': {'name': 1, 'quest': 1}},
+    ]))
+    assert rows == [{'_id': 'u1', 'name': 'a', 'quest': 1}, {'_id': 'u1', 'name': 'a', 'quest': 2},
+                    {'_id': 'u2', 'name': 'b'}]
+
+
+def test_count_and_match_stages(people):
+    assert list(people.aggregate([{'$match': {'tags': 'y'}}, {'$count': 'n'}])) == [{'n': 2}]
+    assert list(people.aggregate([{'$match': {'name': 'zz'}}, {'$count': 'n'}])) == []
+
+
+def test_unsupported_stages_raise(people):
+    with pytest.raises(OperationFailure):
+        list(people.aggregate([{'$group': {'_id': '$level'}}]))
+    with pytest.raises(OperationFailure):
+        list(people.aggregate([{'$match': {'name': 'zz'}}, {'$facet': {}}]))
+    with pytest.raises(OperationFailure):
+        list(people.aggregate([{'$lookup': {'from': 'x', 'pipeline': [], 'as': 'y'}}]))
+
+
+# --- Values ---
+
+def test_dates_and_ttl_round_trip(local_db):
+    now = datetime.datetime(2024, 1, 2, 3, 4, 5, 678901)
+    local_db.tickets.insert_one({'_id': 't', 'created_at': now})
+    doc = local_db.tickets.find_one({'created_at': {'$gte': now - datetime.timedelta(seconds=1)}})
+    assert doc['created_at'] == now.replace(microsecond=678000)
@@ -0,0 +1,29 @@
+"""
+Query budgets: every route's @query_budget against what it issues, calibrated the way
+benchmarks/bench_app.py --budgets-only does it
+"""
+
+import os
+import random
+import sys
+
+from instrumentation import budget_for
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import bench_app  # noqa: E402
+
+
+def test_every_budgeted_route_is_calibrated_within_budget(app_module):
+    app = app_module.app
+    client = app.test_client()
+    random.seed(1)
+
+    players = bench_app.seed_players(client, app_module.db, 2, 'budgets')
+    # Strict mode: an overrun raises QueryBudgetExceeded out of the request itself
+    per_request, routes, failures = bench_app.calibrate(client, players, rounds=2)
+
+    assert dict(failures) == {}
+    budgeted = {endpoint for endpoint in app.view_functions if budget_for(app, endpoint) is not None}
+    assert budgeted - set(per_request) == set(), 'budgeted routes the calibration never requested'
+    assert bench_app.check_budgets(app, per_request) == []
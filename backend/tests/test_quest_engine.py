@@ -0,0 +1,36 @@
+"""
+Quest rewards: what players may set on custom quests, and what completing one pays
+"""
+
+import pytest
+
+from quest_engine import QuestError, custom_rewards, resolve_reward
+
+
+class Catalog:
+    def get(self, name, key):
+        return None
+
+
+def test_custom_rewards_are_clamped_to_the_form_bounds():
+    assert custom_rewards({'exp_reward': 10 ** 9, 'stamina_cost': -50}) == {'exp_reward': 500, 'stamina_cost': 5}
+    assert custom_rewards({'exp_reward': '40'}) == {'exp_reward': 40}
+    assert custom_rewards({}, {'exp_reward': 50, 'stamina_cost': 10}) == {'exp_reward': 50, 'stamina_cost': 10}
+
+
+@pytest.mark.parametrize('value', [None, 'lots', True, [], float('inf')])
+def test_custom_rewards_reject_anything_but_whole_numbers(value):
+    with pytest.raises(QuestError) as error:
+        custom_rewards({'exp_reward': 100, 'stamina_cost': value})
+    assert error.value.status == 400
+
+
+def test_stored_custom_rewards_are_held_to_the_limits(local_db):
+    local_db.custom_quests.insert_many([
+        {'user_id': 'u1', 'quest_id': 'greedy', 'exp_reward': 10 ** 6, 'stamina_cost': -10},
+        {'user_id': 'u1', 'quest_id': 'broken', 'exp_reward': 'junk', 'stamina_cost': 20},
+    ])
+    greedy = resolve_reward(local_db, Catalog(), 'u1', 'greedy')
+    assert (greedy['exp'], greedy['stamina']) == (500, 5)
+    broken = resolve_reward(local_db, Catalog(), 'u1', 'broken')
+    assert (broken['exp'], broken['stamina']) == (50, 20)
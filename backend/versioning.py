@@ -0,0 +1,99 @@
+"""
+State Versioning
+Per-user state_version counters and catalog hashes surfaced as ETags for conditional GETs
+"""
+
+import hashlib
+import threading
+from functools import wraps
+
+from bson.objectid import ObjectId
+from flask import jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+
+
+def bump_state_version(db, user_id):
+    """Invalidate every cached read of this user's state; call from any write outside a request"""
+    db.users.update_one({'_id': ObjectId(user_id)}, {'$inc': {'state_version': 1}})
+
+
+def bump_state_versions(db, user_ids):
+    """bump_state_version for many users in one update (background writes: cohort runs)"""
+    ids = [ObjectId(user_id) for user_id in set(user_ids)]
+    if ids:
+        db.users.update_many({'_id': {'$in': ids}}, {'$inc': {'state_version': 1}})
+
+
+def state_version(db, user_id):
+    """One _id lookup returning a single field; None if the user doesn't exist"""
+    doc = db.users.find_one({'_id': ObjectId(user_id)}, {'_id': 0, 'state_version': 1})
+    return None if doc is None else doc.get('state_version', 0)
+
+
+def _matches(etag):
+    header = request.headers.get('If-None-Match', '')
+    return etag in [tag.strip() for tag in header.split(',')] or header.strip() == '*'
+
+
+class ConditionalMetrics:
+    """304 hit rate per endpoint (process-local)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, endpoint, hit):
+        with self._lock:
+            counts = self._counts.setdefault(endpoint, [0, 0])
+            counts[0 if hit else 1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: {
+                    'hits': hits,
+                    'misses': misses,
+                    'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0
+                }
+                for endpoint, (hits, misses) in self._counts.items()
+            }
+
+
+metrics = ConditionalMetrics()
+
+
+def conditional(db, catalog, catalogs=(), clock=None):
+    """
+    Decorator for per-user GET endpoints (apply below @jwt_required()).
+
+    ETag = hash(user id, users.state_version, catalog content hashes and
+    `clock()` if given, for state that changes with time alone). A
+    matching If-None-Match is answered with 304 after one version lookup,
+    without running the handler. Responses are marked private/no-cache so
+    browsers store them and revalidate on every poll.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            user_id = get_jwt_identity()
+            version = state_version(db, user_id)
+            if version is None:
+                return jsonify({'error': 'User not found'}), 404
+
+            parts = [user_id, str(version)] + [f'{name}:{catalog.version(name)}' for name in catalogs]
+            if clock is not None:
+                parts.append(f'clock:{clock()}')
+            etag = 'W/"' + hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()[:20] + '"'
+            headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+            if _matches(etag):
+                metrics.record(request.endpoint, True)
+                return '', 304, headers
+
+            metrics.record(request.endpoint, False)
+            response = make_response(fn(*args, **kwargs))
+            if response.status_code == 200:
+                response.headers.update(headers)
+            return response
+        return wrapper
+    return decorator
@@ -43,6 +43,13 @@ MONGO_URI=mongodb+srv://<username>:<password>@<cluster>.mongodb.net/the_system?r
 # Or use local MongoDB:
 # MONGO_URI=mongodb://localhost:27017/the_system
 
+# Desktop mode: keep all data in a local file next to the executable (works offline)
+DATASTORE=sqlite
+LOCAL_DB_PATH=the_system.db
+# Optional: push local changes to MongoDB every LOCAL_SYNC_INTERVAL seconds
+# LOCAL_SYNC_URI=mongodb+srv://<username>:<password>@<cluster>.mongodb.net/the_system?retryWrites=true&w=majority
+# Remove DATASTORE=sqlite to use MONGO_URI directly instead
+
 # Secret Keys (change these in production!)
 SECRET_KEY=your-secret-key-here
 JWT_SECRET_KEY=your-jwt-secret-key-here
@@ -81,6 +88,8 @@ def build_executable():
         "--hidden-import=werkzeug.utils",
         "--hidden-import=bson",
         "--hidden-import=bson.objectid",
+        "--hidden-import=sqlite3",
+        "--hidden-import=numpy",
         "--hidden-import=email.mime.text",
         "--hidden-import=email.mime.multipart",
         # Collect all submodules
@@ -117,9 +126,12 @@ def copy_config_files():
 
 ## Quick Start
 
-1. **Configure Database Connection:**
+1. **Configure Storage:**
    - Copy `.env.example` to `.env`
-   - Edit `.env` and add your MongoDB connection string
+   - By default (`DATASTORE=sqlite`) your data lives in `the_system.db` next to the
+     executable; no internet connection is needed
+   - Optional: set `LOCAL_SYNC_URI` to back changes up to MongoDB in the background,
+     or remove `DATASTORE=sqlite` and set `MONGO_URI` to use MongoDB directly
 
 2. **Run the Application:**
    - Double-click `EvolveXSystem.exe`
@@ -133,7 +145,7 @@ def copy_config_files():
 ## Troubleshooting
 
 - **"Database not connected" error:**
-  Make sure your `.env` file has a valid MONGO_URI
+  Make sure your `.env` file has `DATASTORE=sqlite` or a valid MONGO_URI
 
 - **Port 5000 already in use:**
   Close any other application using port 5000
@@ -148,7 +160,7 @@ def copy_config_files():
 ## System Requirements
 
 - Windows 10 or later
-- Internet connection (for MongoDB Atlas)
+- Internet connection only for MongoDB Atlas (`MONGO_URI` or `LOCAL_SYNC_URI`)
 - No Python installation required
 
 ---
@@ -214,7 +226,7 @@ def main():
         print("\n📝 Next Steps:")
         print("   1. Navigate to dist/EvolveXSystem/")
         print("   2. Copy .env.example to .env")
-        print("   3. Edit .env with your MongoDB connection string")
+        print("   3. Keep DATASTORE=sqlite (local file) or set your MongoDB connection string")
         print("   4. Run EvolveXSystem.exe")
         print("\n" + "="*60 + "\n")
     else:
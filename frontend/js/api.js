@@ -50,7 +50,9 @@ async function apiRequest(endpoint, options = {}) {
         const data = await response.json();
 
         if (!response.ok) {
-            throw new Error(data.error || 'Request failed');
+            const error = new Error(data.error || 'Request failed');
+            error.status = response.status;
+            throw error;
         }
 
         return data;
@@ -80,6 +82,18 @@ const API = {
     verify: () =>
         apiRequest('/auth/verify'),
 
+    // Dashboard load: profile, quests, skills and titles in one request
+    getDashboardBootstrap: () =>
+        apiRequest('/dashboard/bootstrap'),
+
+    // Live updates (Server-Sent Events). EventSource can't set headers, so each connection
+    // gets a short-lived single-use ticket for its URL instead of the JWT
+    getEventTicket: () =>
+        apiRequest('/events/ticket', { method: 'POST' }),
+
+    openEventStream: (ticket) =>
+        new EventSource(`${API_BASE_URL}/events?ticket=${encodeURIComponent(ticket)}`),
+
     // User
     getProfile: () =>
         apiRequest('/user/profile'),
@@ -168,10 +182,11 @@ const API = {
             body: JSON.stringify({ rank })
         }),
 
-    damageBoss: (dungeonId, damage) =>
+    // events: [{ seq, damage }] with seq increasing per dungeon; resending a batch is safe
+    damageBoss: (dungeonId, events) =>
         apiRequest('/dungeons/damage', {
             method: 'POST',
-            body: JSON.stringify({ dungeon_id: dungeonId, damage })
+            body: JSON.stringify({ dungeon_id: dungeonId, events })
         }),
 
     completeDungeon: (dungeonId) =>
@@ -206,6 +221,7 @@ const API = {
         }),
 
     // Social
-    getLeaderboard: () =>
-        apiRequest('/leaderboard')
+    // period: undefined (all-time by level), 'week' or 'month' (EXP gained)
+    getLeaderboard: (period) =>
+        apiRequest(period ? `/leaderboard?period=${period}` : '/leaderboard')
 };
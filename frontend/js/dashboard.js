@@ -7,7 +7,11 @@ let userData = null;
 let statsData = null;
 let questsData = [];
 let skillsData = [];
+let titlesData = null;
 let editingQuestId = null;
+let eventStream = null;
+let eventStreamOff = false; // LIVE_EVENTS is off on the server
+let staleTimer = null;
 
 document.addEventListener('DOMContentLoaded', () => {
     // Check authentication
@@ -29,7 +33,9 @@ document.addEventListener('DOMContentLoaded', () => {
  */
 async function initDashboard() {
     try {
-        await loadUserProfile();
+        // One request: profile, quests (+ recommendation), skills and titles
+        const data = await API.getDashboardBootstrap();
+        applyUserProfile(data.profile);
 
         // Check for missing titles (retroactive unlock)
         try {
@@ -46,9 +52,13 @@ async function initDashboard() {
             console.log('Title check skipped:', error);
         }
 
-        await loadQuests();
-        await loadSkills();
-        await loadTitles();
+        applyQuests(data.quests);
+        skillsData = data.skills;
+        displaySkills();
+        titlesData = data.titles;
+        displayTitles();
+
+        connectEventStream();
     } catch (error) {
         console.error('Dashboard initialization error:', error);
         if (error.message.includes('token') || error.message.includes('Authorization')) {
@@ -66,26 +76,31 @@ async function initDashboard() {
 async function loadUserProfile() {
     try {
         const profile = await API.getProfile();
-        userData = profile.user;
-        statsData = profile.stats;
-
-        statsData = profile.stats;
-
-        updateUserDisplay();
-        updateStatsDisplay();
-
-        // AI System Notice
-        if (profile.system_notice) {
-            // Delay slightly for effect
-            setTimeout(() => {
-                showToast(profile.system_notice, 'warning');
-            }, 1000);
-        }
+        applyUserProfile(profile);
     } catch (error) {
         throw error;
     }
 }
 
+/**
+ * Apply Profile Response
+ */
+function applyUserProfile(profile) {
+    userData = profile.user;
+    statsData = profile.stats;
+
+    updateUserDisplay();
+    updateStatsDisplay();
+
+    // AI System Notice
+    if (profile.system_notice) {
+        // Delay slightly for effect
+        setTimeout(() => {
+            showToast(profile.system_notice, 'warning');
+        }, 1000);
+    }
+}
+
 /**
  * Update User Display
  */
@@ -121,31 +136,134 @@ function updateStatsDisplay() {
 }
 
 /**
- * Load Quests
+ * Apply State Delta
+ * Mutating endpoints return `delta` (changed user fields, stats,
+ * skills, new titles, dungeon state); merge it locally instead of re-fetching.
+ */
+function applyDelta(delta) {
+    if (!delta) return;
+
+    if (delta.user && userData) {
+        Object.assign(userData, delta.user);
+        updateUserDisplay();
+    }
+
+    if (delta.stats && statsData) {
+        Object.assign(statsData, delta.stats);
+        updateStatsDisplay();
+        updateQuestAvailability();
+    }
+
+    if (delta.skills && skillsData.user_skills) {
+        delta.skills.upsert.forEach(skill => {
+            const i = skillsData.user_skills.findIndex(s => s.skill_id === skill.skill_id);
+            if (i >= 0) skillsData.user_skills[i] = skill;
+            else skillsData.user_skills.push(skill);
+        });
+        displaySkills();
+    }
+
+    if (delta.titles && delta.titles.earned.length > 0 && titlesData) {
+        // The same delta can arrive twice (HTTP response + event stream)
+        const earned = titlesData.earned_titles || [];
+        const known = new Set(earned.map(t => t.title_id));
+        titlesData.earned_titles = earned.concat(delta.titles.earned.filter(t => !known.has(t.title_id)));
+        displayTitles();
+    }
+
+    // Dungeon: null once cleared/failed (callers close the overlay themselves)
+    if (delta.dungeon && activeDungeon && delta.dungeon.dungeon_id === activeDungeon.id) {
+        activeDungeon.serverHp = Math.min(activeDungeon.serverHp, delta.dungeon.boss_hp);
+        if (delta.dungeon.last_seq) {
+            activeDungeon.pending = activeDungeon.pending.filter(e => e.seq > delta.dungeon.last_seq);
+        }
+        const unsent = activeDungeon.pending.reduce((sum, e) => sum + e.damage, 0);
+        activeDungeon.currentHp = Math.max(0, activeDungeon.serverHp - unsent);
+        updateBossUI();
+    }
+}
+
+/**
+ * Live Updates
+ * The server pushes every write for this user (from any tab or device):
+ * 'delta' is merged like a response delta, 'notice' is shown as a toast and
+ * 'stale' (a write without a delta) reloads the dashboard. Tickets are
+ * single-use, so every (re)connection asks for a new one; without live
+ * events (404) the dashboard just refreshes on its own writes.
+ */
+async function connectEventStream() {
+    if (eventStream || eventStreamOff || typeof EventSource === 'undefined') return;
+    let ticket;
+    try {
+        ticket = (await API.getEventTicket()).ticket;
+    } catch (error) {
+        if (error.status === 404) {
+            eventStreamOff = true;
+        } else {
+            setTimeout(connectEventStream, 30000); // the worker is at its stream cap
+        }
+        return;
+    }
+    const stream = eventStream = API.openEventStream(ticket);
+
+    stream.addEventListener('delta', (e) => applyDelta(JSON.parse(e.data)));
+    stream.addEventListener('notice', (e) => {
+        const notice = JSON.parse(e.data);
+        showToast(notice.message, 'warning');
+        // The server failed an overdue dungeon session
+        if (notice.dungeon_expired && activeDungeon && activeDungeon.id === notice.dungeon_expired) {
+            clearInterval(dungeonTimerInterval);
+            document.getElementById('dungeonOverlay').classList.add('hidden');
+            activeDungeon = null;
+        }
+    });
+    stream.addEventListener('stale', () => {
+        // Coalesce bursts of writes into one reload
+        clearTimeout(staleTimer);
+        staleTimer = setTimeout(refreshDashboard, 500);
+    });
+    stream.addEventListener('error', () => {
+        // Stream ended (EVENT_MAX_AGE) or dropped: EventSource would retry with the spent ticket
+        stream.close();
+        if (eventStream === stream) eventStream = null;
+        setTimeout(connectEventStream, 3000);
+    });
+}
+
+async function refreshDashboard() {
+    try {
+        const data = await API.getDashboardBootstrap();
+        applyUserProfile({ ...data.profile, system_notice: null }); // already shown on load
+        applyQuests(data.quests);
+        skillsData = data.skills;
+        displaySkills();
+        titlesData = data.titles;
+        displayTitles();
+    } catch (error) {
+        console.error('Dashboard refresh failed:', error);
+    }
+}
+
+/**
+ * Mark quests the player cannot currently afford (stamina)
  */
+function updateQuestAvailability() {
+    if (!statsData) return;
+    document.querySelectorAll('.complete-quest-btn').forEach(btn => {
+        const quest = questsData.find(q => q.quest_id === btn.dataset.questId);
+        const blocked = quest && quest.stamina_cost > statsData.stamina;
+        btn.disabled = !!blocked;
+        btn.title = blocked ? 'Not enough stamina' : '';
+    });
+}
+
 /**
  * Load Quests
  */
 async function loadQuests() {
     try {
         const response = await API.getAvailableQuests();
-        questsData = response.quests;
-
-        // AI Recommendation Display
-        const recContainer = document.getElementById('aiRecommendation');
-        if (response.recommendation && recContainer) {
-            recContainer.innerHTML = `
-                <div class="ai-suggestion" style="background: rgba(0, 255, 170, 0.1); border: 1px solid #00ffaa; padding: 1rem; margin-bottom: 2rem; border-radius: 8px;">
-                    <strong style="color: #00ffaa;">🤖 SYSTEM SUGGESTION:</strong> 
-                    <span style="color: #fff;">${response.recommendation.message.replace('System Suggestion:', '')}</span>
-                </div>
-            `;
-            recContainer.classList.remove('hidden');
-        } else if (recContainer) {
-            recContainer.classList.add('hidden');
-        }
-
-        displayQuests();
+        applyQuests(response);
     } catch (error) {
         console.error('Failed to load quests:', error);
         // Fallback error display
@@ -160,6 +278,29 @@ async function loadQuests() {
     }
 }
 
+/**
+ * Apply Quests Response
+ */
+function applyQuests(response) {
+    questsData = response.quests;
+
+    // AI Recommendation Display
+    const recContainer = document.getElementById('aiRecommendation');
+    if (response.recommendation && recContainer) {
+        recContainer.innerHTML = `
+            <div class="ai-suggestion" style="background: rgba(0, 255, 170, 0.1); border: 1px solid #00ffaa; padding: 1rem; margin-bottom: 2rem; border-radius: 8px;">
+                <strong style="color: #00ffaa;">🤖 SYSTEM SUGGESTION:</strong> 
+                <span style="color: #fff;">${response.recommendation.message.replace('System Suggestion:', '')}</span>
+            </div>
+        `;
+        recContainer.classList.remove('hidden');
+    } else if (recContainer) {
+        recContainer.classList.add('hidden');
+    }
+
+    displayQuests();
+}
+
 /**
  * Display Quests (Split System)
  */
@@ -241,6 +382,7 @@ function displayQuests() {
     if (!hasSystem) systemList.innerHTML = '<div class="empty-state">No system missions active.</div>';
 
     attachQuestHandlers();
+    updateQuestAvailability();
 }
 
 /**
@@ -283,12 +425,8 @@ async function completeQuest(questId) {
 
         showToast(`Quest completed! +${response.exp_gained} EXP`, 'success');
 
-        // Update user data
-        userData = response.user;
-        statsData = response.stats;
-
-        updateUserDisplay();
-        updateStatsDisplay();
+        // Update user, stats and titles locally
+        applyDelta(response.delta);
 
         // Check for level up
         if (response.leveled_up) {
@@ -302,10 +440,6 @@ async function completeQuest(questId) {
             });
         }
 
-        // Reload quests
-        await loadQuests();
-        await loadTitles();
-
     } catch (error) {
         showToast(error.message || 'Failed to complete quest', 'error');
     }
@@ -429,8 +563,8 @@ async function useSkill(skillId) {
         const response = await API.useSkill(skillId);
         showToast(response.message, 'success');
 
-        // Reload profile to update stats (Health/Stamina/EXP)
-        await loadUserProfile();
+        // Health/Stamina/EXP and skill level
+        applyDelta(response.delta);
 
     } catch (error) {
         showToast(error.message || 'Failed to use skill', 'error');
@@ -446,9 +580,8 @@ async function unlockSkill(skillId) {
 
         showToast(`Skill unlocked: ${response.skill_name}`, 'success');
 
-        // Reload profile and skills
-        await loadUserProfile();
-        await loadSkills();
+        // Skill points, new skill (and passive bonuses)
+        applyDelta(response.delta);
 
     } catch (error) {
         showToast(error.message || 'Failed to unlock skill', 'error');
@@ -588,9 +721,7 @@ function setupEventListeners() {
         try {
             const response = await API.restoreStamina(20);
             showToast('Stamina restored!', 'success');
-            statsData.stamina = response.stamina;
-            updateStatsDisplay();
-            await loadQuests();
+            applyDelta(response.delta);
         } catch (error) {
             showToast(error.message || 'Failed to restore stamina', 'error');
         }
@@ -755,6 +886,11 @@ let activeDungeon = null;
 let dungeonTimerInterval = null;
 let selectedRank = null;
 
+// Clicks are applied locally at once and sent in batches, at most one request in flight
+const DAMAGE_FLUSH_MS = 300;
+let damageFlushTimer = null;
+let damageInFlight = false;
+
 // Initialize Dungeon Buttons (Call this in initDashboard if possible, or add trigger)
 function initDungeonSystem() {
     // Add "Gate" button to dashboard if not present
@@ -813,7 +949,10 @@ window.startDungeon = async function () {
             id: response.dungeon_id,
             endTime: new Date(response.end_time).getTime(),
             maxHp: response.boss_hp,
-            currentHp: response.boss_hp
+            currentHp: response.boss_hp,
+            serverHp: response.boss_hp,
+            nextSeq: 1,
+            pending: []  // unacknowledged { seq, damage } events
         };
 
         // UI Transition
@@ -840,7 +979,7 @@ function startTimer() {
             // Usually dungeon timer end = fail
             clearInterval(dungeonTimerInterval);
             document.getElementById('dungeonTimerDisplay').textContent = "BREACHED";
-            showToast("Time expired! Keeping dungeon open for manual finish...", 'warning');
+            showToast("Time expired! Finish now: the gate closes in a few minutes...", 'warning');
             return;
         }
 
@@ -866,17 +1005,46 @@ async function strikeBoss() {
     // For now, simulate progress: 5% damage per click/task complete
     const damage = Math.ceil(activeDungeon.maxHp * 0.05);
 
-    try {
-        const res = await API.damageBoss(activeDungeon.id, damage);
-        activeDungeon.currentHp = res.boss_hp;
-        updateBossUI();
+    activeDungeon.pending.push({ seq: activeDungeon.nextSeq++, damage });
+    activeDungeon.currentHp = Math.max(0, activeDungeon.currentHp - damage);
+    updateBossUI();
 
-        if (activeDungeon.currentHp <= 0) {
-            victory();
-        }
+    if (!damageFlushTimer) {
+        damageFlushTimer = setTimeout(flushDamage, DAMAGE_FLUSH_MS);
+    }
+}
 
+/**
+ * Send pending hits as one batch. The server ignores seqs it has already
+ * applied, so a failed batch simply stays pending and goes out again.
+ */
+async function flushDamage() {
+    damageFlushTimer = null;
+    if (!activeDungeon || damageInFlight || activeDungeon.pending.length === 0) return;
+
+    const dungeon = activeDungeon;
+    const batch = dungeon.pending.slice();
+    damageInFlight = true;
+    try {
+        const res = await API.damageBoss(dungeon.id, batch);
+        dungeon.pending = dungeon.pending.filter(e => e.seq > res.last_seq);
+        dungeon.serverHp = res.boss_hp;
     } catch (error) {
         console.error(error);
+    } finally {
+        damageInFlight = false;
+    }
+    if (dungeon !== activeDungeon) return;
+
+    // Authoritative HP minus hits the server hasn't seen yet
+    const unsent = dungeon.pending.reduce((sum, e) => sum + e.damage, 0);
+    dungeon.currentHp = Math.max(0, dungeon.serverHp - unsent);
+    updateBossUI();
+
+    if (dungeon.serverHp <= 0) {
+        victory();
+    } else if (dungeon.pending.length > 0 && !damageFlushTimer) {
+        damageFlushTimer = setTimeout(flushDamage, DAMAGE_FLUSH_MS);
     }
 }
 
@@ -898,7 +1066,7 @@ async function victory() {
         setTimeout(async () => {
             document.getElementById('dungeonOverlay').classList.add('hidden');
             activeDungeon = null;
-            await loadUserProfile(); // Refresh stats
+            applyDelta(res.delta);
             if (res.leveled_up) showLevelUpModal(res.new_level);
         }, 3000);
 
@@ -915,7 +1083,7 @@ async function fleeDungeon() {
             document.getElementById('dungeonOverlay').classList.add('hidden');
             activeDungeon = null;
             showToast(`Escaped... took ${res.health_lost} damage.`, 'error');
-            await loadUserProfile(); // Update health
+            applyDelta(res.delta); // Update health
         } catch (error) {
             console.error(error);
         }
@@ -1026,8 +1194,7 @@ window.useSkill = async function (skillId) {
             window.handleSkillEffect(response.real_world_effect);
         }
 
-        await loadUserProfile();
-        setTimeout(loadSkills, 500); // Slight delay for refresh
+        applyDelta(response.delta);
     } catch (error) {
         showToast(error.message, 'error');
     }